@@ -0,0 +1,239 @@
+"""
+أرشفة السنوات المنتهية في ملفات منفصلة.
+
+أوقات الحضور وملخصها اليومي والبصمات الخام لسنة سابقة تنقل إلى ملف archive/attendance_YYYY.db
+بجانب القاعدة (بنفس الجداول)، فتبقى القاعدة الأساسية صغيرة: عرض السجل والمزامنة وتقارير
+الفترات الحالية لا تمر على بيانات السنوات القديمة. السنوات المؤرشفة مسجلة في جدول archived_years،
+والمزامنة وإعادة الاحتساب لا تكتب في أيامها.
+
+التقارير ترفق (ATTACH) ملفات السنوات التي تشملها فترة التقرير فقط (attached) وتقرأ من الجدول
+الأساسي وملفات الأرشيف معاً (union_sql)؛ الفترات التي لا تشمل سنة مؤرشفة لا ترفق شيئاً.
+
+النقل على مرحلتين حتى لا تضيع بيانات إذا توقف البرنامج في منتصفه (مع WAL لا تكون المعاملة على
+عدة ملفات ذرية): نسخ السنة إلى ملف الأرشيف وحفظه، ثم في معاملة على القاعدة الأساسية: التأكد
+أن سجلات السنة لم تتغير منذ النسخ، وحذفها، وتسجيل السنة. إعادة الأرشفة بعد توقف تكمل الملف.
+
+من سطر الأوامر (بدون سنة: كل السنوات المنتهية):
+    python -m archive 2023
+"""
+import os
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from daily_summary import SUMMARY_KEYS, create_times, create_summary, refresh_archive, bump_version, day_number, day_date
+
+ARCHIVE_DIR = "archive"              # بجانب ملف القاعدة
+FILE_FORMAT = "attendance_{}.db"
+MAX_ATTACHED = 10                    # حد sqlite الافتراضي لعدد الملفات المرفقة بالاتصال
+TIMES_COLUMNS = "day, employee_id, in1, out1, in2, out2"
+PUNCH_COLUMNS = "employee_id, ts, device_id, verify"
+
+
+def _schema(year):
+    return f"archive_{int(year)}"
+
+
+def _year_days(year):
+    return day_number(date(year, 1, 1)), day_number(date(year, 12, 31))
+
+
+def _db_file(conn):
+    """مسار ملف القاعدة الأساسية للاتصال (فارغ للقاعدة في الذاكرة)"""
+    for _, name, path in conn.execute("PRAGMA database_list").fetchall():
+        if name == "main":
+            return path
+    return ""
+
+
+def archive_dir(conn):
+    return os.path.join(os.path.dirname(_db_file(conn)), ARCHIVE_DIR)
+
+
+def archived_years(conn):
+    """قائمة (السنة، اسم الملف، أول يوم، آخر يوم) للسنوات المؤرشفة بترتيب السنة"""
+    return conn.execute("SELECT year, file, first_day, last_day FROM archived_years ORDER BY year").fetchall()
+
+
+def archivable_years(conn, today=None):
+    """السنوات المنتهية (قبل السنة الحالية) التي لها سجلات حضور في القاعدة الأساسية"""
+    current = (today or date.today()).year
+    first = conn.execute("SELECT MIN(day) FROM main.attendance_times").fetchone()[0]
+    if first is None:
+        return []
+    years = []
+    for year in range(day_date(first).year, current):
+        if conn.execute("SELECT 1 FROM main.attendance_times WHERE day BETWEEN ? AND ? LIMIT 1",
+                        _year_days(year)).fetchone():
+            years.append(year)
+    return years
+
+
+def archive_year(conn, year, today=None):
+    """
+    نقل سنة منتهية من القاعدة الأساسية إلى ملف أرشيفها؛ يعيد (عدد سجلات الحضور، عدد البصمات).
+    يحفظ (commit) أي معاملة مفتوحة على الاتصال قبل البدء لأن الإرفاق غير مسموح داخل معاملة.
+    """
+    if year >= (today or date.today()).year:
+        raise ValueError("لا يمكن أرشفة السنة الحالية")
+    if not _db_file(conn):
+        raise ValueError("الأرشفة تتطلب قاعدة بيانات في ملف")
+    if conn.execute("SELECT 1 FROM archived_years WHERE year = ?", (year,)).fetchone():
+        raise ValueError(f"سنة {year} مؤرشفة من قبل")
+    if conn.in_transaction:
+        conn.commit()
+    first, last = _year_days(year)
+    lo, hi = first * 86400, (last + 1) * 86400  # حدود البصمات الخام بالثواني
+    directory = archive_dir(conn)
+    os.makedirs(directory, exist_ok=True)
+    name = FILE_FORMAT.format(year)
+    schema = _schema(year)
+    start = time.perf_counter()
+
+    old_isolation = conn.isolation_level
+    conn.isolation_level = None  # التحكم اليدوي في المعاملات
+    cur = conn.cursor()
+    cur.execute(f"ATTACH DATABASE ? AS {schema}", (os.path.join(directory, name),))
+    try:
+        # ملف الأرشيف يقرأ أكثر مما يكتب: ملف واحد بدون wal، وحفظ كامل قبل الحذف من القاعدة
+        cur.execute(f"PRAGMA {schema}.journal_mode = DELETE")
+        cur.execute(f"PRAGMA {schema}.synchronous = FULL")
+
+        # 1. نسخ السنة إلى ملف الأرشيف
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            create_times(cur, schema)
+            create_summary(cur, schema)
+            # البصمات الخام بنفس تعريف الإصدار 3 (migrations.py)
+            cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {schema}.punch_devices (
+                id INTEGER PRIMARY KEY,
+                device TEXT UNIQUE NOT NULL
+            )""")
+            cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {schema}.punches (
+                employee_id INTEGER NOT NULL,
+                ts INTEGER NOT NULL,
+                device_id INTEGER NOT NULL REFERENCES punch_devices(id),
+                verify INTEGER,
+                PRIMARY KEY (employee_id, ts, device_id)
+            ) WITHOUT ROWID""")
+            cur.execute(f"""
+                INSERT OR REPLACE INTO {schema}.attendance_times ({TIMES_COLUMNS})
+                SELECT {TIMES_COLUMNS} FROM main.attendance_times WHERE day BETWEEN ? AND ?
+            """, (first, last))
+            cur.execute(f"""
+                INSERT OR REPLACE INTO {schema}.attendance_daily
+                SELECT * FROM main.attendance_daily WHERE day BETWEEN ? AND ?
+            """, (first, last))
+            # الإعدادات التي حسب بها الملخص المنسوخ (refresh_archive يعيد حسابه إذا تغيرت)
+            cur.execute(f"""
+                INSERT OR REPLACE INTO {schema}.daily_state (key, value)
+                SELECT key, value FROM main.daily_state WHERE key IN ({", ".join("?" * len(SUMMARY_KEYS))})
+            """, SUMMARY_KEYS)
+            cur.execute(f"INSERT OR REPLACE INTO {schema}.punch_devices (id, device) SELECT id, device FROM main.punch_devices")
+            cur.execute(f"""
+                INSERT OR IGNORE INTO {schema}.punches ({PUNCH_COLUMNS})
+                SELECT {PUNCH_COLUMNS} FROM main.punches WHERE ts >= ? AND ts < ?
+            """, (lo, hi))
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+
+        # 2. حذف السنة من القاعدة الأساسية وتسجيلها، إذا لم تتغير سجلاتها منذ النسخ
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            changed = cur.execute(f"""
+                SELECT COUNT(*) FROM (
+                    SELECT {TIMES_COLUMNS} FROM main.attendance_times WHERE day BETWEEN ?1 AND ?2
+                    EXCEPT SELECT {TIMES_COLUMNS} FROM {schema}.attendance_times WHERE day BETWEEN ?1 AND ?2)
+            """, (first, last)).fetchone()[0]
+            if changed:
+                raise RuntimeError(f"تغيرت سجلات سنة {year} أثناء الأرشفة، أعد المحاولة")
+            days = cur.execute("DELETE FROM main.attendance_times WHERE day BETWEEN ? AND ?", (first, last)).rowcount
+            cur.execute("DELETE FROM main.attendance_daily WHERE day BETWEEN ? AND ?", (first, last))
+            punches = cur.execute(f"""
+                DELETE FROM main.punches WHERE ts >= ?1 AND ts < ?2 AND (employee_id, ts, device_id) IN (
+                    SELECT employee_id, ts, device_id FROM {schema}.punches WHERE ts >= ?1 AND ts < ?2)
+            """, (lo, hi)).rowcount
+            cur.execute("INSERT INTO archived_years VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (year, name, first, last, days, punches, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+            bump_version(cur)
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+    finally:
+        cur.execute(f"DETACH DATABASE {schema}")
+        conn.isolation_level = old_isolation
+    print(f"🗄️ أرشفة سنة {year}: {days} سجل حضور و {punches} بصمة -> {name} "
+          f"خلال {time.perf_counter() - start:.1f} ثانية")
+    return days, punches
+
+
+@contextmanager
+def attached(conn, d1=None, d2=None):
+    """
+    إرفاق ملفات أرشيف السنوات التي تشملها الفترة من d1 إلى d2 (كل السنوات بدون تحديد)، مع
+    إعادة حساب ملخصها إذا تغيرت الإعدادات. يعيد أسماءها (archive_YYYY) بترتيب السنة لاستخدامها
+    مع union_sql، أو قائمة فارغة إذا لم تشمل الفترة سنة مؤرشفة. تفصل الملفات عند الخروج.
+    """
+    lo = day_number(d1) if d1 else -(1 << 62)
+    hi = day_number(d2) if d2 else 1 << 62
+    years = [(year, name) for year, name, first, last in archived_years(conn) if first <= hi and last >= lo]
+    if not years:
+        yield []
+        return
+    if len(years) > MAX_ATTACHED:
+        raise ValueError(f"الفترة تشمل {len(years)} سنوات مؤرشفة، والحد {MAX_ATTACHED} سنوات في التقرير الواحد")
+    if conn.in_transaction:
+        conn.commit()
+    directory = archive_dir(conn)
+    schemas = []
+    try:
+        for year, name in years:
+            path = os.path.join(directory, name)
+            if not os.path.exists(path):  # الإرفاق ينشئ ملفاً فارغاً بدلاً من الخطأ
+                raise FileNotFoundError(f"ملف أرشيف سنة {year} غير موجود: {path}")
+            conn.execute(f"ATTACH DATABASE ? AS {_schema(year)}", (path,))
+            schemas.append(_schema(year))
+        cur = conn.cursor()
+        for schema in schemas:
+            refresh_archive(cur, schema)
+        if conn.in_transaction:
+            conn.commit()
+        yield schemas
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        for schema in schemas:
+            conn.execute(f"DETACH DATABASE {schema}")
+
+
+def refresh_archives(conn, d1=None, d2=None):
+    """
+    إعادة حساب ملخص ملفات أرشيف الفترة إذا تغيرت الإعدادات (كما في attached) دون إبقائها مرفقة؛
+    قبل قراءتها من عدة عمليات حتى لا تكتب كل عملية في نفس الملف. يعيد عدد الملفات.
+    """
+    with attached(conn, d1, d2) as schemas:
+        return len(schemas)
+
+
+def union_sql(table, schemas):
+    """مصدر القراءة (بعد FROM) للجدول في القاعدة الأساسية وملفات الأرشيف المرفقة (schemas)"""
+    if not schemas:
+        return table
+    return "(" + " UNION ALL ".join(f"SELECT * FROM {schema}.{table}" for schema in ["main"] + list(schemas)) + ")"
+
+
+if __name__ == "__main__":
+    import sys
+    from database import connect
+    from migrations import migrate
+    conn = connect()
+    try:
+        migrate(conn)
+        for year in [int(y) for y in sys.argv[1:]] or archivable_years(conn):
+            archive_year(conn, year)
+    finally:
+        conn.close()
@@ -1,12 +1,23 @@
-import sqlite3
 import os
 import sys
 import json
-from datetime import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from PyQt5.QtWidgets import *
-from PyQt5.QtCore import Qt, QDate
+from PyQt5.QtCore import Qt, QDate, QThread, QTimer, pyqtSignal
 from PyQt5.QtGui import *
 from zk import ZK 
+from database import connect, get_connection, get_db_path, load_sync_mark, save_sync_mark
+from device_stream import iter_attendance_data
+from sync_journal import JournalWriter, journal_dir, pending_journals, read_header, read_journal, remove_journal
+from sync_engine import merge_punches, get_devices, device_key, merge_streams, store_raw_punches, zk_options
+from shift_classifier import ShiftClassifier
+from table_models import ColumnTableModel
+from excel_export import export_attendance
+from daily_summary import day_date, time_text
+
+ATTENDANCE_VIEW_LIMIT = 100000  # أقصى عدد سجلات تعرض في الجدول (الأحدث أولاً)
+SYNC_RELOAD_MS = 5000           # أقل مدة بين تحديثين للجدول أثناء السحب (تحميل الجدول يأخذ جزءاً من الثانية)
 
 def resource_path(relative_path):
     try:
@@ -15,12 +26,175 @@ def resource_path(relative_path):
         base_path = os.path.dirname(os.path.abspath(__file__))
     return os.path.join(base_path, relative_path)
 
-def get_db_path():
-    if hasattr(sys, '_MEIPASS'):
-        return os.path.join(os.path.dirname(sys.executable), "attendance.db")
-    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "attendance.db")
+class SyncWorker(QThread):
+    """سحب البصمات من الجهاز وحفظها في القاعدة في خيط منفصل حتى لا تتجمد الواجهة"""
+    progress = pyqtSignal(str, int, int)     # نص المرحلة، المنجز، الإجمالي
+    committed = pyqtSignal(int)              # عدد البصمات المحفوظة حتى الآن
+    sync_done = pyqtSignal(int, int, bool, list)  # المحفوظة، بصمات الأجهزة، هل تم الإيقاف، تقرير الأجهزة
+    failed = pyqtSignal(str)
+
+    BATCH_SIZE = 5000  # عدد البصمات في كل معاملة حفظ
+    MAX_PARALLEL = 4   # أقصى عدد أجهزة يتم التحميل منها في نفس الوقت
+
+    def __init__(self, config, parent=None, db_path=None):
+        super().__init__(parent)
+        self.config = config
+        self.db_path = db_path or get_db_path()  # مجلد سجلات السحب بجانب القاعدة يحتاج المسار
+        self.classifier = ShiftClassifier.from_settings(config)
+        self._cancelled = False
+
+    def cancel(self):
+        """طلب الإيقاف؛ ينفذ عند أول نقطة توقف (بين أجزاء التحميل أو بين دفعات الحفظ)"""
+        self._cancelled = True
+
+    def classify(self, records):
+        stamps = [r.timestamp for r in records]
+        periods = self.classifier.classify_batch([t.hour * 60 + t.minute for t in stamps])
+        return [(str(r.user_id), t.date().isoformat(), f"{t.hour:02d}:{t.minute:02d}", period)
+                for r, t, period in zip(records, stamps, periods) if period]
+
+    def pull_device(self, device, directory, loaded):
+        """
+        تحميل سجل جهاز واحد إلى ملف مضغوط (ينفذ في خيط من مجموعة الخيوط).
+        الجهاز مقفل أثناء النقل فقط، ويعاد تفعيله قبل أي عمل على القاعدة.
+        """
+        start = time.perf_counter()
+        journal = JournalWriter(directory, device)
+        try:
+            zk = ZK(device['ip'], **zk_options(device))
+            conn = zk.connect()
+            locked = time.perf_counter()
+            try:
+                conn.disable_device()
+                for data, done, total in iter_attendance_data(conn):
+                    if self._cancelled:
+                        break
+                    journal.write(data)
+                    loaded[device_key(device)] = (done, total)
+                    done_all, total_all = self.loaded(loaded)
+                    self.progress.emit(f"📥 تم تحميل {done_all} / {total_all} بصمة من الأجهزة", done_all, total_all)
+            finally:
+                try: conn.enable_device(); conn.disconnect()
+                except: pass
+                lock_time = time.perf_counter() - locked
+        except Exception:
+            journal.discard()
+            raise
+        if self._cancelled:
+            journal.discard()
+            return None
+        return journal.commit(), journal.records, time.perf_counter() - start, lock_time
+
+    @staticmethod
+    def loaded(loaded):
+        """(المحمل، الإجمالي) من كل الأجهزة حتى الآن"""
+        values = list(loaded.values())  # يتم تحديثه من خيوط التحميل
+        return sum(d for d, _ in values), sum(t for _, t in values)
+
+    def journal_records(self, paths, mark):
+        """
+        بصمات الجهاز الجديدة من سجلاته (الأقدم أولاً) بعد علامة آخر سحب، مرتبة كلها حسب
+        (الوقت، رقم الموظف) كما يتطلب merge_streams وعلامات الدمج المتقدمة.
+        سجل الجهاز تراكمي، فالسجل الأحدث يبدأ بما في الأقدم: يتم تخطي ما أرجعه السجل السابق.
+        """
+        for path in paths:
+            for records in read_journal(path, mark):
+                if self._cancelled:
+                    return
+                yield from records
+                mark = (records[-1].timestamp, str(records[-1].user_id))
+
+    def save_batch(self, db, batch, marks):
+        """حفظ دفعة في معاملة مستقلة مع تقديم علامة أحدث بصمة محفوظة لكل جهاز
+        حتى يكمل الدمج التالي من حيث توقف إذا تم الإيقاف"""
+        cursor = db.cursor()
+        store_raw_punches(db, batch)
+        merge_punches(db, self.classify([r for _, r in batch]))
+        for key, r in batch:
+            if key not in marks or (r.timestamp, str(r.user_id)) > (marks[key].timestamp, str(marks[key].user_id)):
+                marks[key] = r
+        for key, last in marks.items():
+            save_sync_mark(cursor, key, last.timestamp, last.user_id, last.uid)
+        db.commit()
+
+    def merge_journals(self, db, paths):
+        """دمج السجلات في القاعدة بتسلسل زمني واحد لكل الأجهزة، على دفعات"""
+        cursor = db.cursor()
+        by_device = {}
+        for path in paths:
+            by_device.setdefault(read_header(path)["device"], []).append(path)
+        streams = {key: self.journal_records(device_paths, load_sync_mark(cursor, key))
+                   for key, device_paths in by_device.items()}
+        saved = 0
+        batch, marks = [], {}
+        for item in merge_streams(streams):
+            batch.append(item)
+            if len(batch) >= self.BATCH_SIZE:
+                self.save_batch(db, batch, marks)
+                saved += len(batch)
+                batch = []
+                self.progress.emit(f"💾 تم حفظ {saved} بصمة جديدة", 0, 0)
+                self.committed.emit(saved)
+                if self._cancelled:
+                    return saved
+        if batch and not self._cancelled:
+            self.save_batch(db, batch, marks)
+            saved += len(batch)
+            self.committed.emit(saved)
+        return saved
+
+    def run(self):
+        devices = get_devices(self.config)
+        db = None
+        report = []
+        try:
+            directory = journal_dir(self.db_path)
+            # سجلات سحب سابق لم يكتمل دمجها (فشل أو إيقاف) تدمج مع هذا السحب
+            paths = pending_journals(directory)
+            if paths:
+                report.append(f"🔁 إكمال دمج {len(paths)} سجل سحب سابق")
+
+            # 1. التحميل من كل الأجهزة بالتوازي إلى ملفات مضغوطة، وكل جهاز يعاد تفعيله فور انتهاء نقله
+            self.progress.emit(f"⏳ جاري الإتصال بـ {len(devices)} جهاز...", 0, 0)
+            loaded, errors = {}, []
+            with ThreadPoolExecutor(max_workers=max(1, min(self.MAX_PARALLEL, len(devices)))) as pool:
+                futures = {pool.submit(self.pull_device, d, directory, loaded): d for d in devices}
+                for future in as_completed(futures):
+                    device = futures[future]
+                    try:
+                        result = future.result()
+                        if result is None:
+                            continue
+                        path, count, elapsed, lock_time = result
+                        paths.append(path)
+                        rate = count / elapsed if elapsed > 0 else 0
+                        report.append(f"{device['label']} ({device['ip']}): {count} بصمة خلال {elapsed:.1f} ث "
+                                      f"({rate:.0f} بصمة/ث، الجهاز مقفل {lock_time:.1f} ث)")
+                    except Exception as e:
+                        errors.append(f"{device['label']} ({device['ip']}): {e}")
+            report += [f"❌ {e}" for e in errors]
+            if not paths:
+                raise Exception(" | ".join(errors) or "لا توجد أجهزة في الإعدادات")
+            if self._cancelled:
+                self.sync_done.emit(0, 0, True, report)
+                return
+
+            # 2. الدمج من الملفات بدون الأجهزة؛ الملفات تحذف بعد اكتمال دمجها فقط
+            db = connect(self.db_path)  # اتصال خاص بالخيط
+            saved = self.merge_journals(db, paths)
+            if not self._cancelled:
+                for path in paths:
+                    remove_journal(path)
+            self.sync_done.emit(saved, self.loaded(loaded)[0], self._cancelled, report)
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            if db:
+                db.close()
 
 class AttendanceWindow(QWidget):
+    data_changed = pyqtSignal()  # بعد حفظ بصمات جديدة (لتحديث أرقام الشاشة الرئيسية)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("مزامنة البصمات - مؤسسة وطن")
@@ -33,7 +207,7 @@ class AttendanceWindow(QWidget):
         self.setStyleSheet("""
             QWidget { background-color: #f1f2f6; font-family: 'Segoe UI'; }
             QPushButton { border-radius: 6px; font-weight: bold; font-size: 14px; }
-            QTableWidget { background-color: white; border: 1px solid #dcdde1; }
+            QTableView { background-color: white; border: 1px solid #dcdde1; }
             QHeaderView::section { background-color: #2f3640; color: white; font-weight: bold; padding: 5px; }
         """)
         
@@ -66,19 +240,46 @@ class AttendanceWindow(QWidget):
         self.btn_clear.setFixedSize(150, 40)
         self.btn_clear.setStyleSheet("background-color: #c0392b; color: white;")
         self.btn_clear.clicked.connect(self.clear_device_logs)
+
+        self.btn_export = QPushButton("📊 تصدير السجل Excel")
+        self.btn_export.setFixedSize(170, 40)
+        self.btn_export.setStyleSheet("background-color: #27ae60; color: white;")
+        self.btn_export.clicked.connect(self.export_excel)
+
+        self.btn_cancel = QPushButton("⛔ إيقاف السحب")
+        self.btn_cancel.setFixedSize(150, 40)
+        self.btn_cancel.setStyleSheet("background-color: #2f3640; color: white;")
+        self.btn_cancel.clicked.connect(self.cancel_sync)
+        self.btn_cancel.hide()
         
         h_lay.addWidget(self.btn_back)
         h_lay.addStretch()
         h_lay.addWidget(self.status_lbl)
         h_lay.addStretch()
         h_lay.addWidget(self.btn_refresh) 
+        h_lay.addWidget(self.btn_export)
         h_lay.addWidget(self.btn_sync)
         h_lay.addWidget(self.btn_clear) 
+        h_lay.addWidget(self.btn_cancel)
         layout.addWidget(header)
 
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setTextVisible(True)
+        self.progress_bar.hide()
+        layout.addWidget(self.progress_bar)
+        self.worker = None
+        # تحديث الجدول أثناء السحب مرة واحدة لكل عدة دفعات محفوظة وليس بعد كل دفعة
+        self.sync_reload = QTimer(self)
+        self.sync_reload.setSingleShot(True)
+        self.sync_reload.setInterval(SYNC_RELOAD_MS)
+        self.sync_reload.timeout.connect(self.reload_after_sync)
+
         # Table Section
-        self.table = QTableWidget()
-        self.table.setColumnCount(7)
+        self.table = QTableView()
+        # التاريخ والأوقات محفوظة بالأرقام وتنسق للعرض مرة واحدة لكل قيمة مختلفة
+        formats = [str, str, lambda n: day_date(n).isoformat()] + [time_text] * 4
+        self.model = ColumnTableModel([""] * 7, formats, empty_text="--", parent=self)
+        self.table.setModel(self.model)
         self.update_table_headers()
         
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
@@ -108,120 +309,124 @@ class AttendanceWindow(QWidget):
         h2 = f"دخول ({self.config.get('in_limit_2', '20:00')})"
         o2 = f"خروج ({self.config.get('out_limit_2', '01:00')})"
         
-        self.table.setHorizontalHeaderLabels([
+        self.model.set_headers([
             "ID البصمة", "اسم الموظف", "التاريخ", h1, o1, h2, o2
         ])
 
-    def is_time_between(self, target_str, start_str, end_str):
-        fmt = '%H:%M'
-        try:
-            target = datetime.strptime(target_str, fmt).time()
-            start = datetime.strptime(start_str, fmt).time()
-            end = datetime.strptime(end_str, fmt).time()
-            
-            if start <= end:
-                return start <= target <= end
-            else: # دوام ليلي عابر لمنتصف الليل
-                return target >= start or target <= end
-        except: return False
-
     def sync_from_device(self):
+        if self.worker is not None and self.worker.isRunning():
+            return
         self.config = self.load_settings_only()
         self.update_table_headers()
-        
-        zk = ZK(self.config['ip'], port=4370, timeout=10)
-        conn = None
 
-        try:
-            self.status_lbl.setText("⏳ جاري الإتصال بالجهاز...")
-            QApplication.processEvents()
-            
-            conn = zk.connect()
-            conn.disable_device()
-            records = conn.get_attendance()
-            
-            db = sqlite3.connect(get_db_path())
-            cursor = db.cursor()
-            
-            for record in records:
-                u_id = str(record.user_id)
-                d_str = record.timestamp.strftime('%Y-%m-%d')
-                t_str = record.timestamp.strftime('%H:%M')
-
-                is_p1 = self.is_time_between(t_str, self.config['in_limit_1'], self.config['out_limit_1'])
-                is_p2 = self.is_time_between(t_str, self.config['in_limit_2'], self.config['out_limit_2'])
-
-                cursor.execute("SELECT id, check_in, check_out, check_in_2, check_out_2 FROM attendance WHERE employee_id=? AND date=?", (u_id, d_str))
-                existing = cursor.fetchone()
-                
-                if not existing:
-                    if is_p1:
-                        cursor.execute("INSERT INTO attendance (employee_id, date, check_in) VALUES (?, ?, ?)", (u_id, d_str, t_str))
-                    elif is_p2:
-                        cursor.execute("INSERT INTO attendance (employee_id, date, check_in_2) VALUES (?, ?, ?)", (u_id, d_str, t_str))
-                else:
-                    rec_id, c1_in, c1_out, c2_in, c2_out = existing
-                    if is_p1:
-                        if not c1_in:
-                            cursor.execute("UPDATE attendance SET check_in=? WHERE id=?", (t_str, rec_id))
-                        elif t_str != c1_in:
-                            cursor.execute("UPDATE attendance SET check_out=? WHERE id=?", (t_str, rec_id))
-                    elif is_p2:
-                        if not c2_in:
-                            cursor.execute("UPDATE attendance SET check_in_2=? WHERE id=?", (t_str, rec_id))
-                        elif t_str != c2_in:
-                            cursor.execute("UPDATE attendance SET check_out_2=? WHERE id=?", (t_str, rec_id))
-            
-            db.commit()
-            db.close()
+        self.worker = SyncWorker(self.config, self)
+        self.worker.progress.connect(self.on_sync_progress)
+        self.worker.committed.connect(self.on_sync_committed)
+        self.worker.sync_done.connect(self.on_sync_done)
+        self.worker.failed.connect(self.on_sync_failed)
+        self.set_sync_running(True)
+        self.worker.start()
+
+    def cancel_sync(self):
+        if self.worker is not None and self.worker.isRunning():
+            self.status_lbl.setText("⏳ جاري إيقاف السحب...")
+            self.worker.cancel()
+
+    def set_sync_running(self, running):
+        self.btn_sync.setEnabled(not running)
+        self.btn_clear.setEnabled(not running)
+        self.btn_cancel.setVisible(running)
+        self.progress_bar.setVisible(running)
+        if running:
+            self.progress_bar.setRange(0, 0)
+
+    def on_sync_progress(self, stage, done, total):
+        self.status_lbl.setText(stage)
+        if total > 0:
+            self.progress_bar.setRange(0, total)
+            self.progress_bar.setValue(done)
+        else:
+            self.progress_bar.setRange(0, 0)  # مؤشر انتظار بدون نسبة
+
+    def on_sync_committed(self, saved):
+        if not self.sync_reload.isActive():
+            self.sync_reload.start()
+
+    def reload_after_sync(self):
+        self.load_data()
+        self.data_changed.emit()
+
+    def on_sync_done(self, saved, total, cancelled, report):
+        self.set_sync_running(False)
+        self.sync_reload.stop()
+        self.reload_after_sync()
+        details = "\n".join(report)
+        if cancelled:
+            self.status_lbl.setText("⛔ تم إيقاف السحب")
+            QMessageBox.information(self, "تم الإيقاف", f"تم إيقاف السحب بعد حفظ {saved} بصمة، وسيكمل السحب القادم من حيث توقف.\n\n{details}")
+        else:
             self.status_lbl.setText("✅ تم السحب بنجاح")
-            QMessageBox.information(self, "نجاح", f"تم سحب {len(records)} بصمة وتوزيعها بنجاح.")
-            self.load_data()
-            
-        except Exception as e:
-            self.status_lbl.setText("❌ فشل الإتصال")
-            QMessageBox.warning(self, "خطأ", f"فشل السحب: {str(e)}")
-        finally:
-            if conn:
-                try: conn.enable_device(); conn.disconnect()
-                except: pass
+            QMessageBox.information(self, "نجاح", f"تم سحب {saved} بصمة جديدة وتوزيعها بنجاح (من أصل {total} في الأجهزة).\n\n{details}")
+
+    def on_sync_failed(self, error):
+        self.set_sync_running(False)
+        self.status_lbl.setText("❌ فشل الإتصال")
+        QMessageBox.warning(self, "خطأ", f"فشل السحب: {error}")
+
+    def closeEvent(self, event):
+        # عدم إغلاق النافذة والسحب ما زال يكتب في القاعدة
+        if self.worker is not None and self.worker.isRunning():
+            self.worker.cancel()
+            self.worker.wait()
+        super().closeEvent(event)
 
     def clear_device_logs(self):
+        devices = get_devices(self.config)
         reply = QMessageBox.question(self, 'تأكيد الحذف', 
-                                   'هل أنت متأكد من حذف جميع البصمات من الجهاز؟\n(يجب سحب البيانات أولاً)',
+                                   f'هل أنت متأكد من حذف جميع البصمات من {len(devices)} جهاز؟\n(يجب سحب البيانات أولاً)',
                                    QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         
         if reply == QMessageBox.Yes:
-            zk = ZK(self.config['ip'], port=4370, timeout=10)
-            conn = None
-            try:
-                conn = zk.connect()
-                conn.clear_attendance()
-                QMessageBox.information(self, "تم", "تم تنظيف ذاكرة الجهاز بنجاح.")
-            except Exception as e:
-                QMessageBox.warning(self, "خطأ", f"فشل التنظيف: {str(e)}")
-            finally:
-                if conn: conn.disconnect()
+            results = []
+            for device in devices:
+                zk = ZK(device['ip'], **zk_options(device))
+                conn = None
+                try:
+                    conn = zk.connect()
+                    conn.clear_attendance()
+                    results.append(f"✅ {device['label']} ({device['ip']})")
+                except Exception as e:
+                    results.append(f"❌ {device['label']} ({device['ip']}): {str(e)}")
+                finally:
+                    if conn: conn.disconnect()
+            QMessageBox.information(self, "تم", "نتيجة تنظيف ذاكرة الأجهزة:\n" + "\n".join(results))
+
+    def export_excel(self):
+        """تصدير كل سجل الحضور من القاعدة (وليس المعروض فقط) بذاكرة ثابتة"""
+        path, _ = QFileDialog.getSaveFileName(self, "حفظ Excel", "سجل_الحضور.xlsx", "Excel Files (*.xlsx)")
+        if not path:
+            return
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            count = export_attendance(get_connection(), path, self.model.headers)
+            QApplication.restoreOverrideCursor()
+            QMessageBox.information(self, "تم", f"تم تصدير {count} سجل بنجاح")
+        except Exception as e:
+            QApplication.restoreOverrideCursor()
+            QMessageBox.warning(self, "خطأ", f"فشل التصدير: {e}")
 
     def load_data(self):
         try:
-            conn = sqlite3.connect(get_db_path())
+            conn = get_connection()
             query = """
-                SELECT a.employee_id, COALESCE(e.name, 'غير مسجل'), a.date, a.check_in, a.check_out, a.check_in_2, a.check_out_2 
-                FROM attendance a 
-                LEFT JOIN employees e ON a.employee_id = e.finger_id 
-                ORDER BY a.date DESC, a.employee_id ASC LIMIT 1000
+                SELECT t.employee_id, COALESCE(e.name, 'غير مسجل'), t.day, t.in1, t.out1, t.in2, t.out2
+                FROM attendance_times t
+                LEFT JOIN employees e ON t.employee_id = e.finger_id
+                ORDER BY t.day DESC, t.employee_id ASC LIMIT ?
             """
-            data = conn.execute(query).fetchall()
-            self.table.setRowCount(len(data))
-            for i, row in enumerate(data):
-                for j in range(7):
-                    val = str(row[j]) if row[j] is not None and row[j] != "" else "--"
-                    item = QTableWidgetItem(val)
-                    item.setTextAlignment(Qt.AlignCenter)
-                    if val == "--": item.setForeground(QColor("#bdc3c7"))
-                    self.table.setItem(i, j, item)
-            conn.close()
+            data = conn.execute(query, (ATTENDANCE_VIEW_LIMIT,)).fetchall()
+            # البيانات بالأعمدة في النموذج، والجدول يعرض الصفوف الظاهرة فقط
+            self.model.set_columns(list(zip(*data)) if data else [[]] * 7)
         except Exception as e:
             print(f"Error loading data: {e}")
 
@@ -0,0 +1,378 @@
+"""
+النسخ الاحتياطي للقاعدة أثناء عمل البرنامج.
+
+النسخ بواجهة backup في sqlite على دفعات من الصفحات (BACKUP_PAGES) من داخل معاملة قراءة:
+مع WAL تكون النسخة صورة متسقة من لحظة بدء النسخ، والمزامنة تستمر في الكتابة أثناءه دون أن
+يعاد النسخ من البداية. الصورة تحفظ مضغوطة (gzip) في مجلد backups بجانب القاعدة (وليس حسب
+مجلد التشغيل الحالي) بأحد شكلين:
+- نسخة كاملة (.db.gz): كل الملف، كل FULL_EVERY_DAYS أيام أو عند عدم وجود نسخة كاملة.
+- نسخة فرقية (.inc.gz): الصفحات التي تغيرت منذ آخر نسخة كاملة فقط (مقارنة بصمة كل صفحة
+  بالبصمات المحفوظة في BASE_PAGES)، فيتبع حجمها حجم التغيير وليس حجم القاعدة.
+  تتطلب للاسترجاع نسختها الكاملة فقط (وليس سلسلة نسخ)، وإذا تغيرت أكثر من FULL_RATIO من
+  الصفحات تحفظ نسخة كاملة بدلاً منها.
+المزامنة تكتب في صفحات متفرقة من الجداول (آخر صفحة لكل موظف)، فيوم مزامنة لـ 800 موظف غير
+حوالي ربع صفحات قاعدة سنة كاملة: التوفير في النسخ الفرقية يكبر مع حجم القاعدة وليس كبيراً
+في القواعد الصغيرة، والضغط والقراءة ما زالا يمران على الملف كله في كل نسخة.
+
+ملفات أرشيف السنوات المنتهية (archive.py) ليست في القاعدة: ينسخ كل ملف منها مضغوطاً إلى
+backups/archive عند أول نسخة بعد إنشائه وكلما تغير (الحجم ووقت التعديل)، قبل حفظ نسخة القاعدة
+التي تشير إليه. بيانات السنة المؤرشفة لا تتغير بعد الأرشفة (فقط ملخصها يعاد حسابه عند تغير
+الإعدادات)، فنسخة واحدة لكل ملف تكفي كل نسخ القاعدة.
+
+النسخ الزائدة تحذف حسب سياسة الاحتفاظ: كل نسخ آخر KEEP_RECENT_HOURS ساعة، وأحدث نسخة لكل يوم
+من آخر KEEP_DAILY أيام، ولكل أسبوع من آخر KEEP_WEEKLY أسابيع، ولكل شهر من آخر KEEP_MONTHLY
+شهراً، مع النسخ الكاملة التي تحتاجها النسخ الفرقية المحتفظ بها.
+النسخ التلقائي لا ينشئ نسخة جديدة إذا لم تتغير البيانات منذ آخر نسخة (رقم إصدار البيانات).
+
+الاسترجاع (والبرنامج مغلق)، مع ملفات الأرشيف التي تشير إليها النسخة في مجلد archive بجانبها:
+    python -m backup restore backups/backup_20250101_120000.inc.gz attendance.db
+"""
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+import time
+from datetime import datetime, timedelta
+from archive import ARCHIVE_DIR
+from database import connect, get_db_path
+from daily_summary import data_version
+
+BACKUP_PAGES = 2048      # عدد الصفحات في كل دفعة (8 ميجابايت بحجم الصفحة 4096)
+COMPRESS_LEVEL = 1       # أسرع بثلاث مرات من 6 والحجم أكبر بحوالي 3% فقط لصفحات القاعدة
+COPY_CHUNK = 1 << 20     # حجم القراءة عند الضغط (1 ميجابايت)
+KEEP_RECENT_HOURS = 24
+KEEP_DAILY, KEEP_WEEKLY, KEEP_MONTHLY = 7, 4, 12
+FULL_EVERY_DAYS = 7      # عمر النسخة الكاملة الذي تنشأ بعده نسخة كاملة جديدة
+FULL_RATIO = 0.5         # نسبة الصفحات المتغيرة التي تصبح بعدها النسخة الكاملة أفضل
+FULL_FORMAT = "backup_%Y%m%d_%H%M%S.db.gz"
+DELTA_FORMAT = "backup_%Y%m%d_%H%M%S.inc.gz"
+STATE_FILE = "last_backup.json"  # رقم إصدار البيانات في آخر نسخة، وآخر نسخة كاملة، وملفات الأرشيف المنسوخة
+BASE_PAGES = "base_pages.bin"    # بصمات صفحات آخر نسخة كاملة (16 بايت لكل صفحة)
+PAGE_DIGEST = 16
+PAGE_NUMBER = struct.Struct(">I")
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def backup_dir(db_path=None):
+    return os.path.join(os.path.dirname(db_path or get_db_path()), "backups")
+
+
+def is_full(path):
+    return path.endswith(".db.gz")
+
+
+def list_backups(directory):
+    """(وقت النسخة، المسار) لكل نسخة كاملة أو فرقية في المجلد، الأحدث أولاً"""
+    backups = []
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            for fmt in (FULL_FORMAT, DELTA_FORMAT):
+                try:
+                    backups.append((datetime.strptime(name, fmt), os.path.join(directory, name)))
+                except ValueError:
+                    pass
+    return sorted(backups, reverse=True)
+
+
+def backup_due(hours, directory=None):
+    """هل مضى على آخر نسخة عدد الساعات المحدد (أو لا توجد نسخ)"""
+    backups = list_backups(directory or backup_dir())
+    return not backups or datetime.now() - backups[0][0] >= timedelta(hours=hours)
+
+
+def _load_state(directory):
+    try:
+        with open(os.path.join(directory, STATE_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(directory, **state):
+    with open(os.path.join(directory, STATE_FILE), "w", encoding="utf-8") as f:
+        json.dump(state, f)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _page_digests(path, page_size, progress=None):
+    """بصمات صفحات الملف متتالية (PAGE_DIGEST بايت لكل صفحة)"""
+    digests = bytearray()
+    total = os.path.getsize(path) // page_size
+    with open(path, "rb") as f:
+        for n in range(total):
+            digests += hashlib.blake2b(f.read(page_size), digest_size=PAGE_DIGEST).digest()
+            if progress is not None and n % BACKUP_PAGES == 0 and progress("مقارنة الصفحات", n, total) is False:
+                return None
+    return bytes(digests)
+
+
+def _compress(src, dest, progress=None):
+    """ضغط الملف بالتدريج؛ يعيد False إذا تم الإيقاف"""
+    total = os.path.getsize(src) // 1024
+    with open(src, "rb") as f, gzip.open(dest, "wb", compresslevel=COMPRESS_LEVEL) as gz:
+        while True:
+            chunk = f.read(COPY_CHUNK)
+            if not chunk:
+                return True
+            gz.write(chunk)
+            if progress is not None and progress("ضغط النسخة", f.tell() // 1024, total) is False:
+                return False
+
+
+def _write_delta(src, dest, base, page_size, pages, changed, progress=None):
+    """حفظ الصفحات changed من الملف: سطر JSON ثم (رقم الصفحة، محتواها) لكل صفحة؛ False إذا تم الإيقاف"""
+    header = {"base": base, "page_size": page_size, "pages": pages, "changed": len(changed)}
+    with open(src, "rb") as f, gzip.open(dest, "wb", compresslevel=COMPRESS_LEVEL) as gz:
+        gz.write(json.dumps(header).encode("utf-8") + b"\n")
+        for i, n in enumerate(changed):
+            f.seek(n * page_size)
+            gz.write(PAGE_NUMBER.pack(n) + f.read(page_size))
+            if progress is not None and i % BACKUP_PAGES == 0 and progress("ضغط الصفحات المتغيرة", i, len(changed)) is False:
+                return False
+    return True
+
+
+def _copy_database(path, tmp, progress, stage):
+    """نسخ ملف قاعدة بواجهة backup؛ يعيد False إذا تم الإيقاف"""
+    def step(status, remaining, total):
+        if progress is not None and progress(stage, total - remaining, total) is False:
+            raise _Cancelled()
+
+    src = sqlite3.connect(path)
+    dst = sqlite3.connect(tmp)
+    try:
+        dst.execute("PRAGMA synchronous = OFF")
+        src.backup(dst, pages=BACKUP_PAGES, progress=step, sleep=0)
+        return True
+    except _Cancelled:
+        return False
+    finally:
+        dst.close()
+        src.close()
+
+
+def _backup_archives(db_path, directory, files, saved, progress=None):
+    """
+    نسخ ملفات الأرشيف files الجديدة أو المتغيرة منذ آخر نسخة (saved: {الملف: [الحجم، وقت التعديل]})
+    إلى backups/archive؛ يعيد الحالة الجديدة، أو None إذا تم الإيقاف.
+    """
+    source_dir = os.path.join(os.path.dirname(db_path), ARCHIVE_DIR)
+    target_dir = os.path.join(directory, ARCHIVE_DIR)
+    os.makedirs(target_dir, exist_ok=True)
+    result = {}
+    for name in files:
+        source = os.path.join(source_dir, name)
+        stat = os.stat(source)  # ملف أرشيف مسجل وغير موجود: خطأ بدلاً من نسخة ناقصة
+        signature = [stat.st_size, stat.st_mtime_ns]
+        target = os.path.join(target_dir, name + ".gz")
+        if saved.get(name) != signature or not os.path.exists(target):
+            tmp = os.path.join(directory, "archive.tmp")
+            try:
+                if not _copy_database(source, tmp, progress, f"نسخ أرشيف {name}"):
+                    return None
+                if not _compress(tmp, target + ".part", progress):
+                    _remove(target + ".part")
+                    return None
+                os.replace(target + ".part", target)
+            finally:
+                _remove(tmp)
+        result[name] = signature
+    return result
+
+
+def _restore_archives(dest, directory):
+    """استرجاع ملفات الأرشيف التي تشير إليها القاعدة dest من مجلد النسخ directory"""
+    conn = sqlite3.connect(dest)
+    try:
+        files = [r[0] for r in conn.execute("SELECT file FROM archived_years").fetchall()]
+    finally:
+        conn.close()
+    missing = [name for name in files if not os.path.exists(os.path.join(directory, ARCHIVE_DIR, name + ".gz"))]
+    if missing:
+        raise FileNotFoundError(f"نسخ ملفات الأرشيف غير موجودة: {', '.join(missing)}")
+    target_dir = os.path.join(os.path.dirname(os.path.abspath(dest)), ARCHIVE_DIR)
+    os.makedirs(target_dir, exist_ok=True)
+    for name in files:
+        _gunzip(os.path.join(directory, ARCHIVE_DIR, name + ".gz"), os.path.join(target_dir, name))
+    return files
+
+
+def create_backup(db_path=None, directory=None, force=False, progress=None):
+    """
+    نسخة مضغوطة من القاعدة، كاملة أو فرقية؛ تعيد مسارها، أو None إذا لم تتغير البيانات منذ
+    آخر نسخة (إلا مع force) أو تم الإيقاف.
+    progress(المرحلة، المنجز، الإجمالي): إذا أعادت False يتوقف النسخ ويحذف الملف الناقص.
+    """
+    db_path = db_path or get_db_path()
+    directory = directory or backup_dir(db_path)
+    os.makedirs(directory, exist_ok=True)
+    state = _load_state(directory)
+    start = time.perf_counter()
+    tmp = os.path.join(directory, "backup.tmp")
+
+    def step(status, remaining, total):
+        if progress is not None and progress("نسخ القاعدة", total - remaining, total) is False:
+            raise _Cancelled()
+
+    src = connect(db_path)
+    src.isolation_level = None
+    try:
+        # معاملة القراءة تثبت صورة القاعدة حتى نهاية النسخ
+        src.execute("BEGIN")
+        version = data_version(src)
+        archives = [r[0] for r in src.execute("SELECT file FROM archived_years").fetchall()]
+        last = state.get("file")
+        if not force and last and state.get("version") == version and os.path.exists(os.path.join(directory, last)):
+            return None
+        page_size = src.execute("PRAGMA page_size").fetchone()[0]
+        taken = datetime.now()
+        dst = sqlite3.connect(tmp)
+        try:
+            dst.execute("PRAGMA synchronous = OFF")  # ملف مؤقت يضغط بعد النسخ
+            src.backup(dst, pages=BACKUP_PAGES, progress=step, sleep=0)
+        finally:
+            dst.close()
+    except _Cancelled:
+        _remove(tmp)
+        return None
+    finally:
+        src.close()
+
+    try:
+        # ملفات الأرشيف التي تشير إليها الصورة تنسخ قبل حفظها، فكل نسخة محفوظة تسترجع كاملة
+        saved_archives = _backup_archives(db_path, directory, archives, state.get("archives", {}), progress)
+        if saved_archives is None:
+            return None
+        digests = _page_digests(tmp, page_size, progress)
+        if digests is None:
+            return None
+        pages = len(digests) // PAGE_DIGEST
+        base = state.get("base")
+        changed = None
+        try:
+            with open(os.path.join(directory, BASE_PAGES), "rb") as f:
+                base_digests = f.read()
+            if (base and os.path.exists(os.path.join(directory, base)) and state.get("page_size") == page_size
+                    and taken - datetime.strptime(base, FULL_FORMAT) < timedelta(days=FULL_EVERY_DAYS)):
+                changed = [n for n in range(pages)
+                           if digests[n * PAGE_DIGEST:(n + 1) * PAGE_DIGEST] != base_digests[n * PAGE_DIGEST:(n + 1) * PAGE_DIGEST]]
+        except OSError:
+            pass
+        full = changed is None or len(changed) > FULL_RATIO * pages
+
+        name = taken.strftime(FULL_FORMAT if full else DELTA_FORMAT)
+        path = os.path.join(directory, name)
+        if full:
+            done = _compress(tmp, path + ".part", progress)
+        else:
+            done = _write_delta(tmp, path + ".part", base, page_size, pages, changed, progress)
+        if not done:
+            _remove(path + ".part")
+            return None
+        os.replace(path + ".part", path)
+    finally:
+        _remove(tmp)
+    if full:
+        base = name
+        with open(os.path.join(directory, BASE_PAGES), "wb") as f:
+            f.write(digests)
+    _save_state(directory, version=version, file=name, base=base, page_size=page_size, archives=saved_archives)
+    removed = rotate(directory)
+    kind = "كاملة" if full else f"فرقية ({len(changed)} من {pages} صفحة)"
+    print(f"💾 نسخة احتياطية {kind}: {name} ({os.path.getsize(path) / 1e6:.1f} ميجابايت) خلال "
+          f"{time.perf_counter() - start:.1f} ثانية | حذف {removed} نسخة قديمة")
+    return path
+
+
+def _base_of(backups, taken):
+    """النسخة الكاملة التي تعتمد عليها نسخة فرقية: آخر نسخة كاملة قبلها"""
+    for t, path in backups:
+        if t < taken and is_full(path):
+            return path
+    return None
+
+
+def rotate(directory):
+    """حذف النسخ خارج سياسة الاحتفاظ؛ يعيد عدد النسخ المحذوفة"""
+    backups = list_backups(directory)
+    recent = datetime.now() - timedelta(hours=KEEP_RECENT_HOURS)
+    keep = {path for taken, path in backups if taken >= recent}
+    for count, bucket in ((KEEP_DAILY, lambda t: t.date()),
+                          (KEEP_WEEKLY, lambda t: t.isocalendar()[:2]),
+                          (KEEP_MONTHLY, lambda t: (t.year, t.month))):
+        seen = set()
+        for taken, path in backups:  # الأحدث أولاً: أول نسخة في كل فترة هي آخر نسخة فيها
+            b = bucket(taken)
+            if b in seen:
+                continue
+            if len(seen) == count:
+                break
+            seen.add(b)
+            keep.add(path)
+    # النسخة الفرقية لا تسترجع بدون نسختها الكاملة
+    keep |= {_base_of(backups, taken) for taken, path in backups if path in keep and not is_full(path)} - {None}
+    removed = 0
+    for taken, path in backups:
+        if path not in keep:
+            _remove(path)
+            removed += 1
+    return removed
+
+
+def _gunzip(src, dest):
+    with gzip.open(src, "rb") as gz, open(dest, "wb") as f:
+        while True:
+            chunk = gz.read(COPY_CHUNK)
+            if not chunk:
+                break
+            f.write(chunk)
+
+
+def restore_backup(path, dest):
+    """
+    كتابة القاعدة كما كانت في النسخة path (كاملة أو فرقية مع نسختها الكاملة) إلى الملف dest،
+    وملفات الأرشيف التي تشير إليها إلى مجلد archive بجانبه.
+    """
+    if is_full(path):
+        _gunzip(path, dest)
+    else:
+        _apply_delta(path, dest)
+    _restore_archives(dest, os.path.dirname(path))
+    return dest
+
+
+def _apply_delta(path, dest):
+    with gzip.open(path, "rb") as gz:
+        header = json.loads(gz.readline())
+        base = os.path.join(os.path.dirname(path), header["base"])
+        if not os.path.exists(base):
+            raise FileNotFoundError(f"النسخة الكاملة {header['base']} التي تعتمد عليها النسخة غير موجودة")
+        _gunzip(base, dest)
+        page_size = header["page_size"]
+        with open(dest, "r+b") as f:
+            while True:
+                number = gz.read(PAGE_NUMBER.size)
+                if not number:
+                    break
+                f.seek(PAGE_NUMBER.unpack(number)[0] * page_size)
+                f.write(gz.read(page_size))
+            f.truncate(header["pages"] * page_size)
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) == 4 and sys.argv[1] == "restore":
+        print(f"✅ تم الاسترجاع إلى {restore_backup(sys.argv[2], sys.argv[3])}")
+    else:
+        print("الاستخدام: python -m backup restore <ملف النسخة> <ملف القاعدة>")
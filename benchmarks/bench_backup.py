@@ -0,0 +1,83 @@
+"""
+قياس النسخ الاحتياطي (كاملة ثم فرقية بعد يوم مزامنة) والتحقق من الاسترجاع: قاعدة بسنة مؤرشفة،
+وكل نسخة تسترجع في مجلد جديد ويقارن التقرير العام للفترة كلها (السنة المؤرشفة والحالية)
+بتقرير القاعدة وقت النسخ.
+
+التشغيل:
+    python benchmarks/bench_backup.py --employees 800 --days 600
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from archive import archive_year
+from backup import create_backup, restore_backup
+from bench_general_report import make_db
+from database import connect
+from migrations import migrate
+from report_engine import PERIOD_BOTH, general_report
+from sync_engine import merge_punches
+from work_calendar import WorkCalendar
+
+START = date(2024, 1, 1)
+
+
+def report(path, d1, d2, holidays):
+    conn = connect(path)
+    try:
+        return general_report(conn, d1, d2, PERIOD_BOTH, "08:00", "20:00", WorkCalendar(holidays))
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--employees", type=int, default=800)
+    parser.add_argument("--days", type=int, default=600, help="أيام الحضور من 2024-01-01 (أكثر من 366 لسنة مؤرشفة)")
+    args = parser.parse_args()
+
+    mem, holidays = make_db(args.employees, args.days)
+    migrate(mem)
+    work = tempfile.mkdtemp()
+    db_path = os.path.join(work, "attendance.db")
+    disk = sqlite3.connect(db_path)
+    mem.backup(disk)
+    disk.close()
+    conn = connect(db_path)
+    archive_year(conn, START.year)
+    conn.close()
+    d1, last = START, START + timedelta(days=args.days)
+
+    def timed_backup():
+        start = time.perf_counter()
+        path = create_backup(db_path)
+        return path, time.perf_counter() - start, report(db_path, d1, last, holidays)
+
+    backups = [timed_backup()]
+    # يوم مزامنة لكل الموظفين بعد النسخة الكاملة
+    conn = connect(db_path)
+    merge_punches(conn, [(e, last.isoformat(), f"07:{e % 60:02d}", 1) for e in range(1, args.employees + 1)])
+    conn.commit()
+    conn.close()
+    backups.append(timed_backup())
+
+    print(f"database: {os.path.getsize(db_path) / 1e6:.1f} MB + archive "
+          f"{os.path.getsize(os.path.join(work, 'archive', f'attendance_{START.year}.db')) / 1e6:.1f} MB")
+    for path, elapsed, expected in backups:
+        target = os.path.join(tempfile.mkdtemp(), "attendance.db")
+        start = time.perf_counter()
+        restore_backup(path, target)
+        restore_t = time.perf_counter() - start
+        assert report(target, d1, last, holidays) == expected, f"التقرير بعد استرجاع {os.path.basename(path)} يختلف"
+        print(f"{os.path.basename(path):>32}: {os.path.getsize(path) / 1e6:6.1f} MB | backup {elapsed:5.2f} s | "
+              f"restore {restore_t:5.2f} s | report totals OK")
+    print(f"archive copies: {os.listdir(os.path.join(work, 'backups', 'archive'))}")
+
+
+if __name__ == "__main__":
+    main()
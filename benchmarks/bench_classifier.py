@@ -0,0 +1,84 @@
+"""
+مقارنة تكلفة تصنيف البصمة الواحدة: الطريقة السابقة (strptime ست مرات لكل بصمة)
+مقابل جدول الدقائق في shift_classifier (بصمة بصمة، ودفعة واحدة).
+
+التشغيل:
+    python benchmarks/bench_classifier.py --punches 200000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shift_classifier import ShiftClassifier
+
+CONFIG = {"in_limit_1": "08:00", "out_limit_1": "14:00", "in_limit_2": "20:00", "out_limit_2": "01:00"}
+
+
+def legacy_is_time_between(target_str, start_str, end_str):
+    """نسخة مرجعية من AttendanceWindow.is_time_between السابقة"""
+    fmt = '%H:%M'
+    try:
+        target = datetime.strptime(target_str, fmt).time()
+        start = datetime.strptime(start_str, fmt).time()
+        end = datetime.strptime(end_str, fmt).time()
+        if start <= end:
+            return start <= target <= end
+        else:
+            return target >= start or target <= end
+    except: return False
+
+
+def legacy_classify(times):
+    out = []
+    for t_str in times:
+        if legacy_is_time_between(t_str, CONFIG['in_limit_1'], CONFIG['out_limit_1']):
+            out.append(1)
+        elif legacy_is_time_between(t_str, CONFIG['in_limit_2'], CONFIG['out_limit_2']):
+            out.append(2)
+        else:
+            out.append(0)
+    return out
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--punches", type=int, default=200000)
+    args = parser.parse_args()
+
+    rnd = random.Random(1)
+    minutes = [rnd.randrange(1440) for _ in range(args.punches)]
+    times = [f"{m // 60:02d}:{m % 60:02d}" for m in minutes]
+    n = args.punches
+
+    build_t, classifier = timed(ShiftClassifier, ShiftClassifier.from_settings(CONFIG).windows)
+    legacy_t, expected = timed(legacy_classify, times)
+    single_t, single = timed(lambda: [classifier.classify_minute(m) for m in minutes])
+    batch_t, batch = timed(classifier.classify_batch, minutes)
+    assert expected == single == list(batch), "نتيجة التصنيف تختلف عن الطريقة السابقة"
+
+    print(f"build lookup table: {build_t * 1000:.2f} ms")
+    print(f"legacy strptime   : {legacy_t / n * 1e9:8.0f} ns/punch")
+    print(f"lookup per punch  : {single_t / n * 1e9:8.0f} ns/punch")
+    print(f"lookup batch      : {batch_t / n * 1e9:8.0f} ns/punch")
+    try:
+        import numpy as np
+        arr = np.array(minutes, dtype=np.int16)
+        np_t, np_res = timed(classifier.classify_batch, arr)
+        assert expected == np_res.tolist()
+        print(f"lookup numpy batch: {np_t / n * 1e9:8.0f} ns/punch")
+    except ImportError:
+        pass
+
+
+if __name__ == "__main__":
+    main()
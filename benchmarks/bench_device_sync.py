@@ -0,0 +1,91 @@
+"""
+قياس مسار السحب كاملاً (الإتصال، التحميل، التصنيف، الحفظ) ثم تنظيف ذاكرة الجهاز
+مقابل محاكي جهاز البصمة المحلي zk_simulator بدلاً من جهاز حقيقي.
+
+التشغيل:
+    python benchmarks/bench_device_sync.py --records 100000 --devices 2 --latency 0.002 --loss 0.0 --udp
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from zk import ZK
+import attendance
+from attendance import SyncWorker
+from migrations import migrate
+from sync_engine import get_devices, zk_options
+from zk_simulator import SimulatedDevice, ZKSimulator
+
+CONFIG = {"in_limit_1": "07:00", "out_limit_1": "14:30", "in_limit_2": "19:30", "out_limit_2": "01:30"}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=100000, help="عدد البصمات في كل جهاز")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--devices", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--udp", action="store_true", help="الإتصال عبر UDP بدلاً من TCP")
+    args = parser.parse_args()
+
+    simulators = [ZKSimulator(SimulatedDevice(args.records, args.users, seed=i + 1), port=0,
+                              latency=args.latency, loss=args.loss).start()
+                  for i in range(args.devices)]
+    config = dict(CONFIG, devices=[{"ip": "127.0.0.1", "port": s.port, "timeout": 30, "label": f"محاكي {i + 1}",
+                                    "udp": args.udp, "ping": False} for i, s in enumerate(simulators)])
+    db_path = os.path.join(tempfile.mkdtemp(), "attendance.db")
+    db = sqlite3.connect(db_path)
+    migrate(db)
+    db.close()
+
+    result = {}
+    worker = SyncWorker(config, db_path=db_path)
+    worker.sync_done.connect(lambda saved, total, cancelled, report: result.update(saved=saved, total=total, report=report))
+    worker.failed.connect(lambda error: result.update(error=error))
+    start = time.perf_counter()
+    worker.run()  # في نفس الخيط، بدون حلقة أحداث
+    elapsed = time.perf_counter() - start
+
+    try:
+        if "error" in result:
+            sys.exit(f"sync failed: {result['error']}")
+        for line in result["report"]:
+            print(line)
+        print(f"sync: {result['saved']} / {result['total']} punches in {elapsed:.2f} s "
+              f"({result['saved'] / elapsed:.0f} punches/s)")
+
+        # السحب الثاني لا يضيف شيئاً (علامة آخر بصمة لكل جهاز)، بعامل منشأ كما في نافذة الحضور
+        # بدون db_path: المسار الافتراضي للقاعدة يوجه إلى قاعدة القياس
+        attendance.get_db_path = lambda: db_path
+        result.clear()
+        worker = SyncWorker(config)
+        worker.sync_done.connect(lambda saved, total, cancelled, report: result.update(saved=saved, total=total, report=report))
+        worker.failed.connect(lambda error: result.update(error=error))
+        worker.run()
+        assert "error" not in result, f"فشل السحب بدون db_path: {result.get('error')}"
+        assert result["saved"] == 0, "السحب الثاني أعاد حفظ بصمات سابقة"
+
+        start = time.perf_counter()
+        for device in get_devices(config):
+            conn = ZK(device['ip'], **zk_options(device)).connect()
+            try:
+                conn.clear_attendance()
+                conn.read_sizes()
+                assert conn.records == 0, "لم يتم حذف البصمات من المحاكي"
+            finally:
+                conn.disconnect()
+        print(f"clear: {args.devices} device(s) in {time.perf_counter() - start:.2f} s")
+        print(f"packets sent: {sum(s.stats['packets'] for s in simulators)}, "
+              f"dropped: {sum(s.stats['dropped'] for s in simulators)}")
+    finally:
+        for s in simulators:
+            s.stop()
+
+
+if __name__ == "__main__":
+    main()
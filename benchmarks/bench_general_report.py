@@ -0,0 +1,231 @@
+"""
+مقارنة زمن التقرير العام: الطريقة السابقة (استعلام لكل موظف ثم المرور على كل الأيام)
+مقابل report_engine.general_report من الملخص اليومي، مع التحقق من تطابق النتائج لكل
+خيارات الفترة (البيانات تتضمن قيماً غير معتادة مثل "--" و "08:05:30" و " 9:7")،
+وكذلك تطابق الكشف التفصيلي individual_report لعينة من الموظفين.
+البيانات تنشأ بالمخطط النصي السابق ثم تتم ترقيتها إلى أوقات الحضور بالأرقام (الإصدار 6)،
+مع قياس زمن الترقية وحجم الجدول قبلها وبعدها، والطريقة السابقة تقرأ من العرض attendance.
+بعد ذلك يتم التحقق من التحديث التدريجي للملخص: دمج بصمات جديدة، إضافة إجازة،
+وتغيير بداية الدوام والعطلة الأسبوعية، ثم الحفظ المؤقت للتقارير (report_cache) وتفريغه بعد المزامنة.
+
+التشغيل:
+    python benchmarks/bench_general_report.py --employees 800 --days 365
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from migrations import MIGRATIONS, migrate
+from sync_engine import merge_punches
+from work_calendar import WorkCalendar
+from report_engine import (calculate_delay, general_report, individual_report, cached_general_report, report_cache, PERIOD_BOTH, PERIOD_FIRST,
+                           PERIOD_SECOND, DAY_PRESENT, DAY_ABSENT, DAY_HOLIDAY, DAY_WEEKEND)
+
+WORK_START_1, WORK_START_2 = "08:00", "20:00"
+ODD_VALUES = ["--", "0", "", "00:00:00", "None", " 9:7", "08:05:30", "abc", "8:15", None]
+
+
+def make_db(employees, days, seed=5):
+    """قاعدة بالمخطط النصي السابق (حتى الإصدار 5)، تتم ترقيتها في main"""
+    rnd = random.Random(seed)
+    db = sqlite3.connect(":memory:")
+    cur = db.cursor()
+    for version, _, step in MIGRATIONS:
+        if version < 6:
+            step(cur)
+    db.execute("PRAGMA user_version = 5")
+    db.executemany("INSERT INTO employees (finger_id, name, active) VALUES (?, ?, ?)",
+                   [(i, f"موظف {i}", 0 if i % 50 == 0 else 1) for i in range(1, employees + 1)])
+    start = date(2024, 1, 1)
+    rows = []
+    for d in range(days):
+        day = (start + timedelta(days=d)).isoformat()
+        for emp in range(1, employees + 1):
+            if rnd.random() < 0.1:
+                continue  # غياب
+            values = []
+            for base in (7 * 60 + 45, 19 * 60 + 50):
+                if rnd.random() < 0.02:
+                    values.append(rnd.choice(ODD_VALUES))
+                elif rnd.random() < 0.15:
+                    values.append(None)
+                else:
+                    m = base + rnd.randint(0, 40)
+                    values.append(f"{m // 60 % 24:02d}:{m % 60:02d}")
+            rows.append((emp, day, values[0], values[1]))
+    db.executemany("INSERT INTO attendance (employee_id, date, check_in, check_in_2) VALUES (?, ?, ?, ?)", rows)
+    holidays = [(start + timedelta(days=d)).isoformat() for d in range(0, days, 37)]
+    db.executemany("INSERT INTO holidays VALUES (?)", [(h,) for h in holidays])
+    db.commit()
+    return db, holidays
+
+
+def table_bytes(db, names):
+    """حجم الجداول وفهارسها في الملف (يتطلب dbstat في مكتبة sqlite)"""
+    try:
+        return db.execute(f"""
+            SELECT SUM(pgsize) FROM dbstat WHERE name IN ({", ".join("?" * len(names))})
+               OR name IN (SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name IN ({", ".join("?" * len(names))}))
+        """, names + names).fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+
+
+def legacy_report(conn, d1, d2, period_choice, holidays, starts=(WORK_START_1, WORK_START_2), weekend=(4, 5)):
+    """نسخة مرجعية من ReportsWindow.load_general_data السابقة (بدون الجدول)"""
+    out = []
+    emps = conn.execute("SELECT finger_id, name FROM employees WHERE active=1").fetchall()
+    for f_id, name in emps:
+        query = "SELECT date, check_in, check_in_2 FROM attendance WHERE employee_id=? AND date BETWEEN ? AND ?"
+        att_dict = {r[0]: (r[1], r[2]) for r in conn.execute(query, (f_id, d1.isoformat(), d2.isoformat())).fetchall()}
+        pres, ab_days, delay_f1, delay_f2 = 0, 0, 0, 0
+        curr = d1
+        while curr <= d2:
+            d_str = curr.isoformat()
+            if d_str not in holidays and curr.weekday() not in weekend:
+                day = att_dict.get(d_str)
+                cin1 = day[0] if day and day[0] not in ["0", "--", None, "00:00:00"] else None
+                cin2 = day[1] if day and day[1] not in ["0", "--", None, "00:00:00"] else None
+                m1 = calculate_delay(cin1, starts[0]) if cin1 else 0
+                m2 = calculate_delay(cin2, starts[1]) if cin2 else 0
+                if period_choice == PERIOD_FIRST:
+                    is_p = bool(cin1)
+                    if is_p: delay_f1 += m1
+                elif period_choice == PERIOD_SECOND:
+                    is_p = bool(cin2)
+                    if is_p: delay_f2 += m2
+                else:
+                    is_p = bool(cin1 or cin2)
+                    if is_p:
+                        delay_f1 += m1
+                        delay_f2 += m2
+                if is_p: pres += 1
+                else: ab_days += 1
+            curr += timedelta(days=1)
+        out.append((f_id, name, pres, ab_days, delay_f1, delay_f2))
+    return out
+
+
+def legacy_individual(conn, eid, d1, d2, period_choice, holidays, starts=(WORK_START_1, WORK_START_2), weekend=(4, 5)):
+    """نسخة مرجعية من ReportsWindow.load_individual_data السابقة (بدون الجدول)"""
+    query = "SELECT date, check_in, check_in_2 FROM attendance WHERE employee_id=? AND date BETWEEN ? AND ?"
+    att = {r[0]: (r[1], r[2]) for r in conn.execute(query, (eid, d1.isoformat(), d2.isoformat())).fetchall()}
+    out = []
+    curr = d1
+    while curr <= d2:
+        d_str = curr.isoformat()
+        if d_str in holidays:
+            out.append((d_str, DAY_HOLIDAY, "--", 0, "--", 0, 0))
+        elif curr.weekday() in weekend:
+            out.append((d_str, DAY_WEEKEND, "--", 0, "--", 0, 0))
+        else:
+            day = att.get(d_str)
+            cin1 = day[0] if day and day[0] not in ["0", "--", None, "00:00:00"] else None
+            cin2 = day[1] if day and day[1] not in ["0", "--", None, "00:00:00"] else None
+            m1 = calculate_delay(cin1, starts[0]) if cin1 else 0
+            m2 = calculate_delay(cin2, starts[1]) if cin2 else 0
+            if period_choice == PERIOD_FIRST:
+                row = (str(cin1 or "--"), m1, "--", 0, m1, bool(cin1))
+            elif period_choice == PERIOD_SECOND:
+                row = ("--", 0, str(cin2 or "--"), m2, m2, bool(cin2))
+            else:
+                row = (str(cin1 or "--"), m1, str(cin2 or "--"), m2, m1 + m2, bool(cin1 or cin2))
+            out.append((d_str, DAY_PRESENT if row[5] else DAY_ABSENT) + row[:5])
+        curr += timedelta(days=1)
+    return out
+
+
+def check(db, d1, d2, holidays, starts, employees, show=True, weekend=(4, 5)):
+    """مقارنة نتائج المحرك مع الطريقة السابقة لكل خيارات الفترة"""
+    calendar = WorkCalendar(holidays, weekend)
+    for choice in (PERIOD_BOTH, PERIOD_FIRST, PERIOD_SECOND):
+        start = time.perf_counter()
+        expected = legacy_report(db, d1, d2, choice, holidays, starts, weekend)
+        legacy_t = time.perf_counter() - start
+        start = time.perf_counter()
+        result = general_report(db, d1, d2, choice, starts[0], starts[1], calendar)
+        engine_t = time.perf_counter() - start
+        assert result == expected, f"نتيجة التقرير تختلف عن الطريقة السابقة ({choice})"
+        if show:
+            print(f"{choice:>20}: legacy {legacy_t:6.2f} s | engine {engine_t:6.3f} s | {legacy_t / engine_t:5.1f}x")
+        for eid in range(1, employees + 1, max(1, employees // 20)):
+            assert individual_report(db, eid, d1, d2, choice, starts[0], starts[1], calendar) == \
+                legacy_individual(db, eid, d1, d2, choice, holidays, starts, weekend), f"الكشف التفصيلي يختلف ({choice}, {eid})"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--employees", type=int, default=800)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    db, holidays = make_db(args.employees, args.days)
+    d1, d2 = date(2024, 1, 1), date(2024, 1, 1) + timedelta(days=args.days - 1)
+    starts = (WORK_START_1, WORK_START_2)
+
+    # 0. الترقية من النصوص: نفس نتيجة الطريقة السابقة قبلها (الجدول) وبعدها (العرض)
+    before = {choice: legacy_report(db, d1, d2, choice, holidays) for choice in (PERIOD_BOTH, PERIOD_FIRST, PERIOD_SECOND)}
+    db.execute("VACUUM")
+    text_size = table_bytes(db, ["attendance"])
+    start = time.perf_counter()
+    migrate(db)
+    migrate_t = time.perf_counter() - start
+    db.execute("VACUUM")
+    int_size = table_bytes(db, ["attendance_times"])
+    rows = db.execute("SELECT COUNT(*) FROM attendance_times").fetchone()[0]
+    sizes = f" | {text_size / rows:.1f} -> {int_size / rows:.1f} bytes/row" if text_size and int_size else ""
+    print(f"migrate {rows} rows to integer times: {migrate_t:.3f} s{sizes}")
+    for choice, expected in before.items():
+        assert legacy_report(db, d1, d2, choice, holidays) == expected, f"نتيجة التقرير تغيرت بعد الترقية ({choice})"
+    check(db, d1, d2, holidays, starts, args.employees)
+
+    # 1. دمج بصمات جديدة لبعض الأيام: يعاد حساب الأيام التي تغيرت فقط
+    rnd = random.Random(9)
+    punches = [(emp, (d1 + timedelta(days=rnd.randrange(args.days))).isoformat(), f"{rnd.randint(6, 9):02d}:{rnd.randint(0, 59):02d}", 1)
+               for emp in range(1, args.employees + 1, 7)]
+    start = time.perf_counter()
+    merge_punches(db, punches)
+    db.commit()
+    print(f"merge {len(punches)} punches + summary refresh: {time.perf_counter() - start:.3f} s")
+    check(db, d1, d2, holidays, starts, args.employees, show=False)
+
+    # 2. إجازة جديدة: يتغير يوم العمل لهذا اليوم فقط
+    holiday = (d1 + timedelta(days=args.days // 2)).isoformat()
+    db.execute("INSERT OR IGNORE INTO holidays VALUES (?)", (holiday,))
+    db.commit()
+    holidays = holidays + [holiday]
+    check(db, d1, d2, holidays, starts, args.employees, show=False)
+
+    # 3. تغيير بداية الدوام: تعديل التأخير في الصفوف التي تتغير فقط
+    starts = ("07:50", "19:40")
+    start = time.perf_counter()
+    general_report(db, d1, d2, PERIOD_BOTH, starts[0], starts[1], WorkCalendar(holidays))
+    print(f"report after work start change (incl. summary update): {time.perf_counter() - start:.3f} s")
+    check(db, d1, d2, holidays, starts, args.employees, show=False)
+
+    # 4. عطلة أسبوعية مختلفة (الجمعة فقط)
+    check(db, d1, d2, holidays, starts, args.employees, show=False, weekend=(4,))
+    print("incremental summary updates: OK")
+
+    # 5. الحفظ المؤقت: الطلب المكرر من الذاكرة، والمزامنة تفرغها
+    calendar = WorkCalendar(holidays)
+    times = []
+    for _ in range(2):
+        start = time.perf_counter()
+        first = cached_general_report(db, d1, d2, PERIOD_BOTH, starts[0], starts[1], calendar)
+        times.append(time.perf_counter() - start)
+    assert report_cache.hits == 1 and first == general_report(db, d1, d2, PERIOD_BOTH, starts[0], starts[1], calendar)
+    merge_punches(db, [(1, d1.isoformat(), "11:00", 1)])
+    db.commit()
+    cached_general_report(db, d1, d2, PERIOD_BOTH, starts[0], starts[1], calendar)
+    assert report_cache.misses == 2, "لم يتم تفريغ الذاكرة بعد المزامنة"
+    print(f"cache: miss {times[0]:.3f} s | hit {times[1] * 1000:.2f} ms | invalidated after sync: OK")
+
+
+if __name__ == "__main__":
+    main()
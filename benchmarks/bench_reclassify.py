@@ -0,0 +1,94 @@
+"""
+قياس زمن إعادة احتساب الحضور من البصمات الخام (sync_engine.reclassify)
+لسنة كاملة لعدد من الموظفين، مع التحقق من أن النتيجة مطابقة للسحب من جديد
+بنفس حدود الفترات.
+
+التشغيل:
+    python benchmarks/bench_reclassify.py --employees 500 --days 365
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from migrations import migrate
+from shift_classifier import ShiftClassifier
+from sync_engine import merge_punches, reclassify, store_raw_punches
+
+OLD_CONFIG = {"in_limit_1": "08:00", "out_limit_1": "14:00", "in_limit_2": "20:00", "out_limit_2": "01:00"}
+NEW_CONFIG = {"in_limit_1": "07:00", "out_limit_1": "13:50", "in_limit_2": "19:30", "out_limit_2": "00:40"}
+
+
+class Record:
+    def __init__(self, user_id, timestamp):
+        self.user_id, self.timestamp, self.uid, self.status = user_id, timestamp, user_id, 1
+
+
+def make_records(employees, days, seed=3):
+    rnd = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    out = []
+    for d in range(days):
+        day = start + timedelta(days=d)
+        for emp in range(1, employees + 1):
+            for h, m in ((7, 30), (13, 35), (19, 50), (24, 20)):
+                out.append(Record(str(emp), day + timedelta(hours=h, minutes=m + rnd.randint(0, 40))))
+    out.sort(key=lambda r: (r.timestamp, r.user_id))
+    return out
+
+
+def classify(records, config):
+    classifier = ShiftClassifier.from_settings(config)
+    punches = []
+    for r in records:
+        period = classifier.classify_time(r.timestamp)
+        if period:
+            punches.append((r.user_id, r.timestamp.strftime('%Y-%m-%d'), r.timestamp.strftime('%H:%M'), period))
+    return punches
+
+
+def new_db():
+    db = sqlite3.connect(":memory:")
+    migrate(db)
+    return db
+
+
+def snapshot(db):
+    return sorted(db.execute("SELECT employee_id, date, check_in, check_out, check_in_2, check_out_2 FROM attendance").fetchall())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--employees", type=int, default=500)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    records = make_records(args.employees, args.days)
+    tagged = [("10.0.0.1:4370", r) for r in records]
+
+    # القاعدة الحالية: سحب بالحدود القديمة مع حفظ البصمات الخام
+    db = new_db()
+    store_raw_punches(db, tagged)
+    merge_punches(db, classify(records, OLD_CONFIG))
+    db.commit()
+
+    start = time.perf_counter()
+    days = reclassify(db, date(2024, 1, 1), date(2024, 1, 1) + timedelta(days=args.days), NEW_CONFIG)
+    db.commit()
+    elapsed = time.perf_counter() - start
+
+    # المرجع: سحب نفس البصمات من جديد بالحدود الجديدة
+    expected = new_db()
+    merge_punches(expected, classify(records, NEW_CONFIG))
+    expected.commit()
+    assert snapshot(db) == snapshot(expected), "إعادة الاحتساب لا تطابق السحب من جديد"
+
+    print(f"{len(records)} raw punches, {days} employee-days rebuilt in {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+مقارنة زمن دمج البصمات: الحلقة القديمة (SELECT ثم INSERT/UPDATE لكل بصمة)
+مقابل الدمج الجماعي في sync_engine.merge_punches.
+الحلقة القديمة تقاس على جدولها الأصلي بدون فهارس (كما كانت قبل الإصدار 2 من migrations)،
+ومع الفهرس الفريد (employee_id, date) الذي أضافه الإصدار 2، والتسريع محسوب مقابل الأصلية.
+
+التشغيل:
+    python benchmarks/bench_sync_merge.py --sizes 10000 100000 1000000 --legacy-max 100000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from migrations import migrate
+from sync_engine import merge_punches
+
+SCHEMA = """
+CREATE TABLE attendance (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, finger_id INTEGER, employee_id INTEGER, date TEXT, time TEXT,
+    check_in TEXT, check_out TEXT, check_in_2 TEXT, check_out_2 TEXT, status TEXT);
+"""
+LEGACY_INDEX = "CREATE UNIQUE INDEX idx_attendance_emp_date ON attendance (employee_id, date)"
+
+
+def make_punches(count, employees=500, seed=7):
+    """بصمات تجريبية: دخول وخروج للفترتين لكل موظف يومياً، مرتبة زمنياً"""
+    rnd = random.Random(seed)
+    day = datetime(2024, 1, 1)
+    out = []
+    while len(out) < count:
+        for emp in range(1, employees + 1):
+            for h, m in ((7, 40), (13, 40), (20, 5), (24, 30)):
+                ts = day + timedelta(hours=h, minutes=m + rnd.randint(0, 25))
+                out.append((ts, emp))
+        day += timedelta(days=1)
+    out = out[:count]
+    out.sort()
+    return out
+
+
+def classify(ts):
+    m = ts.hour * 60 + ts.minute
+    if 7 * 60 <= m <= 14 * 60:
+        return 1
+    if m >= 20 * 60 or m <= 60:
+        return 2
+    return 0
+
+
+def legacy_loop(db, rows):
+    """نسخة مرجعية من الحلقة السابقة في AttendanceWindow.sync_from_device"""
+    cursor = db.cursor()
+    for u_id, d_str, t_str, period in rows:
+        cursor.execute("SELECT id, check_in, check_out, check_in_2, check_out_2 FROM attendance WHERE employee_id=? AND date=?", (u_id, d_str))
+        existing = cursor.fetchone()
+        if not existing:
+            if period == 1:
+                cursor.execute("INSERT INTO attendance (employee_id, date, check_in) VALUES (?, ?, ?)", (u_id, d_str, t_str))
+            elif period == 2:
+                cursor.execute("INSERT INTO attendance (employee_id, date, check_in_2) VALUES (?, ?, ?)", (u_id, d_str, t_str))
+        else:
+            rec_id, c1_in, c1_out, c2_in, c2_out = existing
+            if period == 1:
+                if not c1_in:
+                    cursor.execute("UPDATE attendance SET check_in=? WHERE id=?", (t_str, rec_id))
+                elif t_str != c1_in:
+                    cursor.execute("UPDATE attendance SET check_out=? WHERE id=?", (t_str, rec_id))
+            elif period == 2:
+                if not c2_in:
+                    cursor.execute("UPDATE attendance SET check_in_2=? WHERE id=?", (t_str, rec_id))
+                elif t_str != c2_in:
+                    cursor.execute("UPDATE attendance SET check_out_2=? WHERE id=?", (t_str, rec_id))
+    db.commit()
+
+
+def bulk_merge(db, rows):
+    merge_punches(db, rows)
+    db.commit()
+
+
+def snapshot(db):
+    return sorted(db.execute("SELECT employee_id, date, check_in, check_out, check_in_2, check_out_2 FROM attendance").fetchall())
+
+
+def run(fn, rows, indexed=False):
+    db = sqlite3.connect(":memory:")
+    if fn is legacy_loop:
+        db.executescript(SCHEMA)
+        if indexed:
+            db.execute(LEGACY_INDEX)
+    else:
+        migrate(db)  # أوقات الحضور بالأرقام، وsnapshot يقرأ من العرض attendance
+    start = time.perf_counter()
+    fn(db, rows)
+    return time.perf_counter() - start, db
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--legacy-max", type=int, default=100000,
+                        help="أكبر حجم يتم تشغيل الحلقة القديمة بدون فهرس عليه (زمنها تربيعي)")
+    args = parser.parse_args()
+
+    print(f"{'punches':>10} {'legacy (s)':>12} {'legacy+idx (s)':>15} {'bulk (s)':>10} {'speedup':>9}")
+    for n in args.sizes:
+        rows = []
+        for ts, emp in make_punches(n):
+            period = classify(ts)
+            if period:
+                rows.append((str(emp), ts.strftime('%Y-%m-%d'), ts.strftime('%H:%M'), period))
+        bulk_t, bulk_db = run(bulk_merge, rows)
+        indexed_t, indexed_db = run(legacy_loop, rows, indexed=True)
+        assert snapshot(indexed_db) == snapshot(bulk_db), "نتيجة الدمج الجماعي تختلف عن الحلقة القديمة"
+        if n <= args.legacy_max:
+            legacy_t, legacy_db = run(legacy_loop, rows)
+            assert snapshot(legacy_db) == snapshot(bulk_db), "نتيجة الدمج الجماعي تختلف عن الحلقة القديمة"
+            print(f"{n:>10} {legacy_t:>12.2f} {indexed_t:>15.2f} {bulk_t:>10.2f} {legacy_t / bulk_t:>8.1f}x")
+        else:
+            print(f"{n:>10} {'skipped':>12} {indexed_t:>15.2f} {bulk_t:>10.2f} {'-':>9}")
+
+
+if __name__ == "__main__":
+    main()
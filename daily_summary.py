@@ -0,0 +1,291 @@
+"""
+أوقات الحضور (attendance_times) وملخص الحضور اليومي (attendance_daily).
+
+أوقات الحضور تحفظ بأرقام: رقم اليوم (عدد الأيام منذ 1970-01-01) ودقيقة اليوم لكل دخول
+وخروج (NULL بدون بصمة)، بدلاً من نصوص "YYYY-MM-DD" و "HH:MM". الاسم القديم attendance
+أصبح عرضاً (VIEW) بنفس الأعمدة النصية للاستعلامات القديمة، للقراءة فقط.
+
+الملخص صف لكل موظف في كل يوم له سجل حضور، بأرقام جاهزة: دقيقة الدخول لكل فترة، الحضور،
+دقائق التأخير، وهل اليوم يوم عمل. التقارير تجمع هذه الأرقام مباشرة بدلاً من حساب
+الإجازات والتأخير في كل مرة.
+
+يتم تحديث الملخص تدريجياً:
+- عند الدمج من الجهاز أو إعادة الاحتساب: الأيام التي تغيرت فقط (refresh_days).
+- عند تغيير بداية الدوام أو العطلة الأسبوعية: الصفوف التي تتغير قيمتها فقط (apply_settings).
+- عند إضافة أو حذف إجازة: أيام الإجازات التي تغيرت فقط (apply_holidays).
+الإعدادات والإجازات المستخدمة في الحساب محفوظة في جدول daily_state، فأي تغيير
+(حتى من خارج البرنامج) يطبق عند أول تقرير بعده (prepare_summary).
+كل تحديث يزيد رقم إصدار البيانات (data_version) حتى تعرف التقارير المحفوظة مؤقتاً أنها قديمة.
+ملفات أرشيف السنوات (archive.py) فيها نفس الجداول، وملخصها يعاد حسابه عند إرفاقها إذا
+حسب بإعدادات أو إجازات غير الحالية (refresh_archive).
+لا يتم الحفظ (commit) هنا.
+"""
+import json
+from datetime import date, timedelta
+
+# قيم خاصة لدقيقة الدخول (أصغر من أي وقت فلا ينتج عنها تأخير)
+MISSING = -(1 << 30)    # لا توجد بصمة (غياب في هذه الفترة)
+INVALID = MISSING + 1   # قيمة موجودة بصيغة غير معروفة: حضور بدون تأخير
+
+UNKNOWN_TIME = -1      # دقيقة محفوظة لوقت نصي قديم غير صالح: حضور بدون تأخير كما كان يحسب
+UNKNOWN_TEXT = "??:??"  # عرضها كنص (calculate_delay يعطيه صفراً ويعتبره حضوراً)
+
+ABSENT_VALUES = ("0", "--", None, "00:00:00")  # قيم تعني عدم وجود بصمة
+EMPTY_VALUES = ["--", "None", "", "0", "00:00:00", "None:None"]  # قيم بدون تأخير
+WEEKEND_DAYS = (4, 5)  # الجمعة والسبت (datetime.weekday)
+DEFAULT_WORK_START = ("08:00", "16:00")
+
+_EPOCH = date(1970, 1, 1)      # رقم اليوم 0 (يوم خميس: weekday = 3)
+_JULIAN_EPOCH = 2440587.5      # julianday('1970-01-01')
+
+
+def hm(value):
+    """الدقائق من نص الوقت (أول 5 أحرف بصيغة H:M)، أو None إذا لم يكن صالحاً"""
+    try:
+        h, m = map(int, str(value).strip()[:5].split(':'))
+        return h * 60 + m
+    except Exception:
+        return None
+
+
+def parse_minutes(value):
+    """دقيقة الدخول المحفوظة في الملخص: الدقائق، أو MISSING، أو INVALID"""
+    if not value or value in ABSENT_VALUES:
+        return MISSING
+    if str(value).strip() in EMPTY_VALUES:
+        return INVALID
+    m = hm(value)
+    return INVALID if m is None else m
+
+
+def minutes_value(value):
+    """دقيقة اليوم المحفوظة لوقت نصي قديم: None بدون بصمة، أو UNKNOWN_TIME إذا لم يكن صالحاً"""
+    m = parse_minutes(value)
+    if m == MISSING:
+        return None
+    return UNKNOWN_TIME if m < 0 else m
+
+
+def time_text(m):
+    """نص الوقت HH:MM لدقيقة اليوم المحفوظة (None بدون بصمة)"""
+    if m is None or m == MISSING:
+        return None
+    if m < 0:
+        return UNKNOWN_TEXT
+    return f"{m // 60:02d}:{m % 60:02d}"
+
+
+def day_sql(column):
+    """تعبير SQL لرقم اليوم من تاريخ نصي YYYY-MM-DD"""
+    return f"CAST(julianday({column}) - {_JULIAN_EPOCH} AS INTEGER)"
+
+
+def date_sql(column):
+    """تعبير SQL للتاريخ النصي من رقم اليوم"""
+    return f"date({column} * 86400, 'unixepoch')"
+
+
+def time_sql(column):
+    """تعبير SQL لنص الوقت من دقيقة اليوم (مثل time_text)"""
+    return (f"CASE WHEN {column} >= 0 THEN printf('%02d:%02d', {column} / 60, {column} % 60) "
+            f"WHEN {column} < 0 THEN '{UNKNOWN_TEXT}' END")
+
+
+def day_number(d):
+    """رقم اليوم في الملخص (عدد الأيام منذ 1970-01-01)"""
+    return (d - _EPOCH).days
+
+
+def day_date(n):
+    return _EPOCH + timedelta(days=n)
+
+
+SUMMARY_KEYS = ("work_start_1", "work_start_2", "weekend", "holidays")  # ما يعتمد عليه حساب الملخص
+
+
+def _state(cur, schema="main"):
+    return dict(cur.execute(f"SELECT key, value FROM {schema}.daily_state").fetchall())
+
+
+def _save_state(cur, schema="main", **values):
+    cur.executemany(f"INSERT OR REPLACE INTO {schema}.daily_state (key, value) VALUES (?, ?)", values.items())
+
+
+def bump_version(cur):
+    """زيادة رقم إصدار البيانات بعد أي تعديل على الملخص"""
+    cur.execute("UPDATE daily_state SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'")
+
+
+def data_version(conn):
+    """رقم إصدار البيانات الحالي (يتغير مع المزامنة وتعديل الموظفين والإجازات والإعدادات)"""
+    row = conn.execute("SELECT value FROM daily_state WHERE key = 'version'").fetchone()
+    return int(row[0]) if row else 0
+
+
+def _holiday_days(cur):
+    """أرقام أيام الإجازات الرسمية المسجلة (التواريخ بصيغة YYYY-MM-DD فقط)"""
+    days = set()
+    for (value,) in cur.execute("SELECT holiday_date FROM holidays").fetchall():
+        try: days.add(day_number(date.fromisoformat(str(value))))
+        except ValueError: pass
+    return days
+
+
+def _delay_sql(col, work_start):
+    start = hm(work_start)
+    return f"MAX({col} - {start}, 0)" if start is not None else "0"
+
+
+def _working_sql(weekend):
+    # اليوم 0 خميس، فيوم الأسبوع = (day + 3) % 7 بنفس ترقيم datetime.weekday
+    weekend = ", ".join(str(int(d)) for d in weekend) or "-1"
+    return f"((day + 3) % 7 NOT IN ({weekend}) AND day NOT IN (SELECT value FROM json_each(:holidays)))"
+
+
+def _summary_minutes(column):
+    # NULL (بدون بصمة) يصبح MISSING، والأوقات القديمة غير الصالحة INVALID
+    return f"CASE WHEN {column} IS NULL THEN {MISSING} WHEN {column} < 0 THEN {INVALID} ELSE {column} END"
+
+
+def _insert_days(cur, where="1", params=(), schema="main"):
+    """حساب صفوف الملخص من أوقات الحضور المطابقة للشرط (بعد حذف صفوفها القديمة)"""
+    state = _state(cur)
+    weekend = json.loads(state["weekend"])
+    cur.execute(f"""
+        INSERT INTO {schema}.attendance_daily (day, employee_id, in1, in2, present1, present2, delay1, delay2, working)
+        SELECT day, employee_id, in1, in2, in1 <> {MISSING}, in2 <> {MISSING},
+               {_delay_sql('in1', state['work_start_1'])}, {_delay_sql('in2', state['work_start_2'])},
+               {_working_sql(weekend)}
+        FROM (SELECT t.day AS day, t.employee_id AS employee_id,
+                     {_summary_minutes('t.in1')} AS in1, {_summary_minutes('t.in2')} AS in2
+              FROM {schema}.attendance_times t WHERE {where})
+    """, dict(params, holidays=state["holidays"]))
+    return cur.rowcount
+
+
+def create_times(cur, schema="main"):
+    """
+    إنشاء جدول أوقات الحضور بالأرقام والعرض attendance بالأعمدة النصية القديمة
+    (تستخدم في الترقية بعد نقل البيانات من جدول attendance النصي وحذفه، وفي ملفات الأرشيف)
+    """
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS {schema}.attendance_times (
+        day INTEGER NOT NULL,          -- عدد الأيام منذ 1970-01-01
+        employee_id INTEGER NOT NULL,
+        in1 INTEGER,                   -- دقيقة اليوم (NULL بدون بصمة، أو UNKNOWN_TIME)
+        out1 INTEGER,
+        in2 INTEGER,
+        out2 INTEGER,
+        PRIMARY KEY (day, employee_id)
+    ) WITHOUT ROWID""")
+    cur.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_times_employee ON attendance_times (employee_id, day)")
+    cur.execute(f"""
+    CREATE VIEW IF NOT EXISTS {schema}.attendance AS
+    SELECT employee_id, {date_sql('day')} AS date,
+           {time_sql('in1')} AS check_in, {time_sql('out1')} AS check_out,
+           {time_sql('in2')} AS check_in_2, {time_sql('out2')} AS check_out_2
+    FROM attendance_times""")
+
+
+def create_summary(cur, schema="main"):
+    """إنشاء جداول الملخص (تستخدم في الترقية وفي ملفات الأرشيف؛ البناء من أوقات الحضور في rebuild_summary)"""
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS {schema}.attendance_daily (
+        day INTEGER NOT NULL,          -- عدد الأيام منذ 1970-01-01
+        employee_id INTEGER NOT NULL,
+        in1 INTEGER NOT NULL,          -- دقيقة دخول ف1 من بداية اليوم (أو MISSING / INVALID)
+        in2 INTEGER NOT NULL,
+        present1 INTEGER NOT NULL,
+        present2 INTEGER NOT NULL,
+        delay1 INTEGER NOT NULL,       -- دقائق التأخير بعد بداية الدوام
+        delay2 INTEGER NOT NULL,
+        working INTEGER NOT NULL,      -- 0 في الإجازات الرسمية والعطلة الأسبوعية
+        PRIMARY KEY (day, employee_id)
+    ) WITHOUT ROWID""")
+    cur.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_daily_employee ON attendance_daily (employee_id, day)")
+    cur.execute(f"CREATE TABLE IF NOT EXISTS {schema}.daily_state (key TEXT PRIMARY KEY, value TEXT)")
+    if not _state(cur, schema):
+        _save_state(cur, schema, work_start_1=DEFAULT_WORK_START[0], work_start_2=DEFAULT_WORK_START[1],
+                    weekend=json.dumps(list(WEEKEND_DAYS)), holidays=json.dumps(sorted(_holiday_days(cur))))
+
+
+def rebuild_summary(cur):
+    """بناء الملخص من كل أوقات الحضور"""
+    cur.execute("DELETE FROM attendance_daily")
+    bump_version(cur)
+    return _insert_days(cur)
+
+
+def refresh_archive(cur, schema):
+    """
+    إعادة حساب ملخص ملف أرشيف مرفق (schema) إذا حسب بإعدادات أو إجازات غير الحالية؛
+    يعيد عدد الصفوف المحسوبة (صفر إذا كان محدثاً). ملف الأرشيف لسنة واحدة، فيعاد حسابه كاملاً.
+    """
+    state = _state(cur)
+    if all(_state(cur, schema).get(k) == state[k] for k in SUMMARY_KEYS):
+        return 0
+    cur.execute(f"DELETE FROM {schema}.attendance_daily")
+    rows = _insert_days(cur, schema=schema)
+    _save_state(cur, schema, **{k: state[k] for k in SUMMARY_KEYS})
+    return rows
+
+
+def refresh_days(cur, keys_sql, params=()):
+    """
+    إعادة حساب الملخص للأيام التي تغيرت فقط.
+    keys_sql: استعلام يعيد (employee_id, day) للأيام التي تمت كتابتها أو حذفها من أوقات الحضور.
+    """
+    params = dict(params)
+    cur.execute(f"""
+        DELETE FROM attendance_daily WHERE (day, employee_id) IN (SELECT k.day, k.employee_id FROM ({keys_sql}) k)
+    """, params)
+    bump_version(cur)
+    return _insert_days(cur, f"(t.day, t.employee_id) IN (SELECT k.day, k.employee_id FROM ({keys_sql}) k)", params)
+
+
+def apply_settings(cur, work_start_1, work_start_2, weekend=WEEKEND_DAYS):
+    """تطبيق بداية الدوام والعطلة الأسبوعية: تعديل الصفوف التي تتغير قيمتها فقط"""
+    state = _state(cur)
+    weekend = sorted(int(d) for d in weekend)
+    if (work_start_1, work_start_2, weekend) == (state["work_start_1"], state["work_start_2"], json.loads(state["weekend"])):
+        return 0
+    changed = 0
+    if (work_start_1, work_start_2) != (state["work_start_1"], state["work_start_2"]):
+        d1, d2 = _delay_sql("in1", work_start_1), _delay_sql("in2", work_start_2)
+        cur.execute(f"UPDATE attendance_daily SET delay1 = {d1}, delay2 = {d2} WHERE delay1 <> {d1} OR delay2 <> {d2}")
+        changed += cur.rowcount
+    if weekend != json.loads(state["weekend"]):
+        working = _working_sql(weekend)
+        cur.execute(f"UPDATE attendance_daily SET working = {working} WHERE working <> {working}",
+                    {"holidays": state["holidays"]})
+        changed += cur.rowcount
+    _save_state(cur, work_start_1=work_start_1, work_start_2=work_start_2, weekend=json.dumps(weekend))
+    bump_version(cur)
+    return changed
+
+
+def apply_holidays(cur):
+    """تطبيق جدول الإجازات: إعادة حساب يوم العمل لأيام الإجازات المضافة أو المحذوفة فقط"""
+    state = _state(cur)
+    current = _holiday_days(cur)
+    changed = current ^ set(json.loads(state["holidays"]))
+    if not changed:
+        return 0
+    holidays = json.dumps(sorted(current))
+    cur.execute(f"""
+        UPDATE attendance_daily SET working = {_working_sql(json.loads(state['weekend']))}
+        WHERE day IN (SELECT value FROM json_each(:changed))
+    """, {"holidays": holidays, "changed": json.dumps(sorted(changed))})
+    rows = cur.rowcount
+    _save_state(cur, holidays=holidays)
+    bump_version(cur)
+    return rows
+
+
+def prepare_summary(conn, work_start_1, work_start_2, weekend=WEEKEND_DAYS):
+    """التأكد من أن الملخص محسوب بالإعدادات والإجازات الحالية قبل قراءته"""
+    cur = conn.cursor()
+    apply_settings(cur, work_start_1, work_start_2, weekend)
+    apply_holidays(cur)
+    if conn.in_transaction:
+        conn.commit()
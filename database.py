@@ -1,6 +1,23 @@
 import sqlite3
 import os
 import sys
+import threading
+from datetime import datetime
+from migrations import migrate
+
+# إعدادات كل اتصال. WAL: القراءة (الشاشات والتقارير) لا تنتظر كتابة المزامنة والعكس
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",    # آمن مع WAL، بدون fsync عند كل معاملة
+    "PRAGMA cache_size = -32000",     # 32 ميجابايت لكل اتصال
+    "PRAGMA mmap_size = 268435456",   # 256 ميجابايت
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA foreign_keys = ON",
+)
+BUSY_TIMEOUT = 30       # ثوانٍ انتظار كاتب آخر قبل خطأ database is locked
+STATEMENT_CACHE = 256   # أقصى عدد استعلامات مجهزة محفوظة لكل اتصال
+
+_local = threading.local()  # الاتصالات الدائمة لكل خيط
 
 def get_db_path():
     """تحديد مسار قاعدة البيانات بجانب ملف التشغيل دائماً"""
@@ -8,51 +25,65 @@ def get_db_path():
         return os.path.join(os.path.dirname(sys.executable), "attendance.db")
     return os.path.join(os.path.dirname(os.path.abspath(__file__)), "attendance.db")
 
+def connect(path=None):
+    """اتصال جديد بالإعدادات أعلاه، يغلقه من فتحه (خيوط المزامنة والتقارير)"""
+    conn = sqlite3.connect(path or get_db_path(), timeout=BUSY_TIMEOUT, cached_statements=STATEMENT_CACHE)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def get_connection(path=None):
+    """
+    الاتصال الدائم لهذا الخيط (يفتح مرة واحدة لكل مسار ولا يغلق بعد الاستخدام).
+    كل عملية تحفظ (commit) عند انتهائها، فالمعاملة المفتوحة عند الطلب التالي بقيت من
+    عملية فشلت ويتم التراجع عنها حتى لا تمنع المزامنة من الكتابة.
+    """
+    path = path or get_db_path()
+    connections = _local.__dict__.setdefault("connections", {})
+    conn = connections.get(path)
+    if conn is None:
+        conn = connections[path] = connect(path)
+    elif conn.in_transaction:
+        conn.rollback()
+    return conn
+
+def close_connections():
+    """إغلاق الاتصالات الدائمة لهذا الخيط (عند إغلاق البرنامج)"""
+    for conn in _local.__dict__.pop("connections", {}).values():
+        conn.close()
+
 def init_clean_db():
-    db_path = get_db_path()
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # تفعيل قيود المفاتيح الخارجية
-    cursor.execute("PRAGMA foreign_keys = ON;")
-    
-    # 1. إنشاء جدول الموظفين (أضفنا كل الأعمدة التي تطلبها ملفاتك الأخرى)
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS employees (
-        finger_id INTEGER PRIMARY KEY, -- العمود الرئيسي للبصمة
-        employee_id INTEGER,           -- عمود إضافي لضمان عمل بعض الشاشات
-        name TEXT NOT NULL,
-        privilege INTEGER DEFAULT 0,
-        password TEXT,
-        department TEXT,
-        active INTEGER DEFAULT 1       -- مهم لعمل التقارير
-    )""")
+    conn = connect()
     
-    # 2. إنشاء جدول الحضور (أضفنا finger_id و employee_id معاً)
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS attendance (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        finger_id INTEGER,
-        employee_id INTEGER,
-        date TEXT,
-        time TEXT,      -- لملف سحب البصمة
-        check_in TEXT,  -- لفترات الدوام
-        check_out TEXT,
-        check_in_2 TEXT, 
-        check_out_2 TEXT,
-        status TEXT,
-        FOREIGN KEY(finger_id) REFERENCES employees(finger_id) ON DELETE CASCADE
-    )""")
-
-    # 3. إنشاء جدول الإجازات
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS holidays (
-        holiday_date DATE UNIQUE
-    )""")
+    # إنشاء الجداول وترقية القواعد القديمة إلى آخر إصدار (انظر migrations.py)
+    migrate(conn)
     
-    conn.commit()
     conn.close()
     print(f"✅ تم بناء القاعدة الشاملة بنجاح!")
 
+def dashboard_stats(conn, day):
+    """
+    (عدد الموظفين، الحاضرون في اليوم، عدد سجلات الحضور مع السنوات المؤرشفة) للشاشة الرئيسية
+    من العدادات التي تحدثها القاعدة نفسها (انظر _v8_dashboard_counters في migrations.py)
+    """
+    counters = dict(conn.execute("SELECT name, value FROM dashboard_counters").fetchall())
+    present = conn.execute("SELECT present FROM daily_present WHERE day=?", (day,)).fetchone()
+    archived = conn.execute("SELECT COALESCE(SUM(days), 0) FROM archived_years").fetchone()[0]
+    return counters.get("employees", 0), present[0] if present else 0, counters.get("records", 0) + archived
+
+def load_sync_mark(cursor, device):
+    """إرجاع (وقت، رقم الموظف) لآخر بصمة مستوردة من الجهاز أو None"""
+    row = cursor.execute("SELECT last_timestamp, last_user_id FROM sync_state WHERE device=?", (device,)).fetchone()
+    if not row: return None
+    return datetime.strptime(row[0], "%Y-%m-%d %H:%M:%S"), row[1]
+
+def save_sync_mark(cursor, device, timestamp, user_id, uid=None):
+    """حفظ آخر بصمة مستوردة (ضمن نفس المعاملة التي كتبت البصمات)"""
+    cursor.execute("""
+        INSERT INTO sync_state (device, last_timestamp, last_user_id, last_uid) VALUES (?, ?, ?, ?)
+        ON CONFLICT(device) DO UPDATE SET last_timestamp=excluded.last_timestamp,
+            last_user_id=excluded.last_user_id, last_uid=excluded.last_uid
+    """, (device, timestamp.strftime("%Y-%m-%d %H:%M:%S"), str(user_id), uid))
+
 if __name__ == "__main__":
     init_clean_db()
@@ -0,0 +1,146 @@
+"""
+تحميل سجل البصمات من جهاز ZK على أجزاء بذاكرة محدودة.
+
+conn.get_attendance() في مكتبة zk تحمّل السجل كاملاً في الذاكرة ثم تحلله بنسخ
+باقي البيانات بعد كل بصمة (زمن تربيعي مع حجم السجل)، ولا تعيد شيئاً قبل انتهاء التحميل.
+هنا يتم تجهيز السجل في ذاكرة الجهاز (CMD_PREPARE_BUFFER) ثم قراءته جزءاً جزءاً بنفس
+أوامر المكتبة، وتحليل كل جزء فور وصوله وإعادته للمستدعي ليتم حفظه أثناء تحميل الباقي.
+كل جزء يجب أن يصل بالطول المطلوب بالضبط: حزمة UDP مفقودة تزيح كل البصمات بعدها، فيعاد طلب
+الجزء الناقص، وإذا لم يكتمل يتوقف التحميل قبل أن تصل بيانات الجزء للسجل أو الدمج.
+قبل إعادة الطلب تحذف باقي حزم الرد الناقص من المقبس، حتى لا تقرأ كأنها رد الطلب الجديد.
+يعتمد على دوال داخلية في المكتبة (_ZK__send_command, _ZK__read_chunk) كما في zk 0.9.
+"""
+import struct
+from datetime import datetime
+from zk import const
+from zk.attendance import Attendance
+from zk.exception import ZKErrorResponse, ZKNetworkError
+
+CMD_PREPARE_BUFFER = 1503
+TCP_CHUNK = 0xFFC0      # نفس أحجام الأجزاء في read_with_buffer
+UDP_CHUNK = 16 * 1024
+CHUNK_RETRIES = 10      # محاولات طلب الجزء الناقص قبل إيقاف التحميل
+DRAIN_TIMEOUT = 0.2     # ثوانٍ انتظار الحزم المتأخرة من الرد الناقص قبل إعادة الطلب
+ATT_RECORD = struct.Struct('<H24sBIB8s')  # البصمة في الأجهزة الحديثة (40 بايت)
+
+
+def decode_time(t):
+    """فك ترميز وقت الجهاز (نفس ZK.__decode_time)"""
+    second = t % 60
+    t //= 60
+    minute = t % 60
+    t //= 60
+    hour = t % 24
+    t //= 24
+    day = t % 31 + 1
+    t //= 31
+    month = t % 12 + 1
+    t //= 12
+    return datetime(t + 2000, month, day, hour, minute, second)
+
+
+def encode_time(t):
+    """ترميز الوقت بنفس طريقة ساعة الجهاز (عكس decode_time)"""
+    return ((((t.year % 100) * 12 * 31 + ((t.month - 1) * 31) + t.day - 1) * (24 * 60 * 60))
+            + (t.hour * 60 + t.minute) * 60 + t.second)
+
+
+def parse_records(data):
+    """تحليل بيانات بصمات كاملة (طولها من مضاعفات 40 بايت)"""
+    return [Attendance(user_id.split(b'\x00')[0].decode(errors='ignore'), decode_time(t), status, punch, uid)
+            for uid, user_id, status, t, punch, _ in ATT_RECORD.iter_unpack(data)]
+
+
+def encode_records(records):
+    """تحويل البصمات إلى تنسيق 40 بايت (للأجهزة القديمة ذات التنسيقات الأخرى)"""
+    return b''.join(ATT_RECORD.pack(int(r.uid) if str(r.uid).isdigit() else 0, str(r.user_id).encode(),
+                                    r.status or 0, encode_time(r.timestamp), r.punch or 0, b'')
+                    for r in records)
+
+
+def _drain(conn):
+    """حذف حزم UDP المتبقية من رد سابق في المقبس"""
+    if conn.tcp:
+        return
+    sock = conn._ZK__sock
+    timeout = sock.gettimeout()
+    sock.settimeout(DRAIN_TIMEOUT)
+    try:
+        while True:
+            sock.recv(65536)
+    except OSError:
+        pass
+    finally:
+        sock.settimeout(timeout)
+
+
+def read_chunk(conn, start, size):
+    """قراءة جزء من ذاكرة الجهاز بالطول المطلوب بالضبط، مع إعادة طلب الجزء الناقص"""
+    received = 0
+    for attempt in range(CHUNK_RETRIES):
+        if attempt:
+            _drain(conn)
+        try:
+            data = conn._ZK__read_chunk(start, size)
+        except (ZKErrorResponse, ZKNetworkError, OSError):
+            data = None  # رد مفقود بالكامل أو انتهت مهلة انتظار باقي الحزم
+        received = len(data or b'')
+        if received == size:
+            return data
+    raise ZKErrorResponse(f"وصل جزء ناقص من سجل البصمات ({received} من {size} بايت عند {start})")
+
+
+def iter_attendance_data(conn):
+    """
+    مولد يعيد بعد كل جزء: (بيانات الجزء، عدد البصمات المحملة حتى الآن، إجمالي بصمات الجهاز)
+    حيث البيانات بصمات كاملة بتنسيق 40 بايت بدون تحليل، لحفظها في سجل السحب مباشرة.
+    الذاكرة المستخدمة بحجم جزء واحد مهما كان حجم السجل.
+    """
+    conn.read_sizes()
+    total = conn.records
+    if total == 0:
+        return
+    response = conn._ZK__send_command(CMD_PREPARE_BUFFER, struct.pack('<bhii', 1, const.CMD_ATTLOG_RRQ, 0, 0), 1024)
+    if not response.get('status'):
+        raise ZKErrorResponse("RWB Not supported")
+
+    if response['code'] == const.CMD_DATA:
+        # سجل صغير أرسله الجهاز كاملاً مع الرد
+        data = conn._ZK__data
+        if conn.tcp and len(data) < conn._ZK__tcp_length - 8:
+            data += conn._ZK__recieve_raw_data(conn._ZK__tcp_length - 8 - len(data))
+        if (len(data) - 4) // total != ATT_RECORD.size:
+            yield _legacy(conn, total)
+            return
+        yield data[4:4 + total * ATT_RECORD.size], total, total
+        return
+
+    size = struct.unpack('I', conn._ZK__data[1:5])[0]
+    if (size - 4) // total != ATT_RECORD.size:
+        # أجهزة قديمة بسجلات 8 أو 16 بايت تحتاج قائمة المستخدمين: التحميل الكامل من المكتبة
+        conn.free_data()
+        yield _legacy(conn, total)
+        return
+
+    chunk_size = TCP_CHUNK if conn.tcp else UDP_CHUNK
+    pending = b''
+    done = 0
+    try:
+        for start in range(0, size, chunk_size):
+            data = read_chunk(conn, start, min(chunk_size, size - start))
+            if start == 0:
+                data = data[4:]  # الحجم الكلي في بداية البيانات
+            data = pending + data
+            usable = len(data) - len(data) % ATT_RECORD.size
+            pending = data[usable:]
+            done += usable // ATT_RECORD.size
+            yield data[:usable], done, total
+    finally:
+        # تحرير ذاكرة الجهاز حتى لو توقف المستدعي قبل النهاية (إيقاف السحب)
+        try: conn.free_data()
+        except Exception: pass
+
+
+def _legacy(conn, total):
+    records = conn.get_attendance()
+    return encode_records(records), len(records), total
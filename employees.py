@@ -1,9 +1,10 @@
 import os
 import sys
-import sqlite3
 from PyQt5.QtWidgets import *
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QSortFilterProxyModel
 from styles import STYLE_SHEET
+from database import get_connection
+from table_models import ColumnTableModel
 
 # 1. دالة تحديد المسار للملفات الداخلية (مثل الصور المدمجة)
 def resource_path(relative_path):
@@ -13,12 +14,6 @@ def resource_path(relative_path):
         base_path = os.path.dirname(os.path.abspath(__file__))
     return os.path.join(base_path, relative_path)
 
-# 2. دالة تحديد مسار قاعدة البيانات (لتكون بجانب ملف الـ EXE دائماً)
-def get_db_path():
-    if hasattr(sys, '_MEIPASS'):
-        return os.path.join(os.path.dirname(sys.executable), "attendance.db")
-    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "attendance.db")
-
 class EmployeesWindow(QWidget):
     def __init__(self):
         super().__init__()
@@ -88,9 +83,14 @@ class EmployeesWindow(QWidget):
         layout.addLayout(action_layout)
 
         # 3. الجدول
-        self.table = QTableWidget()
-        self.table.setColumnCount(2) 
-        self.table.setHorizontalHeaderLabels(["رقم البصمة (ID)", "اسم الموظف الكامل"])
+        self.model = ColumnTableModel(["رقم البصمة (ID)", "اسم الموظف الكامل"], parent=self)
+        # البحث بالتصفية على النموذج بدلاً من إخفاء الصفوف واحداً واحداً
+        self.proxy = QSortFilterProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+        self.proxy.setFilterKeyColumn(-1)
+        self.proxy.setFilterCaseSensitivity(Qt.CaseInsensitive)
+        self.table = QTableView()
+        self.table.setModel(self.proxy)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
         layout.addWidget(self.table)
@@ -99,17 +99,10 @@ class EmployeesWindow(QWidget):
 
     def load_data(self):
         try:
-            # تم التعديل هنا لاستخدام get_db_path()
-            conn = sqlite3.connect(get_db_path())
+            conn = get_connection()
             query = "SELECT finger_id, name FROM employees ORDER BY finger_id ASC"
             data = conn.execute(query).fetchall()
-            self.table.setRowCount(len(data))
-            for i, row in enumerate(data):
-                for j, val in enumerate(row):
-                    item = QTableWidgetItem(str(val))
-                    item.setTextAlignment(Qt.AlignCenter)
-                    self.table.setItem(i, j, item)
-            conn.close()
+            self.model.set_columns(list(zip(*data)) if data else [[], []])
         except Exception as e:
             QMessageBox.critical(self, "خطأ", f"فشل تحميل البيانات: {str(e)}")
 
@@ -119,64 +112,56 @@ class EmployeesWindow(QWidget):
         
         if ok1 and ok2 and name:
             try:
-                # تم التعديل هنا لاستخدام get_db_path()
-                conn = sqlite3.connect(get_db_path())
+                conn = get_connection()
                 conn.execute("INSERT INTO employees (finger_id, name) VALUES (?, ?)", (f_id, name))
                 conn.commit()
-                conn.close()
                 self.load_data()
                 QMessageBox.information(self, "نجاح", "تمت إضافة الموظف بنجاح")
             except Exception as e:
                 QMessageBox.warning(self, "خطأ", f"رقم البصمة موجود مسبقاً أو هناك مشكلة: {str(e)}")
 
     def edit_employee(self):
-        current_row = self.table.currentRow()
+        current_row = self.selected_row()
         if current_row < 0:
             QMessageBox.warning(self, "تنبيه", "يرجى تحديد موظف من الجدول أولاً!")
             return
 
-        old_id = self.table.item(current_row, 0).text()
-        old_name = self.table.item(current_row, 1).text()
+        old_id = self.model.text(current_row, 0)
+        old_name = self.model.text(current_row, 1)
 
         new_name, ok = QInputDialog.getText(self, "تعديل بيانات", "تعديل الاسم:", text=old_name)
         if ok and new_name:
             try:
-                # تم التعديل هنا لاستخدام get_db_path()
-                conn = sqlite3.connect(get_db_path())
+                conn = get_connection()
                 conn.execute("UPDATE employees SET name = ? WHERE finger_id = ?", (new_name, old_id))
                 conn.commit()
-                conn.close()
                 self.load_data()
             except Exception as e:
                 QMessageBox.critical(self, "خطأ", f"فشل التعديل: {str(e)}")
 
     def delete_employee(self):
-        current_row = self.table.currentRow()
+        current_row = self.selected_row()
         if current_row < 0:
             QMessageBox.warning(self, "تنبيه", "يرجى تحديد موظف لحذفه!")
             return
 
-        emp_id = self.table.item(current_row, 0).text()
+        emp_id = self.model.text(current_row, 0)
         confirm = QMessageBox.question(self, "تأكيد الحذف", f"هل أنت متأكد من حذف الموظف صاحب البصمة رقم {emp_id}؟",
                                      QMessageBox.Yes | QMessageBox.No)
         
         if confirm == QMessageBox.Yes:
             try:
-                # تم التعديل هنا لاستخدام get_db_path()
-                conn = sqlite3.connect(get_db_path())
+                conn = get_connection()
                 conn.execute("DELETE FROM employees WHERE finger_id = ?", (emp_id,))
                 conn.commit()
-                conn.close()
                 self.load_data()
             except Exception as e:
                 QMessageBox.critical(self, "خطأ", f"فشل الحذف: {str(e)}")
 
+    def selected_row(self):
+        """رقم الصف المحدد في النموذج (بعد تحويله من ترتيب البحث)، أو -1"""
+        index = self.table.currentIndex()
+        return self.proxy.mapToSource(index).row() if index.isValid() else -1
+
     def search_data(self, text):
-        for i in range(self.table.rowCount()):
-            match = False
-            for j in range(self.table.columnCount()):
-                item = self.table.item(i, j)
-                if item and text.lower() in item.text().lower():
-                    match = True
-                    break
-            self.table.setRowHidden(i, not match)
\ No newline at end of file
+        self.proxy.setFilterFixedString(text)
\ No newline at end of file
@@ -0,0 +1,80 @@
+"""
+تصدير Excel بذاكرة ثابتة.
+
+الصفوف تكتب مباشرة من مصدرها (استعلام القاعدة أو نتيجة report_engine) إلى ملف xlsx
+بوضع الكتابة فقط في openpyxl (write_only)، فلا تجمع البيانات في قائمة أو DataFrame
+ولا تزيد الذاكرة مع عدد الصفوف. الخلايا تكتب بأنواعها: التواريخ كتاريخ والدقائق كأرقام.
+"""
+from datetime import date
+from archive import attached, archived_years
+from daily_summary import day_date, time_text
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+
+MAX_SHEET_ROWS = 1048575  # حد Excel للصفوف في الورقة (بدون صف العناوين)؛ الباقي في ورقة جديدة
+FETCH_SIZE = 5000         # عدد السجلات في كل قراءة من القاعدة
+
+
+def as_date(value):
+    """التاريخ من نص YYYY-MM-DD، أو النص كما هو إذا لم يكن تاريخاً"""
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def write_xlsx(path, headers, rows, title="Sheet1"):
+    """كتابة الصفوف (أي مكرر) إلى ملف xlsx صفاً بصف؛ يعيد عدد الصفوف المكتوبة"""
+    wb = Workbook(write_only=True)
+    ws, sheet_rows, total = None, 0, 0
+    for row in rows:
+        if ws is None or sheet_rows == MAX_SHEET_ROWS:
+            ws = _new_sheet(wb, headers, title if ws is None else f"{title} ({len(wb.worksheets) + 1})")
+            sheet_rows = 0
+        ws.append(row)
+        sheet_rows += 1
+        total += 1
+    if ws is None:
+        _new_sheet(wb, headers, title)
+    wb.save(path)
+    return total
+
+
+def _new_sheet(wb, headers, title):
+    ws = wb.create_sheet(title[:31])  # أقصى طول لاسم الورقة في Excel
+    for i, header in enumerate(headers):
+        ws.column_dimensions[get_column_letter(i + 1)].width = max(12, len(str(header)) + 4)
+    ws.freeze_panes = "A2"
+    ws.append(list(headers))
+    return ws
+
+
+def _times_rows(conn, schema):
+    cur = conn.execute(f"""
+        SELECT t.employee_id, COALESCE(e.name, 'غير مسجل'), t.day, t.in1, t.out1, t.in2, t.out2
+        FROM {schema}.attendance_times t
+        LEFT JOIN main.employees e ON t.employee_id = e.finger_id
+        ORDER BY t.day, t.employee_id
+    """)
+    while True:
+        batch = cur.fetchmany(FETCH_SIZE)
+        if not batch:
+            return
+        for emp, name, day, *times in batch:
+            yield [emp, name, day_date(day)] + [time_text(t) for t in times]
+
+
+def attendance_rows(conn):
+    """
+    كل سجلات الحضور (رقم البصمة، الاسم، التاريخ، الأوقات) مقروءة على دفعات: السنوات المؤرشفة
+    أولاً (ملف كل سنة يرفق وحده)، ثم القاعدة الأساسية
+    """
+    for year, _, first, last in archived_years(conn):
+        with attached(conn, day_date(first), day_date(last)) as schemas:
+            yield from _times_rows(conn, schemas[0])
+    yield from _times_rows(conn, "main")
+
+
+def export_attendance(conn, path, headers):
+    """تصدير سجل الحضور الكامل (وليس المعروض في الجدول فقط) مع السنوات المؤرشفة"""
+    return write_xlsx(path, headers, attendance_rows(conn), "الحضور")
@@ -1,18 +1,19 @@
 import sys
-import sqlite3
-import shutil
 import os
 import json # تم إضافة مكتبة json لقراءة الإعدادات
-from datetime import datetime
+from datetime import datetime, date
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QLabel, QPushButton, QFrame, QGridLayout, 
                              QStatusBar, QMessageBox, QDialog, QGraphicsOpacityEffect, QApplication)
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtCore import Qt, QEvent, QTimer, QThread, pyqtSignal
 from PyQt5.QtGui import QPixmap, QIcon, QFont
 from styles import STYLE_SHEET
 
 # --- السطر المضاف للاستيراد ---
-from database import init_clean_db 
+from database import init_clean_db, get_db_path, get_connection, close_connections, dashboard_stats
+from backup import create_backup, backup_due
+from daily_summary import day_number
+from shift_classifier import ShiftClassifier, parse_hhmm, PERIOD_1, PERIOD_2
 
 # استيراد النوافذ الأخرى
 from employees import EmployeesWindow
@@ -29,43 +30,55 @@ def resource_path(relative_path):
         base_path = os.path.dirname(os.path.abspath(__file__))
     return os.path.join(base_path, relative_path)
 
-# 2. دالة تحديد مسار قاعدة البيانات الخارجية (بجانب الـ EXE دائماً)
-def get_db_path():
-    if hasattr(sys, '_MEIPASS'):
-        return os.path.join(os.path.dirname(sys.executable), "attendance.db")
-    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "attendance.db")
-
-# --- الدالة الجديدة لمعالجة الفترات المرنة والدوام الليلي ---
-def is_time_between(target, start, end):
-    """دالة ذكية لمعرفة هل الوقت بين فترتين حتى لو عبر منتصف الليل"""
-    if start <= end:
-        return start <= target <= end
-    else: # في حال كان الدوام ليلي (مثلاً من 20:00 إلى 01:00)
-        return target >= start or target <= end
-
 def check_attendance_period(check_time_str, settings):
     """
     تحديد هل البصمة تابعة للفترة الأولى أم الثانية بناءً على الإعدادات
     """
     try:
-        fmt = "%H:%M"
-        # تحويل وقت البصمة من نص إلى كائن وقت
-        check_time = datetime.strptime(check_time_str, fmt).time()
-        
-        # تحويل نصوص الإعدادات إلى كائنات وقت
-        in1 = datetime.strptime(settings['in_limit_1'], fmt).time()
-        out1 = datetime.strptime(settings['out_limit_1'], fmt).time()
-        in2 = datetime.strptime(settings['in_limit_2'], fmt).time()
-        out2 = datetime.strptime(settings['out_limit_2'], fmt).time()
-
-        if is_time_between(check_time, in1, out1):
-            return "الفترة الأولى"
-        if is_time_between(check_time, in2, out2):
-            return "الفترة الثانية"
-            
-        return "خارج الفترات"
+        classifier = ShiftClassifier.from_settings(settings)
+        period = classifier.table[parse_hhmm(check_time_str)]
     except:
         return "خطأ في التنسيق"
+    if period == PERIOD_1:
+        return "الفترة الأولى"
+    if period == PERIOD_2:
+        return "الفترة الثانية"
+    return "خارج الفترات"
+
+BACKUP_CHECK_MS = 10 * 60 * 1000  # فحص موعد النسخ الاحتياطي التلقائي كل 10 دقائق
+
+def backup_interval():
+    """ساعات النسخ الاحتياطي التلقائي من الإعدادات (0 = متوقف)"""
+    try:
+        with open(resource_path("settings_data.json"), "r", encoding="utf-8") as f:
+            return float(json.load(f).get("backup_interval_hours", 24))
+    except Exception:
+        return 24
+
+class BackupWorker(QThread):
+    """النسخ الاحتياطي في خيط منفصل (قد يستغرق دقائق للقواعد الكبيرة)"""
+    progress = pyqtSignal(str, int, int)     # المرحلة، المنجز، الإجمالي
+    backup_done = pyqtSignal(str, bool)      # مسار النسخة (فارغ إذا لم تتغير البيانات)، تم الإيقاف
+    failed = pyqtSignal(str)
+
+    def __init__(self, force, parent=None):
+        super().__init__(parent)
+        self.force = force
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def on_progress(self, stage, done, total):
+        self.progress.emit(stage, done, total)
+        return not self._cancelled
+
+    def run(self):
+        try:
+            path = create_backup(force=self.force, progress=self.on_progress)
+            self.backup_done.emit(path or "", self._cancelled)
+        except Exception as e:
+            self.failed.emit(str(e))
 
 class ModernMain(QMainWindow):
     def __init__(self):
@@ -178,6 +191,14 @@ class ModernMain(QMainWindow):
         
         QTimer.singleShot(1000, self.update_stats)
 
+        # النسخ الاحتياطي التلقائي حسب الإعدادات (لا ينسخ إذا لم تتغير البيانات)
+        self.backup_worker = None
+        self.backup_manual = False
+        self.backup_timer = QTimer(self)
+        self.backup_timer.timeout.connect(self.auto_backup)
+        self.backup_timer.start(BACKUP_CHECK_MS)
+        QTimer.singleShot(60 * 1000, self.auto_backup)
+
     def show_about_dialog(self):
         today = datetime.now().strftime('%Y-%m-%d')
         msg = QMessageBox(self)
@@ -235,28 +256,70 @@ class ModernMain(QMainWindow):
             db_path = get_db_path() 
             if not os.path.exists(db_path): return
             
-            conn = sqlite3.connect(db_path)
-            cur = conn.cursor()
-            cur.execute("SELECT COUNT(*) FROM employees")
-            self.card_total.val_lbl.setText(str(cur.fetchone()[0]))
-            
-            today = datetime.now().strftime('%Y-%m-%d')
-            cur.execute("SELECT COUNT(DISTINCT employee_id) FROM attendance WHERE date=?", (today,))
-            self.card_today.val_lbl.setText(str(cur.fetchone()[0]))
-            
-            cur.execute("SELECT COUNT(*) FROM attendance")
-            self.card_month.val_lbl.setText(str(cur.fetchone()[0]))
-            conn.close()
+            # من العدادات التي تحدثها القاعدة مع كل كتابة: لا يتأثر بعدد السجلات
+            total, today, records = dashboard_stats(get_connection(db_path), day_number(date.today()))
+            self.card_total.val_lbl.setText(str(total))
+            self.card_today.val_lbl.setText(str(today))
+            self.card_month.val_lbl.setText(str(records))
         except: pass
 
     def backup_db(self):
+        if self.backup_worker is not None and self.backup_worker.isRunning():
+            QMessageBox.information(self, "مؤسسة وطن", "جاري النسخ الاحتياطي حالياً...")
+            return
+        self.start_backup(force=True, manual=True)
+
+    def auto_backup(self):
+        hours = backup_interval()
+        if hours <= 0 or (self.backup_worker is not None and self.backup_worker.isRunning()):
+            return
         try:
-            if not os.path.exists("backups"): os.makedirs("backups")
-            dest = f"backups/backup_{datetime.now().strftime('%Y%m%d_%H%M')}.db"
-            shutil.copy2(get_db_path(), dest)
-            QMessageBox.information(self, "مؤسسة وطن", f"تم حفظ نسخة احتياطية في:\n{dest}")
-        except Exception as e:
-            QMessageBox.warning(self, "خطأ", f"فشل النسخ الاحتياطي: {str(e)}")
+            if not backup_due(hours): return
+        except Exception: return
+        self.start_backup(force=False, manual=False)
+
+    def start_backup(self, force, manual):
+        self.backup_manual = manual
+        self.btn_bak.setEnabled(False)
+        self.backup_worker = BackupWorker(force, self)
+        self.backup_worker.progress.connect(self.on_backup_progress)
+        self.backup_worker.backup_done.connect(self.on_backup_done)
+        self.backup_worker.failed.connect(self.on_backup_failed)
+        self.backup_worker.start()
+
+    def on_backup_progress(self, stage, done, total):
+        self.statusBar().showMessage(f"💾 {stage}: {done * 100 // max(1, total)}%")
+
+    def on_backup_done(self, path, cancelled):
+        self.btn_bak.setEnabled(True)
+        if cancelled:
+            self.statusBar().showMessage("⛔ تم إيقاف النسخ الاحتياطي", 5000)
+        elif not path:
+            self.statusBar().showMessage("💾 لا توجد تغييرات منذ آخر نسخة احتياطية", 5000)
+        else:
+            self.statusBar().showMessage(f"✅ نسخة احتياطية: {os.path.basename(path)}", 10000)
+            if self.backup_manual:
+                QMessageBox.information(self, "مؤسسة وطن", f"تم حفظ نسخة احتياطية في:\n{path}")
+
+    def on_backup_failed(self, error):
+        self.btn_bak.setEnabled(True)
+        self.statusBar().showMessage("❌ فشل النسخ الاحتياطي", 10000)
+        if self.backup_manual:
+            QMessageBox.warning(self, "خطأ", f"فشل النسخ الاحتياطي: {error}")
+        else:
+            print(f"❌ فشل النسخ الاحتياطي التلقائي: {error}")
+
+    def changeEvent(self, event):
+        # تحديث الأرقام عند العودة للشاشة الرئيسية (بعد تعديل الموظفين أو الأرشفة مثلاً)
+        if event.type() == QEvent.ActivationChange and self.isActiveWindow():
+            self.update_stats()
+        super().changeEvent(event)
+
+    def closeEvent(self, event):
+        if self.backup_worker is not None and self.backup_worker.isRunning():
+            self.backup_worker.cancel()
+            self.backup_worker.wait()
+        super().closeEvent(event)
 
     def open_emp(self): 
         self.w = EmployeesWindow()
@@ -264,6 +327,7 @@ class ModernMain(QMainWindow):
         
     def open_att(self): 
         self.w = AttendanceWindow()
+        self.w.data_changed.connect(self.update_stats)
         self.w.show()
         
     def open_rep(self): 
@@ -279,6 +343,7 @@ class ModernMain(QMainWindow):
 # --- الجزء السفلي المعدل بالكامل لضمان التشغيل السليم ---
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    app.aboutToQuit.connect(close_connections)
     
     # 1. استدعاء دالة التهيئة أولاً وقبل كل شيء لبناء الجداول
     try:
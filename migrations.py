@@ -0,0 +1,246 @@
+"""
+ترقية مخطط قاعدة البيانات على مراحل مرقمة (PRAGMA user_version).
+
+كل مرحلة تنفذ مرة واحدة داخل معاملة مستقلة، ويسجل زمن تنفيذها في جدول
+schema_migrations حتى يمكن تقدير مدة الترقية على قواعد البيانات الكبيرة.
+لإضافة تعديل جديد على المخطط: أضف دالة جديدة في آخر قائمة MIGRATIONS.
+"""
+import time
+from datetime import datetime
+from daily_summary import create_summary, create_times, rebuild_summary, minutes_value, day_sql
+
+
+def _v1_base_tables(cur):
+    # الجداول الأساسية كما كانت تنشأ سابقاً (لا تؤثر على القواعد الموجودة)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS employees (
+        finger_id INTEGER PRIMARY KEY, -- العمود الرئيسي للبصمة
+        employee_id INTEGER,           -- عمود إضافي لضمان عمل بعض الشاشات
+        name TEXT NOT NULL,
+        privilege INTEGER DEFAULT 0,
+        password TEXT,
+        department TEXT,
+        active INTEGER DEFAULT 1       -- مهم لعمل التقارير
+    )""")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS attendance (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        finger_id INTEGER,
+        employee_id INTEGER,
+        date TEXT,
+        time TEXT,      -- لملف سحب البصمة
+        check_in TEXT,  -- لفترات الدوام
+        check_out TEXT,
+        check_in_2 TEXT,
+        check_out_2 TEXT,
+        status TEXT,
+        FOREIGN KEY(finger_id) REFERENCES employees(finger_id) ON DELETE CASCADE
+    )""")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS holidays (
+        holiday_date DATE UNIQUE
+    )""")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS sync_state (
+        device TEXT PRIMARY KEY,       -- عنوان الجهاز ip:port
+        last_timestamp TEXT NOT NULL,  -- وقت آخر بصمة مستوردة
+        last_user_id TEXT NOT NULL,    -- رقم صاحب آخر بصمة
+        last_uid INTEGER               -- الرقم التسلسلي للمستخدم في الجهاز
+    )""")
+
+
+def _v2_attendance_indexes(cur):
+    # دمج السجلات المكررة لنفس الموظف في نفس اليوم قبل إنشاء الفهرس الفريد:
+    # يبقى أقدم سجل وتكمل خاناته الفارغة من السجلات المكررة بترتيب إدخالها
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_attendance_dedup ON attendance (employee_id, date)")
+    cur.execute("""
+        CREATE TEMP TABLE dup_days AS
+        SELECT employee_id, date, MIN(id) AS keep_id FROM attendance
+        WHERE employee_id IS NOT NULL AND date IS NOT NULL
+        GROUP BY employee_id, date HAVING COUNT(*) > 1
+    """)
+    for col in ("check_in", "check_out", "check_in_2", "check_out_2", "finger_id", "time", "status"):
+        cur.execute(f"""
+            UPDATE attendance SET {col} = (
+                SELECT x.{col} FROM attendance x
+                WHERE x.employee_id = attendance.employee_id AND x.date = attendance.date
+                AND x.{col} IS NOT NULL AND x.{col} <> '' ORDER BY x.id LIMIT 1)
+            WHERE id IN (SELECT keep_id FROM dup_days) AND ({col} IS NULL OR {col} = '')
+        """)
+    cur.execute("""
+        DELETE FROM attendance WHERE id IN (
+            SELECT a.id FROM attendance a JOIN dup_days d
+            ON a.employee_id = d.employee_id AND a.date = d.date AND a.id <> d.keep_id)
+    """)
+    cur.execute("DROP TABLE temp.dup_days")
+    cur.execute("DROP INDEX idx_attendance_dedup")
+
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_attendance_emp_date ON attendance (employee_id, date)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance (date)")
+    # فهرس للمفتاح الخارجي حتى لا يتطلب حذف موظف مسح جدول الحضور بالكامل
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_attendance_finger ON attendance (finger_id)")
+
+
+def _v3_raw_punches(cur):
+    # سجل البصمات الخام (إضافة فقط) لإعادة احتساب الحضور محلياً عند تغيير الفترات
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS punch_devices (
+        id INTEGER PRIMARY KEY,
+        device TEXT UNIQUE NOT NULL    -- ip:port
+    )""")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS punches (
+        employee_id INTEGER NOT NULL,
+        ts INTEGER NOT NULL,           -- ثوانٍ منذ 1970 حسب ساعة الجهاز
+        device_id INTEGER NOT NULL REFERENCES punch_devices(id),
+        verify INTEGER,                -- طريقة التحقق (بصمة، بطاقة، ...)
+        PRIMARY KEY (employee_id, ts, device_id)
+    ) WITHOUT ROWID""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_punches_ts ON punches (ts)")
+
+
+def _v4_daily_summary(cur):
+    # ملخص يومي بأرقام جاهزة للتقارير (انظر daily_summary.py)، يبنى من أوقات الحضور في الإصدار 6
+    create_summary(cur)
+
+
+def _v5_data_version(cur):
+    # رقم إصدار البيانات للتقارير المحفوظة مؤقتاً: يزيد مع تحديث الملخص اليومي (daily_summary)
+    # ومع أي تعديل على جدول الموظفين (الأسماء وحالة الموظف تظهر في التقارير)
+    cur.execute("INSERT OR IGNORE INTO daily_state (key, value) VALUES ('version', '0')")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_employees_version_{event.lower()} AFTER {event} ON employees
+            BEGIN
+                UPDATE daily_state SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version';
+            END""")
+
+
+def _v6_integer_times(cur):
+    # أوقات الحضور بأرقام اليوم ودقائق اليوم (attendance_times) بدلاً من النصوص، والاسم
+    # attendance يصبح عرضاً نصياً للاستعلامات القديمة. القيم القديمة غير المعروفة ("--"، "0"،
+    # "00:00:00") تصبح NULL، وغير الصالحة UNKNOWN_TIME، فتبقى نتائج التقارير كما هي.
+    # السجلات بدون رقم موظف صحيح أو تاريخ YYYY-MM-DD (لم تكن تظهر في التقارير) تنقل كما هي
+    # إلى attendance_rejected للمراجعة، ويحذف الجدول إذا لم توجد.
+    cur.connection.create_function("legacy_minutes", 1, minutes_value, deterministic=True)
+    valid = "typeof(employee_id) = 'integer' AND COALESCE(date(date) = date, 0)"
+    cur.execute(f"CREATE TABLE attendance_rejected AS SELECT * FROM attendance WHERE NOT ({valid})")
+    if not cur.execute("SELECT COUNT(*) FROM attendance_rejected").fetchone()[0]:
+        cur.execute("DROP TABLE attendance_rejected")
+    cur.execute("ALTER TABLE attendance RENAME TO attendance_text")
+    create_times(cur)
+    cur.execute(f"""
+        INSERT INTO attendance_times (day, employee_id, in1, out1, in2, out2)
+        SELECT {day_sql('date')}, employee_id, legacy_minutes(check_in), legacy_minutes(check_out),
+               legacy_minutes(check_in_2), legacy_minutes(check_out_2)
+        FROM attendance_text WHERE {valid} ORDER BY 1, 2
+    """)
+    cur.execute("DROP TABLE attendance_text")
+    rebuild_summary(cur)
+
+
+def _v7_archived_years(cur):
+    # السنوات المنقولة إلى ملفات أرشيف (انظر archive.py): التقارير ترفق ملف السنة عندما تشملها
+    # الفترة، والمزامنة وإعادة الاحتساب لا تكتب في أيامها
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS archived_years (
+        year INTEGER PRIMARY KEY,
+        file TEXT NOT NULL,            -- اسم الملف في مجلد archive بجانب القاعدة
+        first_day INTEGER NOT NULL,    -- أرقام أيام السنة (عدد الأيام منذ 1970-01-01)
+        last_day INTEGER NOT NULL,
+        days INTEGER NOT NULL,         -- عدد سجلات الحضور المنقولة
+        punches INTEGER NOT NULL,      -- عدد البصمات الخام المنقولة
+        archived_at TEXT
+    )""")
+
+
+def _v8_dashboard_counters(cur):
+    # أرقام الشاشة الرئيسية تحدث مع كل كتابة (triggers) بدلاً من COUNT على الجداول الكاملة:
+    # عدد الموظفين وعدد سجلات الحضور (dashboard_counters)، وعدد الحاضرين لكل يوم (daily_present)
+    cur.execute("CREATE TABLE IF NOT EXISTS dashboard_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL) WITHOUT ROWID")
+    cur.execute("INSERT OR REPLACE INTO dashboard_counters SELECT 'employees', COUNT(*) FROM employees")
+    cur.execute("INSERT OR REPLACE INTO dashboard_counters SELECT 'records', COUNT(*) FROM attendance_times")
+    cur.execute("CREATE TABLE IF NOT EXISTS daily_present (day INTEGER PRIMARY KEY, present INTEGER NOT NULL)")
+    cur.execute("DELETE FROM daily_present")
+    cur.execute("""
+        INSERT INTO daily_present SELECT day, COUNT(*) FROM attendance_daily
+        WHERE present1 OR present2 GROUP BY day
+    """)
+    for table, name in (("employees", "employees"), ("attendance_times", "records")):
+        for event, row, step in (("INSERT", "NEW", "+ 1"), ("DELETE", "OLD", "- 1")):
+            cur.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_count_{event.lower()} AFTER {event} ON {table}
+                BEGIN
+                    UPDATE dashboard_counters SET value = value {step} WHERE name = '{name}';
+                END""")
+    # الملخص اليومي يحذف ويضاف من جديد عند إعادة حساب اليوم (تعديل الإعدادات لا يغير الحضور)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_daily_present_insert AFTER INSERT ON attendance_daily
+        WHEN NEW.present1 OR NEW.present2
+        BEGIN
+            INSERT INTO daily_present (day, present) VALUES (NEW.day, 1)
+            ON CONFLICT(day) DO UPDATE SET present = present + 1;
+        END""")
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_daily_present_delete AFTER DELETE ON attendance_daily
+        WHEN OLD.present1 OR OLD.present2
+        BEGIN
+            UPDATE daily_present SET present = present - 1 WHERE day = OLD.day;
+        END""")
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_daily_present_update AFTER UPDATE OF day, present1, present2 ON attendance_daily
+        BEGIN
+            UPDATE daily_present SET present = present - 1 WHERE day = OLD.day AND (OLD.present1 OR OLD.present2);
+            INSERT INTO daily_present (day, present) SELECT NEW.day, 1 WHERE NEW.present1 OR NEW.present2
+            ON CONFLICT(day) DO UPDATE SET present = present + 1;
+        END""")
+
+
+# (رقم الإصدار، الوصف، الدالة) بترتيب التنفيذ
+MIGRATIONS = [
+    (1, "الجداول الأساسية", _v1_base_tables),
+    (2, "فهارس جدول الحضور", _v2_attendance_indexes),
+    (3, "سجل البصمات الخام", _v3_raw_punches),
+    (4, "ملخص الحضور اليومي", _v4_daily_summary),
+    (5, "رقم إصدار بيانات التقارير", _v5_data_version),
+    (6, "أوقات الحضور بالأرقام", _v6_integer_times),
+    (7, "سجل السنوات المؤرشفة", _v7_archived_years),
+    (8, "عدادات الشاشة الرئيسية", _v8_dashboard_counters),
+]
+
+
+def migrate(conn):
+    """ترقية القاعدة إلى آخر إصدار، وإرجاع قائمة (الإصدار، الزمن بالثواني) للمراحل المنفذة"""
+    old_isolation = conn.isolation_level
+    conn.isolation_level = None  # التحكم اليدوي في المعاملات
+    cur = conn.cursor()
+    applied = []
+    try:
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TEXT,
+            duration_ms REAL
+        )""")
+        current = cur.execute("PRAGMA user_version").fetchone()[0]
+        for version, description, step in MIGRATIONS:
+            if version <= current:
+                continue
+            start = time.perf_counter()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                step(cur)
+                elapsed = time.perf_counter() - start
+                cur.execute("INSERT OR REPLACE INTO schema_migrations VALUES (?, ?, ?, ?)",
+                            (version, description, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), elapsed * 1000))
+                cur.execute(f"PRAGMA user_version = {version}")
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+            print(f"🔧 ترقية القاعدة إلى الإصدار {version} ({description}) خلال {elapsed:.2f} ثانية")
+            applied.append((version, elapsed))
+    finally:
+        conn.isolation_level = old_isolation
+    return applied
@@ -0,0 +1,277 @@
+"""
+محرك حساب التقارير من قاعدة البيانات.
+
+التقارير تقرأ الأرقام الجاهزة من ملخص الحضور اليومي (daily_summary) بدلاً من تحليل
+نصوص جدول الحضور: التقرير العام يجمع الحضور والتأخير لكل موظف في استعلام واحد،
+والكشف التفصيلي يحمل دقائق دخول الفترتين لأيام الفترة في مصفوفات (numpy)
+ويحسب الحضور والتأخير وتصفية الفترة بعمليات عليها.
+أيام العمل والإجازات تؤخذ من تقويم العمل (work_calendar). النتائج مطابقة لـ calculate_delay.
+نتائج التقارير تحفظ مؤقتاً (report_cache) حسب المعاملات ورقم إصدار البيانات.
+الفترات التي تشمل سنوات مؤرشفة تقرأ الملخص من ملفاتها أيضاً (archive.attached).
+التقرير العام يحسب على دفعات من الموظفين مع دالة تقدم (progress) تسمح بالإيقاف، حتى يمكن
+تشغيله في خيط منفصل (ReportWorker في reports.py).
+"""
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+import numpy as np
+from archive import attached, union_sql
+from daily_summary import MISSING, EMPTY_VALUES, hm, time_text, day_number, prepare_summary, data_version
+
+PERIOD_BOTH = "الفترتين معاً"
+PERIOD_FIRST = "الفترة الأولى فقط"
+PERIOD_SECOND = "الفترة الثانية فقط"
+
+# نوع اليوم في الكشف التفصيلي، وحالته ولون صفه عند العرض (أيام الحضور بدون لون)
+DAY_PRESENT, DAY_ABSENT, DAY_HOLIDAY, DAY_WEEKEND = range(4)
+DAY_STATUS = {DAY_PRESENT: "حاضر", DAY_ABSENT: "غائب ❌", DAY_HOLIDAY: "إجازة رسمية 🌴", DAY_WEEKEND: "عطلة نهاية أسبوع"}
+DAY_COLORS = {DAY_ABSENT: "#fab1a0", DAY_HOLIDAY: "#dff9fb", DAY_WEEKEND: "#f1f2f6"}
+
+# أعمدة جداول التقارير بترتيب العرض (الشاشة والتصدير وwatan_reports)
+GENERAL_HEADERS = ["إجمالي التأخير", "تأخير ف2", "تأخير ف1", "الغياب (أيام)", "الحضور (أيام)", "اسم الموظف"]
+INDIVIDUAL_HEADERS = ["التاريخ", "دخول ف1", "تأخير ف1", "دخول ف2", "تأخير ف2", "إجمالي التأخير", "الحالة"]
+
+REPORT_CACHE_SIZE = 32  # أقصى عدد للتقارير المحفوظة مؤقتاً
+REPORT_CHUNK = 100      # عدد الموظفين في كل دفعة من التقرير العام
+
+
+def calculate_delay(actual, target):
+    """دقائق التأخير بعد وقت البداية (صفر للقيم الفارغة أو غير الصالحة)"""
+    if not actual or str(actual).strip() in EMPTY_VALUES:
+        return 0
+    try:
+        # تنظيف الوقت وأخذ الساعات والدقائق فقط
+        actual_str = str(actual).strip()[:5]
+        target_str = str(target).strip()[:5]
+
+        h_act, m_act = map(int, actual_str.split(':'))
+        h_tgt, m_tgt = map(int, target_str.split(':'))
+
+        return max(0, (h_act * 60 + m_act) - (h_tgt * 60 + m_tgt))
+    except Exception:
+        return 0
+
+
+def delay_matrix(minutes, target):
+    """دقائق التأخير لكل خانة (صفر للغياب والقيم غير الصالحة)"""
+    t = hm(target)
+    if t is None:
+        return np.zeros(minutes.shape, dtype=np.int32)
+    return np.maximum(minutes - t, 0)
+
+
+class EmployeeDays:
+    """أوقات دخول الفترتين لموظف في كل يوم من فترة التقرير"""
+
+    def __init__(self, days, cin1, cin2):
+        self.days = days            # تواريخ الفترة (date)
+        self.cin1 = cin1            # دقيقة الدخول (أو MISSING / INVALID)
+        self.cin2 = cin2
+
+    def day_kinds(self, calendar):
+        """نوع كل يوم: DAY_HOLIDAY أو DAY_WEEKEND أو DAY_PRESENT (يوم عمل)"""
+        if not self.days:
+            return np.zeros(0, dtype=np.int8)
+        working, holiday = calendar.flags(self.days[0], self.days[-1])
+        return np.where(holiday, DAY_HOLIDAY, np.where(working, DAY_PRESENT, DAY_WEEKEND)).astype(np.int8)
+
+    def period_values(self, period_choice, work_start_1, work_start_2):
+        """(الحضور، تأخير ف1، تأخير ف2) لكل يوم حسب الفترة المختارة"""
+        p1, p2 = self.cin1 != MISSING, self.cin2 != MISSING
+        zeros = np.zeros(self.cin1.shape, dtype=np.int32)
+        if period_choice == PERIOD_FIRST:
+            return p1, delay_matrix(self.cin1, work_start_1), zeros
+        if period_choice == PERIOD_SECOND:
+            return p2, zeros, delay_matrix(self.cin2, work_start_2)
+        return p1 | p2, delay_matrix(self.cin1, work_start_1), delay_matrix(self.cin2, work_start_2)
+
+
+def load_days(conn, employee_id, d1, d2):
+    """تحميل دقائق دخول الموظف في الفترة من d1 إلى d2 من الملخص اليومي باستعلام واحد"""
+    days = [d1 + timedelta(days=i) for i in range((d2 - d1).days + 1)]
+    cin1 = np.full(len(days), MISSING, dtype=np.int32)
+    cin2 = np.full(len(days), MISSING, dtype=np.int32)
+    result = EmployeeDays(days, cin1, cin2)
+    if not days:
+        return result
+
+    # كل عمود يعود كنص أرقام واحد (group_concat) بدلاً من صف لكل يوم،
+    # لأن إنشاء صف بايثون لكل يوم هو الجزء الأبطأ في الفترات الطويلة
+    first = day_number(d1)
+    with attached(conn, d1, d2) as schemas:
+        count, cols, in1, in2 = conn.execute(f"""
+            SELECT COUNT(*), group_concat(day - ?1), group_concat(in1), group_concat(in2)
+            FROM {union_sql('attendance_daily', schemas)}
+            WHERE employee_id = ?2 AND day BETWEEN ?1 AND ?3
+        """, (first, employee_id, day_number(d2))).fetchall()[0]
+    if not count:
+        return result
+    c = np.fromstring(cols, dtype=np.int64, sep=',')
+    cin1[c] = np.fromstring(in1, dtype=np.int64, sep=',')
+    cin2[c] = np.fromstring(in2, dtype=np.int64, sep=',')
+    return result
+
+
+def general_report(conn, d1, d2, period_choice, work_start_1, work_start_2, calendar, progress=None):
+    """
+    التقرير العام: قائمة (رقم البصمة، الاسم، أيام الحضور، أيام الغياب، تأخير ف1، تأخير ف2)
+    لكل موظف فعال، بترتيب رقم البصمة. calendar: تقويم العمل (WorkCalendar).
+    progress(المنجز، الإجمالي): تستدعى بعد كل دفعة من الموظفين، وإذا أعادت False يتوقف
+    الحساب ويعاد None.
+    """
+    prepare_summary(conn, work_start_1, work_start_2, calendar.weekend)
+    if period_choice == PERIOD_FIRST:
+        present, delay1, delay2 = "present1", "delay1", "0"
+    elif period_choice == PERIOD_SECOND:
+        present, delay1, delay2 = "present2", "0", "delay2"
+    else:
+        present, delay1, delay2 = "MAX(present1, present2)", "delay1", "delay2"
+    employees = conn.execute("SELECT finger_id, name FROM employees WHERE active = 1 ORDER BY finger_id").fetchall()
+    days = calendar.count(d1, d2)
+    rows = []
+    with attached(conn, d1, d2) as schemas:
+        daily = union_sql("attendance_daily", schemas)
+        for i in range(0, len(employees), REPORT_CHUNK):
+            chunk = employees[i:i + REPORT_CHUNK]
+            # التأخير محفوظ صفراً في أيام الغياب، فيجمع مباشرة مع الحضور
+            totals = {r[0]: r[1:] for r in conn.execute(f"""
+                SELECT employee_id, SUM({present}), SUM({delay1}), SUM({delay2})
+                FROM {daily}
+                WHERE employee_id BETWEEN ? AND ? AND day BETWEEN ? AND ? AND working = 1
+                GROUP BY employee_id
+            """, (chunk[0][0], chunk[-1][0], day_number(d1), day_number(d2)))}
+            for f_id, name in chunk:
+                pres, delay_f1, delay_f2 = totals.get(f_id, (0, 0, 0))
+                rows.append((f_id, name, pres, days - pres, delay_f1, delay_f2))
+            if progress is not None and progress(len(rows), len(employees)) is False:
+                return None
+    return rows
+
+
+def individual_report(conn, employee_id, d1, d2, period_choice, work_start_1, work_start_2, calendar):
+    """
+    الكشف التفصيلي لموظف: قائمة لكل يوم
+    (التاريخ، نوع اليوم، دخول ف1، تأخير ف1، دخول ف2، تأخير ف2، تأخير اليوم)
+    حيث نص الدخول "--" عند عدم وجود بصمة أو إذا لم تكن الفترة مختارة.
+    """
+    data = load_days(conn, employee_id, d1, d2)
+    kinds = data.day_kinds(calendar)
+    present, m1, m2 = data.period_values(period_choice, work_start_1, work_start_2)
+    show1 = period_choice != PERIOD_SECOND
+    show2 = period_choice != PERIOD_FIRST
+    rows = []
+    for i, d in enumerate(data.days):
+        if kinds[i] != DAY_PRESENT:
+            rows.append((d.isoformat(), int(kinds[i]), "--", 0, "--", 0, 0))
+            continue
+        t1 = time_text(int(data.cin1[i])) if show1 and data.cin1[i] != MISSING else "--"
+        t2 = time_text(int(data.cin2[i])) if show2 and data.cin2[i] != MISSING else "--"
+        kind = DAY_PRESENT if present[i] else DAY_ABSENT
+        a, b = int(m1[i]), int(m2[i])
+        rows.append((d.isoformat(), kind, t1, a, t2, b, a + b))
+    return rows
+
+
+def general_columns(period_choice):
+    """أرقام أعمدة التقرير العام الظاهرة لخيار الفترة"""
+    hidden = {PERIOD_FIRST: (1,), PERIOD_SECOND: (2,)}.get(period_choice, ())
+    return [c for c in range(len(GENERAL_HEADERS)) if c not in hidden]
+
+
+def individual_columns(period_choice):
+    """أرقام أعمدة الكشف التفصيلي الظاهرة لخيار الفترة"""
+    hidden = {PERIOD_FIRST: (3, 4), PERIOD_SECOND: (1, 2)}.get(period_choice, ())
+    return [c for c in range(len(INDIVIDUAL_HEADERS)) if c not in hidden]
+
+
+def general_table(rows):
+    """صفوف general_report بترتيب GENERAL_HEADERS"""
+    for f_id, name, pres, ab_days, delay_f1, delay_f2 in rows:
+        yield [delay_f1 + delay_f2, delay_f2, delay_f1, ab_days, pres, name]
+
+
+def individual_table(days):
+    """صفوف individual_report بترتيب INDIVIDUAL_HEADERS (التاريخ نص YYYY-MM-DD)"""
+    for date_str, kind, cin1, m1, cin2, m2, day_delay in days:
+        yield [date_str, cin1, m1, cin2, m2, day_delay, DAY_STATUS[kind]]
+
+
+def individual_summary(days):
+    """سطر خلاصة الكشف التفصيلي: أيام الحضور والغياب وإجمالي التأخير"""
+    present = sum(1 for day in days if day[1] == DAY_PRESENT)
+    absent = sum(1 for day in days if day[1] == DAY_ABSENT)
+    delay = sum(day[6] for day in days if day[1] == DAY_PRESENT)
+    return f"✅ الحضور: {present} أيام | ❌ الغياب: {absent} أيام | ⏳ إجمالي التأخير: {delay} دقيقة"
+
+
+class ReportCache:
+    """
+    ذاكرة LRU لنتائج التقارير. المفتاح يتضمن رقم إصدار البيانات، فعند تغيره (مزامنة،
+    تعديل موظفين أو إجازات أو إعدادات) يتم تفريغ الذاكرة تلقائياً.
+    النتائج المعادة مشتركة بين الطلبات: للقراءة فقط. الحساب الذي يعيد None (تم إيقافه) لا يحفظ.
+    """
+
+    def __init__(self, max_entries=REPORT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()  # التقارير تطلب من الواجهة ومن خيط التقرير العام
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version, compute):
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.version = version
+            hit = key in self.entries
+            if hit:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                result = self.entries[key]
+            else:
+                self.misses += 1
+        if not hit:
+            result = compute()
+            if result is None:
+                return None
+            with self.lock:
+                if version == self.version:
+                    self.entries[key] = result
+                    if len(self.entries) > self.max_entries:
+                        self.entries.popitem(last=False)
+        return result
+
+    def hit_rate(self):
+        """نسبة الطلبات المعادة من الذاكرة (من العدادين hits و misses)"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.version = None
+
+
+report_cache = ReportCache()
+
+
+def _cache_key(kind, d1, d2, period_choice, employee_id, work_start_1, work_start_2, calendar):
+    # calendar.key: العطلة الأسبوعية ومجموعة الإجازات
+    return (kind, d1, d2, period_choice, employee_id, (work_start_1, work_start_2), calendar.key)
+
+
+def cached_general_report(conn, d1, d2, period_choice, work_start_1, work_start_2, calendar, progress=None):
+    """general_report مع الحفظ المؤقت"""
+    prepare_summary(conn, work_start_1, work_start_2, calendar.weekend)
+    key = _cache_key("general", d1, d2, period_choice, None, work_start_1, work_start_2, calendar)
+    return report_cache.get(key, data_version(conn), lambda: general_report(
+        conn, d1, d2, period_choice, work_start_1, work_start_2, calendar, progress))
+
+
+def cached_individual_report(conn, employee_id, d1, d2, period_choice, work_start_1, work_start_2, calendar):
+    """individual_report مع الحفظ المؤقت"""
+    prepare_summary(conn, work_start_1, work_start_2, calendar.weekend)
+    key = _cache_key("individual", d1, d2, period_choice, employee_id, work_start_1, work_start_2, calendar)
+    return report_cache.get(key, data_version(conn), lambda: individual_report(
+        conn, employee_id, d1, d2, period_choice, work_start_1, work_start_2, calendar))
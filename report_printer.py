@@ -0,0 +1,146 @@
+"""
+طباعة التقارير وتصديرها PDF برسم الصفحات مباشرة (QPainter).
+
+بدلاً من بناء HTML للجدول كله وتخطيطه في QTextDocument، يتم رسم كل صفحة ثم الانتقال
+للتالية: الشعار والترويسة في الصفحة الأولى، عناوين الأعمدة في أعلى كل صفحة، الخلاصة
+والتوقيع بعد آخر صف، ورقم الصفحة أسفل كل صفحة. الصفوف تقرأ من مكرر ولا تجمع في الذاكرة،
+فالزمن يتناسب مع عدد الصفوف والذاكرة ثابتة. الرسم على QPdfWriter يمكن تنفيذه من خيط منفصل
+(الطابعة من خيط الواجهة فقط).
+"""
+import math
+import os
+from datetime import datetime
+from PyQt5.QtCore import Qt, QRectF
+from PyQt5.QtGui import QColor, QFont, QFontMetricsF, QImage, QPainter, QPen
+from PyQt5.QtPrintSupport import QPrinter
+
+HEADER_BG = QColor("#34495e")
+BORDER = QColor("#999999")
+SUMMARY_BG = QColor("#ecf0f1")
+PROGRESS_STEP = 200  # عدد الصفوف بين كل تحديث للتقدم
+
+
+class ReportPainter:
+    def __init__(self, title, target_name, headers, summary="", logo_path=None):
+        self.title = title
+        self.target_name = target_name
+        self.headers = list(headers)
+        self.summary = summary
+        self.logo = QImage(logo_path) if logo_path and os.path.exists(logo_path) else QImage()
+
+    def layout(self, device):
+        """المقاسات بوحدات الجهاز: تحسب مرة واحدة لكل تقرير"""
+        mm = device.logicalDpiY() / 25.4
+        self.width, height = device.width(), device.height()
+        self.body_font = QFont("Arial", 9)
+        self.bold_font = QFont("Arial", 9, QFont.Bold)
+        self.body_metrics = QFontMetricsF(self.body_font, device)
+        self.row_h = self.body_metrics.height() * 1.7
+        self.col_w = self.width / max(1, len(self.headers))
+        self.pad = 1.5 * mm
+        self.footer_h = 8 * mm
+        self.bottom = height - self.footer_h
+        self.logo_h = 22 * mm if not self.logo.isNull() else 0
+        self.title_h = self.logo_h + 32 * mm
+        self.summary_h = 30 * mm
+        self.first_rows = max(1, int((self.bottom - self.title_h - self.row_h) // self.row_h))
+        self.page_rows = max(1, int((self.bottom - self.row_h) // self.row_h))
+        self.mm = mm
+
+    def page_count(self, total):
+        pages = 1 + max(0, math.ceil((total - self.first_rows) / self.page_rows))
+        last_rows = total if pages == 1 else total - self.first_rows - (pages - 2) * self.page_rows
+        start = self.title_h if pages == 1 else 0
+        if start + self.row_h * (last_rows + 1) + self.summary_h > self.bottom:
+            pages += 1  # الخلاصة في صفحة مستقلة
+        return pages
+
+    def render(self, device, rows, total, progress=None):
+        """
+        رسم التقرير على QPrinter أو QPdfWriter. rows: مكرر (القيم، لون الصف)، total: عددها.
+        progress(المنجز، الإجمالي): إذا أعادت False يتوقف الرسم ويعاد False.
+        """
+        self.layout(device)
+        painter = QPainter()
+        if not painter.begin(device):
+            raise Exception("تعذر فتح الملف أو الطابعة للكتابة")
+        try:
+            painter.setLayoutDirection(Qt.RightToLeft)
+            pages = self.page_count(total)
+            page, y = 1, self.draw_title(painter)
+            capacity = self.first_rows
+            y = self.draw_row(painter, y, self.headers, HEADER_BG, header=True)
+            on_page = done = 0
+            for values, color in rows:
+                if on_page == capacity:
+                    self.draw_footer(painter, page, pages)
+                    device.newPage()
+                    page, on_page, capacity = page + 1, 0, self.page_rows
+                    y = self.draw_row(painter, 0, self.headers, HEADER_BG, header=True)
+                y = self.draw_row(painter, y, values, color)
+                on_page += 1
+                done += 1
+                if progress is not None and done % PROGRESS_STEP == 0 and progress(done, total) is False:
+                    if isinstance(device, QPrinter):
+                        device.abort()
+                    return False
+            if y + self.summary_h > self.bottom:
+                self.draw_footer(painter, page, pages)
+                device.newPage()
+                page, y = page + 1, 0
+            self.draw_summary(painter, y)
+            self.draw_footer(painter, page, pages)
+            if progress is not None:
+                progress(total, total)
+            return True
+        finally:
+            painter.end()
+
+    def draw_title(self, painter):
+        """الشعار والترويسة في أعلى الصفحة الأولى؛ يعيد موضع بداية الجدول"""
+        mm, y = self.mm, 0
+        if not self.logo.isNull():
+            w = self.logo_h * self.logo.width() / max(1, self.logo.height())
+            painter.drawImage(QRectF((self.width - w) / 2, 0, w, self.logo_h), self.logo)
+            y = self.logo_h + 2 * mm
+        lines = [("مؤسسة وطن التنموية", 18, "#2c3e50", 11),
+                 (self.title, 14, "#7f8c8d", 9),
+                 (f"المعني: {self.target_name} | تاريخ الطباعة: {datetime.now().strftime('%Y-%m-%d')}", 10, "#000000", 6)]
+        for text, size, color, height in lines:
+            painter.setFont(QFont("Arial", size, QFont.Bold if size > 10 else QFont.Normal))
+            painter.setPen(QColor(color))
+            painter.drawText(QRectF(0, y, self.width, height * mm), Qt.AlignCenter, text)
+            y += height * mm
+        painter.setPen(QPen(BORDER, 0.3 * mm))
+        painter.drawLine(0, int(y + mm), int(self.width), int(y + mm))
+        return self.title_h
+
+    def draw_row(self, painter, y, values, color, header=False):
+        """صف من الجدول (العمود الأول في اليمين)؛ يعيد موضع الصف التالي"""
+        painter.setFont(self.bold_font if header else self.body_font)
+        for i, value in enumerate(values):
+            rect = QRectF(self.width - (i + 1) * self.col_w, y, self.col_w, self.row_h)
+            painter.fillRect(rect, color)
+            painter.setPen(BORDER)
+            painter.drawRect(rect)
+            painter.setPen(Qt.white if header else Qt.black)
+            text = self.body_metrics.elidedText(str(value), Qt.ElideRight, self.col_w - 2 * self.pad)
+            painter.drawText(rect, Qt.AlignCenter, text)
+        return y + self.row_h
+
+    def draw_summary(self, painter, y):
+        mm = self.mm
+        box = QRectF(0, y + 5 * mm, self.width, 10 * mm)
+        painter.fillRect(box, SUMMARY_BG)
+        painter.setPen(Qt.black)
+        painter.setFont(self.bold_font)
+        painter.drawText(box.adjusted(3 * mm, 0, -3 * mm, 0), Qt.AlignRight | Qt.AlignAbsolute | Qt.AlignVCenter,
+                         f"الخلاصة: {self.summary}")
+        painter.setFont(self.body_font)
+        painter.drawText(QRectF(13 * mm, y + 20 * mm, self.width, 8 * mm), Qt.AlignLeft | Qt.AlignAbsolute | Qt.AlignVCenter,
+                         "توقيع مدير الموارد البشرية: ...........................")
+
+    def draw_footer(self, painter, page, pages):
+        painter.setFont(QFont("Arial", 8))
+        painter.setPen(QColor("#7f8c8d"))
+        painter.drawText(QRectF(0, self.bottom, self.width, self.footer_h), Qt.AlignCenter, f"صفحة {page} من {pages}")
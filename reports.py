@@ -1,13 +1,19 @@
-import sqlite3
 import json
 import os
+import sqlite3
 import sys
-import pandas as pd
-from datetime import datetime, timedelta
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from PyQt5.QtPrintSupport import QPrinter, QPrintDialog
+from database import connect, get_connection
+from daily_summary import apply_holidays
+from work_calendar import WorkCalendar, load_calendar, invalidate_calendar, weekend_from_settings
+from report_engine import (calculate_delay, cached_general_report, cached_individual_report, general_columns, individual_columns,
+                           general_table, individual_table, individual_summary, DAY_STATUS, DAY_COLORS, GENERAL_HEADERS, INDIVIDUAL_HEADERS)
+from table_models import ColumnTableModel
+from excel_export import as_date, write_xlsx
+from report_printer import ReportPainter
 
 def resource_path(relative_path):
     try:
@@ -16,13 +22,6 @@ def resource_path(relative_path):
         base_path = os.path.dirname(os.path.abspath(__file__))
     return os.path.join(base_path, relative_path)
 
-def get_db_path():
-    if hasattr(sys, '_MEIPASS'):
-        base_path = os.path.dirname(sys.executable)
-    else:
-        base_path = os.path.dirname(os.path.abspath(__file__))
-    return os.path.join(base_path, "attendance.db")
-
 class HolidayManager(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -49,40 +48,114 @@ class HolidayManager(QDialog):
 
     def init_db(self):
         try:
-            conn = sqlite3.connect(get_db_path())
+            conn = get_connection()
             conn.execute("CREATE TABLE IF NOT EXISTS holidays (holiday_date DATE UNIQUE)")
             conn.commit()
-            conn.close()
         except: pass
 
     def add_holiday(self):
         date_str = self.calendar.selectedDate().toPyDate().isoformat()
         try:
-            conn = sqlite3.connect(get_db_path())
+            conn = get_connection()
             conn.execute("INSERT INTO holidays (holiday_date) VALUES (?)", (date_str,))
             conn.commit()
-            conn.close()
+            self.apply_to_summary(conn)
             self.refresh_list()
         except: QMessageBox.warning(self, "تنبيه", "هذا التاريخ مضاف مسبقاً")
 
+    def apply_to_summary(self, conn):
+        """تحديث يوم العمل في الملخص اليومي لليوم الذي تمت إضافته أو حذفه فقط، وإعادة بناء تقويم العمل"""
+        invalidate_calendar()
+        try:
+            apply_holidays(conn.cursor())
+            conn.commit()
+        except: pass
+
     def refresh_list(self):
         self.list_holidays.clear()
         try:
-            conn = sqlite3.connect(get_db_path())
-            rows = conn.execute("SELECT holiday_date FROM holidays ORDER BY holiday_date DESC").fetchall()
+            rows = get_connection().execute("SELECT holiday_date FROM holidays ORDER BY holiday_date DESC").fetchall()
             for r in rows: self.list_holidays.addItem(r[0])
-            conn.close()
         except: pass
 
     def delete_holiday(self):
         item = self.list_holidays.currentItem()
         if item:
-            conn = sqlite3.connect(get_db_path())
+            conn = get_connection()
             conn.execute("DELETE FROM holidays WHERE holiday_date=?", (item.text(),))
             conn.commit()
-            conn.close()
+            self.apply_to_summary(conn)
             self.refresh_list()
 
+class ReportWorker(QThread):
+    """حساب التقرير العام في خيط منفصل حتى لا تتجمد الواجهة في الفترات الطويلة"""
+    progress = pyqtSignal(int, int)        # الموظفين المنجزين، الإجمالي
+    report_done = pyqtSignal(list, bool)   # صفوف التقرير، هل تم الإيقاف
+    failed = pyqtSignal(str)
+
+    def __init__(self, d1, d2, period_choice, work_start_1, work_start_2, calendar, parent=None, db_path=None):
+        super().__init__(parent)
+        self.period_choice = period_choice
+        self.args = (d1, d2, period_choice, work_start_1, work_start_2, calendar)
+        self.db_path = db_path
+        self._cancelled = False
+
+    def cancel(self):
+        """طلب الإيقاف؛ ينفذ بعد الدفعة الحالية من الموظفين"""
+        self._cancelled = True
+
+    def on_progress(self, done, total):
+        self.progress.emit(done, total)
+        return not self._cancelled
+
+    def run(self):
+        conn = None
+        try:
+            # اتصال خاص بالخيط (اتصال sqlite لا يستخدم من خيطين)
+            conn = connect(self.db_path)
+            rows = cached_general_report(conn, *self.args, progress=self.on_progress)
+            self.report_done.emit(rows or [], rows is None)
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            if conn:
+                conn.close()
+
+class PdfWorker(QThread):
+    """رسم التقرير في ملف PDF في خيط منفصل حتى لا تتجمد الواجهة في التقارير الكبيرة"""
+    progress = pyqtSignal(int, int)   # الصفوف المرسومة، الإجمالي
+    pdf_done = pyqtSignal(bool)       # هل تم الإيقاف
+    failed = pyqtSignal(str)
+
+    def __init__(self, path, report, rows, total, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.report = report
+        self.rows = rows
+        self.total = total
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def on_progress(self, done, total):
+        self.progress.emit(done, total)
+        return not self._cancelled
+
+    def run(self):
+        try:
+            writer = QPdfWriter(self.path)
+            writer.setPageSize(QPageSize(QPageSize.A4))
+            writer.setPageMargins(QMarginsF(10, 10, 10, 10), QPageLayout.Millimeter)
+            writer.setResolution(300)
+            finished = self.report.render(writer, self.rows, self.total, self.on_progress)
+            del writer
+            if not finished:
+                os.remove(self.path)  # لا يترك ملف ناقص
+            self.pdf_done.emit(not finished)
+        except Exception as e:
+            self.failed.emit(str(e))
+
 class ReportsWindow(QWidget):
     def __init__(self):
         super().__init__()
@@ -95,9 +168,11 @@ class ReportsWindow(QWidget):
             QPushButton#ActionBtn { background-color: #27ae60; color: white; border-radius: 6px; font-weight: bold; min-height: 38px; border: none; }
             QPushButton#ExportBtn { background-color: #2980b9; color: white; border-radius: 6px; font-weight: bold; min-height: 38px; border: none; padding: 0 10px; }
             QPushButton#PrintBtn { background-color: #34495e; color: white; border-radius: 6px; font-weight: bold; min-height: 38px; border: none; padding: 0 10px; }
-            QTableWidget { background: white; color: black; border: 1px solid #dcdde1; gridline-color: #ecf0f1; }
+            QTableView { background: white; color: black; border: 1px solid #dcdde1; gridline-color: #ecf0f1; }
             QHeaderView::section { background-color: #34495e; color: white; font-weight: bold; padding: 8px; border: none; }
         """)
+        self.gen_worker = self.pdf_worker = None
+        self.ind_days = self.gen_rows = []  # نتيجة آخر تقرير معروض (يصدر كما هو في الجدول)
         self.load_settings()
         self.init_ui()
 
@@ -110,35 +185,19 @@ class ReportsWindow(QWidget):
                     data = json.load(f)
                     self.work_start_1 = data.get("in_limit_1", "08:00")
                     self.work_start_2 = data.get("in_limit_2", "16:00")
-            else: self.work_start_1, self.work_start_2 = "08:00", "16:00"
-        except: self.work_start_1, self.work_start_2 = "08:00", "16:00"
+                    self.weekend = weekend_from_settings(data)
+            else: self.work_start_1, self.work_start_2, self.weekend = "08:00", "16:00", weekend_from_settings({})
+        except: self.work_start_1, self.work_start_2, self.weekend = "08:00", "16:00", weekend_from_settings({})
 
-    def get_holidays_list(self):
+    def get_calendar(self):
+        """تقويم العمل (الإجازات الرسمية والعطلة الأسبوعية)، محفوظ حتى تعديل الإجازات"""
         try:
-            conn = sqlite3.connect(get_db_path())
-            rows = conn.execute("SELECT holiday_date FROM holidays").fetchall()
-            conn.close()
-            return [str(r[0]) for r in rows]
-        except: return []
+            return load_calendar(get_connection(), self.weekend)
+        except: return WorkCalendar([], self.weekend)
 
     def calculate_delay(self, actual, target):
         """دالة محسنة لحساب التأخير لضمان عدم حصول أخطاء في البيانات"""
-        if not actual or str(actual).strip() in ["--", "None", "", "0", "00:00:00", "None:None"]: 
-            return 0
-        try:
-            # تنظيف الوقت وأخذ الساعات والدقائق فقط
-            actual_str = str(actual).strip()[:5]
-            target_str = str(target).strip()[:5]
-            
-            h_act, m_act = map(int, actual_str.split(':'))
-            h_tgt, m_tgt = map(int, target_str.split(':'))
-            
-            total_act = h_act * 60 + m_act
-            total_tgt = h_tgt * 60 + m_tgt
-            
-            return max(0, total_act - total_tgt)
-        except Exception: 
-            return 0
+        return calculate_delay(actual, target)
 
     def init_ui(self):
         self.main_layout = QVBoxLayout(self)
@@ -157,66 +216,60 @@ class ReportsWindow(QWidget):
         date_widget.setDate(QDate.currentDate())
 
     def export_visual_report(self, table, title, target_name, direct_print=False):
-        if table.rowCount() == 0:
+        model = table.model()
+        total = model.rowCount()
+        if total == 0:
             QMessageBox.warning(self, "تنبيه", "لا توجد بيانات لتصديرها")
             return
-        printer = QPrinter(QPrinter.HighResolution)
-        printer.setPageMargins(10, 10, 10, 10, QPrinter.Millimeter)
+        columns = [c for c in range(model.columnCount()) if not table.isColumnHidden(c)]
+        summary = self.lbl_ind_stats.text() if "تفصيلي" in title else "تقرير الرقابة العام لجميع الموظفين"
+        report = ReportPainter(title, target_name, [model.headerData(c, Qt.Horizontal) for c in columns],
+                               summary, resource_path("logo.jpg"))
+        rows = model.snapshot_rows(columns)
+
         if direct_print:
+            printer = QPrinter(QPrinter.HighResolution)
+            printer.setPageMargins(10, 10, 10, 10, QPrinter.Millimeter)
             print_dialog = QPrintDialog(printer, self)
             if print_dialog.exec_() != QPrintDialog.Accepted: return
-        else:
-            path, _ = QFileDialog.getSaveFileName(self, "حفظ التقرير", f"{title}.pdf", "PDF Files (*.pdf)")
-            if not path: return
-            printer.setOutputFormat(QPrinter.PdfFormat)
-            printer.setOutputFileName(path)
-
-        logo_img = resource_path("logo.jpg")
-        logo_html = f'<img src="file:///{logo_img}" width="100">' if os.path.exists(logo_img) else ""
-        
-        table_html = "<table width='100%' style='border-collapse: collapse; text-align: center; font-family: Arial;'>"
-        table_html += "<tr style='background-color: #34495e; color: white; font-weight: bold;'>"
-        for c in range(table.columnCount()):
-            if not table.isColumnHidden(c):
-                table_html += f"<th style='padding: 8px; border: 1px solid #333;'>{table.horizontalHeaderItem(c).text()}</th>"
-        table_html += "</tr>"
-
-        for r in range(table.rowCount()):
-            item_0 = table.item(r, 0)
-            item_bg = item_0.background().color() if item_0 else QColor(255, 255, 255)
-            bg_hex = item_bg.name() if item_bg.isValid() and item_bg.name() != "#000000" else "#ffffff"
-            table_html += f"<tr style='background-color: {bg_hex};'>"
-            for c in range(table.columnCount()):
-                if not table.isColumnHidden(c):
-                    val = table.item(r, c).text() if table.item(r, c) else ""
-                    table_html += f"<td style='padding: 6px; border: 1px solid #999; color: black;'>{val}</td>"
-            table_html += "</tr>"
-        table_html += "</table>"
-
-        full_html = f"""
-        <html>
-        <body style="direction: rtl; font-family: Arial;">
-            <div style="text-align: center;">
-                {logo_html}
-                <h1 style="color: #2c3e50; margin-bottom: 5px;">مؤسسة وطن التنموية</h1>
-                <h2 style="color: #7f8c8d; margin-top: 0;">{title}</h2>
-                <p>المعني: <b>{target_name}</b> | تاريخ الطباعة: {datetime.now().strftime('%Y-%m-%d')}</p>
-            </div>
-            <hr>
-            {table_html}
-            <br>
-            <div style="background: #ecf0f1; padding: 10px; border-radius: 5px;">
-                <b>الخلاصة:</b> {self.lbl_ind_stats.text() if "تفصيلي" in title else "تقرير الرقابة العام لجميع الموظفين"}
-            </div>
-            <br><br>
-            <p style="text-align: left; margin-left: 50px;">توقيع مدير الموارد البشرية: ...........................</p>
-        </body>
-        </html>
-        """
-        doc = QTextDocument()
-        doc.setHtml(full_html)
-        doc.print_(printer)
-        if not direct_print: QMessageBox.information(self, "تم", "تم تصدير التقرير بنجاح")
+            dialog = self.progress_dialog(total)
+            # الطابعة تستخدم من خيط الواجهة فقط: الرسم هنا مع تحديث نافذة التقدم
+            def step(done, total):
+                dialog.setValue(done)
+                QApplication.processEvents()
+                return not dialog.wasCanceled()
+            try:
+                report.render(printer, rows, total, step)
+            except Exception as e:
+                QMessageBox.warning(self, "خطأ", f"فشلت الطباعة: {e}")
+            dialog.close()
+            return
+
+        path, _ = QFileDialog.getSaveFileName(self, "حفظ التقرير", f"{title}.pdf", "PDF Files (*.pdf)")
+        if not path: return
+        dialog = self.progress_dialog(total)
+        # ملف PDF يرسم في خيط منفصل (PdfWorker)
+        self.pdf_worker = PdfWorker(path, report, rows, total, self)
+        dialog.canceled.connect(self.pdf_worker.cancel)
+        self.pdf_worker.progress.connect(lambda done, total: dialog.setValue(done))
+        self.pdf_worker.pdf_done.connect(lambda cancelled: self.on_pdf_done(dialog, cancelled))
+        self.pdf_worker.failed.connect(lambda error: self.on_pdf_failed(dialog, error))
+        self.pdf_worker.start()
+
+    def progress_dialog(self, total):
+        dialog = QProgressDialog("⏳ جاري إنشاء التقرير...", "إيقاف", 0, total, self)
+        dialog.setWindowModality(Qt.WindowModal)
+        dialog.setMinimumDuration(500)
+        return dialog
+
+    def on_pdf_done(self, dialog, cancelled):
+        dialog.close()
+        if not cancelled:
+            QMessageBox.information(self, "تم", "تم تصدير التقرير بنجاح")
+
+    def on_pdf_failed(self, dialog, error):
+        dialog.close()
+        QMessageBox.warning(self, "خطأ", f"فشل تصدير التقرير: {error}")
 
     def setup_individual_page(self):
         self.page_individual = QWidget()
@@ -245,8 +298,10 @@ class ReportsWindow(QWidget):
         f_lay.addWidget(QLabel("الفترة:"), 1, 0); f_lay.addWidget(self.ind_period, 1, 1)
         f_lay.addWidget(btn_show, 1, 2); f_lay.addWidget(btn_excel, 1, 3); f_lay.addWidget(btn_pdf, 1, 4); f_lay.addWidget(btn_print, 1, 5)
         lay.addWidget(box)
-        self.table_ind = QTableWidget(0, 7)
-        self.table_ind.setHorizontalHeaderLabels(["التاريخ", "دخول ف1", "تأخير ف1", "دخول ف2", "تأخير ف2", "إجمالي التأخير", "الحالة"])
+        self.table_ind = QTableView()
+        self.ind_model = ColumnTableModel(INDIVIDUAL_HEADERS,
+                                          formats=[str] * 6 + [DAY_STATUS.get], palette=DAY_COLORS, parent=self)
+        self.table_ind.setModel(self.ind_model)
         self.table_ind.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         lay.addWidget(self.table_ind)
         self.lbl_ind_stats = QLabel("✅ الحضور: 0 | ❌ الغياب: 0 | ⏳ التأخير: 0 دقيقة")
@@ -258,74 +313,24 @@ class ReportsWindow(QWidget):
         if eid is None: return
         d1, d2 = self.ind_from.date().toPyDate(), self.ind_to.date().toPyDate()
         period_choice = self.ind_period.currentText()
-        holidays = self.get_holidays_list()
-
-        if period_choice == "الفترة الأولى فقط":
-            self.table_ind.setColumnHidden(1, False); self.table_ind.setColumnHidden(2, False)
-            self.table_ind.setColumnHidden(3, True); self.table_ind.setColumnHidden(4, True)
-        elif period_choice == "الفترة الثانية فقط":
-            self.table_ind.setColumnHidden(1, True); self.table_ind.setColumnHidden(2, True)
-            self.table_ind.setColumnHidden(3, False); self.table_ind.setColumnHidden(4, False)
-        else:
-            for i in range(5): self.table_ind.setColumnHidden(i, False)
+        calendar = self.get_calendar()
 
-        attendance_data = {}
-        try:
-            conn = sqlite3.connect(get_db_path())
-            query = "SELECT date, check_in, check_in_2 FROM attendance WHERE employee_id=? AND date BETWEEN ? AND ?"
-            rows = conn.execute(query, (eid, d1.isoformat(), d2.isoformat())).fetchall()
-            for r in rows: attendance_data[r[0]] = {"cin1": r[1], "cin2": r[2]}
-            conn.close()
-        except: pass
+        visible = individual_columns(period_choice)
+        for c in range(len(INDIVIDUAL_HEADERS)): self.table_ind.setColumnHidden(c, c not in visible)
 
-        self.table_ind.setRowCount(0)
-        total_delay, present_count, absence_count = 0, 0, 0
-        curr = d1
-        while curr <= d2:
-            date_str = curr.isoformat()
-            bg_color = QColor(255, 255, 255)
-            row_values = [date_str, "--", "0", "--", "0", "0", ""]
-
-            if date_str in holidays:
-                row_values[6] = "إجازة رسمية 🌴"; bg_color = QColor("#dff9fb")
-            elif curr.weekday() in [4, 5]: 
-                row_values[6] = "عطلة نهاية أسبوع"; bg_color = QColor("#f1f2f6")
-            else:
-                day_data = attendance_data.get(date_str)
-                cin1 = day_data['cin1'] if day_data and day_data['cin1'] not in ["0", "--", None, "00:00:00"] else None
-                cin2 = day_data['cin2'] if day_data and day_data['cin2'] not in ["0", "--", None, "00:00:00"] else None
-                
-                m1 = self.calculate_delay(cin1, self.work_start_1) if cin1 else 0
-                m2 = self.calculate_delay(cin2, self.work_start_2) if cin2 else 0
-
-                is_present = False
-                day_delay = 0
-
-                if period_choice == "الفترة الأولى فقط":
-                    is_present = bool(cin1)
-                    day_delay = m1
-                    row_values = [date_str, str(cin1 or "--"), str(m1), "--", "0", str(day_delay), "حاضر" if is_present else "غائب ❌"]
-                elif period_choice == "الفترة الثانية فقط":
-                    is_present = bool(cin2)
-                    day_delay = m2
-                    row_values = [date_str, "--", "0", str(cin2 or "--"), str(m2), str(day_delay), "حاضر" if is_present else "غائب ❌"]
-                else:
-                    is_present = bool(cin1 or cin2)
-                    day_delay = m1 + m2
-                    row_values = [date_str, str(cin1 or "--"), str(m1), str(cin2 or "--"), str(m2), str(day_delay), "حاضر" if is_present else "غائب ❌"]
-
-                if is_present:
-                    present_count += 1
-                    total_delay += day_delay
-                else:
-                    absence_count += 1
-                    bg_color = QColor("#fab1a0")
-
-            idx = self.table_ind.rowCount(); self.table_ind.insertRow(idx)
-            for i, v in enumerate(row_values):
-                item = QTableWidgetItem(v); item.setTextAlignment(Qt.AlignCenter); item.setBackground(bg_color); self.table_ind.setItem(idx, i, item)
-            curr += timedelta(days=1)
-        self.lbl_ind_stats.setText(f"✅ الحضور: {present_count} أيام | ❌ الغياب: {absence_count} أيام | ⏳ إجمالي التأخير: {total_delay} دقيقة")
+        try:
+            days = cached_individual_report(get_connection(), eid, d1, d2, period_choice,
+                                            self.work_start_1, self.work_start_2, calendar)
+        except (sqlite3.Error, ValueError, OSError) as e:
+            # ValueError و OSError من إرفاق ملفات الأرشيف (عدد السنوات أو ملف غير موجود)
+            days = []
+            QMessageBox.warning(self, "خطأ", f"فشل حساب الكشف التفصيلي: {e}")
+
+        # عمود الحالة هو نوع اليوم (يعرض بـ DAY_STATUS ويلون الصف بـ DAY_COLORS)
+        date_str, kind, cin1, m1, cin2, m2, day_delay = zip(*days) if days else [[]] * 7
+        self.ind_model.set_columns([date_str, cin1, m1, cin2, m2, day_delay, kind], kinds=kind)
+        self.ind_days = days
+        self.lbl_ind_stats.setText(individual_summary(days))
 
     def setup_menu_page(self):
         self.page_menu = QWidget()
@@ -353,93 +358,107 @@ class ReportsWindow(QWidget):
         self.gen_from, self.gen_to = QDateEdit(), QDateEdit()
         self.set_date_range(self.gen_from); self.set_date_range(self.gen_to)
         self.gen_period = QComboBox(); self.gen_period.addItems(["الفترتين معاً", "الفترة الأولى فقط", "الفترة الثانية فقط"])
-        btn_run = QPushButton("📊 توليد التقرير"); btn_run.setObjectName("ActionBtn"); btn_run.clicked.connect(self.load_general_data)
+        self.btn_gen_run = btn_run = QPushButton("📊 توليد التقرير"); btn_run.setObjectName("ActionBtn"); btn_run.clicked.connect(self.load_general_data)
+        self.btn_gen_cancel = QPushButton("⛔ إيقاف"); self.btn_gen_cancel.setObjectName("PrintBtn"); self.btn_gen_cancel.clicked.connect(self.cancel_general)
+        self.btn_gen_cancel.hide()
         btn_excel = QPushButton("📊 Excel"); btn_excel.setObjectName("ExportBtn"); btn_excel.clicked.connect(lambda: self.export_to_excel(self.table_gen, "تقرير_الرقابة_العام"))
         btn_pdf = QPushButton("📑 PDF"); btn_pdf.setObjectName("ExportBtn"); btn_pdf.clicked.connect(lambda: self.export_visual_report(self.table_gen, "تقرير الرقابة العام", "كافة الموظفين"))
         btn_print = QPushButton("🖨️ طباعة"); btn_print.setObjectName("PrintBtn"); btn_print.clicked.connect(lambda: self.export_visual_report(self.table_gen, "تقرير الرقابة العام", "كافة الموظفين", True))
         f_lay.addWidget(QLabel("من:"), 0, 0); f_lay.addWidget(self.gen_from, 0, 1); f_lay.addWidget(QLabel("إلى:"), 0, 2); f_lay.addWidget(self.gen_to, 0, 3); f_lay.addWidget(QLabel("الفترة:"), 0, 4); f_lay.addWidget(self.gen_period, 0, 5)
-        f_lay.addWidget(btn_run, 1, 1); f_lay.addWidget(btn_excel, 1, 2); f_lay.addWidget(btn_pdf, 1, 3); f_lay.addWidget(btn_print, 1, 4)
+        f_lay.addWidget(btn_run, 1, 1); f_lay.addWidget(btn_excel, 1, 2); f_lay.addWidget(btn_pdf, 1, 3); f_lay.addWidget(btn_print, 1, 4); f_lay.addWidget(self.btn_gen_cancel, 1, 5)
         lay.addWidget(box)
-        self.table_gen = QTableWidget(0, 6)
-        self.table_gen.setHorizontalHeaderLabels(["إجمالي التأخير", "تأخير ف2", "تأخير ف1", "الغياب (أيام)", "الحضور (أيام)", "اسم الموظف"])
+        self.gen_progress = QProgressBar(); self.gen_progress.setFormat("%v / %m موظف"); self.gen_progress.hide()
+        self.lbl_gen_status = QLabel("")
+        lay.addWidget(self.gen_progress); lay.addWidget(self.lbl_gen_status)
+        self.table_gen = QTableView()
+        minutes = lambda v: f"{v} د"
+        self.gen_model = ColumnTableModel(GENERAL_HEADERS,
+                                          formats=[minutes] * 3 + [str] * 3, parent=self)
+        self.table_gen.setModel(self.gen_model)
         self.table_gen.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         lay.addWidget(self.table_gen)
 
     def load_general_data(self):
+        if self.gen_worker is not None and self.gen_worker.isRunning():
+            return
         d1, d2 = self.gen_from.date().toPyDate(), self.gen_to.date().toPyDate()
-        holidays = self.get_holidays_list()
+        calendar = self.get_calendar()
         period_choice = self.gen_period.currentText()
 
-        if period_choice == "الفترة الأولى فقط":
-            self.table_gen.setColumnHidden(2, False); self.table_gen.setColumnHidden(1, True)
-        elif period_choice == "الفترة الثانية فقط":
-            self.table_gen.setColumnHidden(2, True); self.table_gen.setColumnHidden(1, False)
-        else:
-            self.table_gen.setColumnHidden(2, False); self.table_gen.setColumnHidden(1, False)
-
-        try:
-            conn = sqlite3.connect(get_db_path())
-            emps = conn.execute("SELECT finger_id, name FROM employees WHERE active=1").fetchall()
-            self.table_gen.setRowCount(0)
-            for f_id, name in emps:
-                query = "SELECT date, check_in, check_in_2 FROM attendance WHERE employee_id=? AND date BETWEEN ? AND ?"
-                att_dict = {r[0]: (r[1], r[2]) for r in conn.execute(query, (f_id, d1.isoformat(), d2.isoformat())).fetchall()}
-                pres, ab_days, delay_f1, delay_f2 = 0, 0, 0, 0
-                curr = d1
-                while curr <= d2:
-                    d_str = curr.isoformat()
-                    if d_str not in holidays and curr.weekday() not in [4, 5]:
-                        day = att_dict.get(d_str)
-                        cin1 = day[0] if day and day[0] not in ["0", "--", None, "00:00:00"] else None
-                        cin2 = day[1] if day and day[1] not in ["0", "--", None, "00:00:00"] else None
-                        
-                        m1 = self.calculate_delay(cin1, self.work_start_1) if cin1 else 0
-                        m2 = self.calculate_delay(cin2, self.work_start_2) if cin2 else 0
-
-                        is_p = False
-                        if period_choice == "الفترة الأولى فقط":
-                            is_p = bool(cin1)
-                            if is_p: delay_f1 += m1
-                        elif period_choice == "الفترة الثانية فقط":
-                            is_p = bool(cin2)
-                            if is_p: delay_f2 += m2
-                        else:
-                            is_p = bool(cin1 or cin2)
-                            if is_p:
-                                delay_f1 += m1
-                                delay_f2 += m2
-                        
-                        if is_p: pres += 1
-                        else: ab_days += 1
-                    curr += timedelta(days=1)
-                
-                idx = self.table_gen.rowCount(); self.table_gen.insertRow(idx)
-                vals = [f"{delay_f1+delay_f2} د", f"{delay_f2} د", f"{delay_f1} د", str(ab_days), str(pres), name]
-                for i, v in enumerate(vals):
-                    item = QTableWidgetItem(v); item.setTextAlignment(Qt.AlignCenter); self.table_gen.setItem(idx, i, item)
-            conn.close()
-        except: pass
+        # الحساب في خيط منفصل (ReportWorker)، والنتيجة تعرض في الجدول دفعة واحدة عند الانتهاء
+        self.gen_worker = ReportWorker(d1, d2, period_choice, self.work_start_1, self.work_start_2, calendar, self)
+        self.gen_worker.progress.connect(self.on_general_progress)
+        self.gen_worker.report_done.connect(self.on_general_done)
+        self.gen_worker.failed.connect(self.on_general_failed)
+        self.set_general_running(True)
+        self.gen_worker.start()
+
+    def cancel_general(self):
+        if self.gen_worker is not None and self.gen_worker.isRunning():
+            self.lbl_gen_status.setText("⏳ جاري إيقاف التقرير...")
+            self.gen_worker.cancel()
+
+    def set_general_running(self, running):
+        self.btn_gen_run.setEnabled(not running)
+        self.btn_gen_cancel.setVisible(running)
+        self.gen_progress.setVisible(running)
+        if running:
+            self.gen_progress.setRange(0, 0)
+            self.lbl_gen_status.setText("⏳ جاري حساب التقرير...")
+
+    def on_general_progress(self, done, total):
+        self.gen_progress.setRange(0, total)
+        self.gen_progress.setValue(done)
+
+    def on_general_done(self, rows, cancelled):
+        self.set_general_running(False)
+        if cancelled:
+            self.lbl_gen_status.setText("⛔ تم إيقاف التقرير")
+            return
+        visible = general_columns(self.gen_worker.period_choice)
+        for c in range(len(GENERAL_HEADERS)): self.table_gen.setColumnHidden(c, c not in visible)
+
+        self.gen_rows = rows
+        self.gen_model.set_columns(list(zip(*general_table(rows))) if rows else [[]] * 6)
+        self.lbl_gen_status.setText(f"✅ تم حساب التقرير لـ {len(rows)} موظف")
+
+    def on_general_failed(self, error):
+        self.set_general_running(False)
+        self.lbl_gen_status.setText("❌ فشل حساب التقرير")
+        QMessageBox.warning(self, "خطأ", f"فشل حساب التقرير العام: {error}")
+
+    def closeEvent(self, event):
+        # انتظار خيوط التقرير والتصدير قبل إغلاق النافذة
+        for worker in (self.gen_worker, self.pdf_worker):
+            if worker is not None and worker.isRunning():
+                worker.cancel()
+                worker.wait()
+        super().closeEvent(event)
 
     def export_to_excel(self, table, filename):
-        if table.rowCount() == 0: return
+        if table.model().rowCount() == 0: return
         path, _ = QFileDialog.getSaveFileName(self, "حفظ Excel", f"{filename}.xlsx", "Excel Files (*.xlsx)")
         if path:
-            headers = []
-            visible_cols = []
-            for i in range(table.columnCount()):
-                if not table.isColumnHidden(i):
-                    headers.append(table.horizontalHeaderItem(i).text())
-                    visible_cols.append(i)
-            
-            data = []
-            for r in range(table.rowCount()):
-                row_data = []
-                for c in visible_cols:
-                    row_data.append(table.item(r, c).text())
-                data.append(row_data)
-                
-            pd.DataFrame(data, columns=headers).to_excel(path, index=False)
-            QMessageBox.information(self, "تم", "تم التصدير بنجاح")
+            visible_cols = [i for i in range(table.model().columnCount()) if not table.isColumnHidden(i)]
+            headers = [table.model().headerData(i, Qt.Horizontal) for i in visible_cols]
+            # الصفوف تكتب للملف مباشرة من نتيجة التقرير المعروض بدون نسخ الجدول في الذاكرة
+            rows = ([values[c] for c in visible_cols] for values in self.excel_rows(table))
+            try:
+                write_xlsx(path, headers, rows, "التقرير")
+                QMessageBox.information(self, "تم", "تم التصدير بنجاح")
+            except Exception as e:
+                QMessageBox.warning(self, "خطأ", f"فشل التصدير: {e}")
+
+    def excel_rows(self, table):
+        """
+        صفوف آخر تقرير معروض بترتيب أعمدة الجدول، بقيم بأنواعها (تاريخ، دقائق كأرقام).
+        من النتيجة المحفوظة عند العرض وليس بإعادة الحساب، فيطابق الملف الجدول حتى لو تغيرت البيانات بعده.
+        """
+        if table is self.table_ind:
+            for row in individual_table(self.ind_days):
+                yield [as_date(row[0])] + row[1:]
+        else:
+            yield from general_table(self.gen_rows)
 
     def card_style(self, color):
         return f"QPushButton {{ background: white; color: {color}; border: 4px solid {color}; border-radius: 20px; font-size: 18px; font-weight: bold; }} QPushButton:hover {{ background: {color}; color: white; }}"
@@ -447,10 +466,9 @@ class ReportsWindow(QWidget):
     def go_to_individual(self):
         self.ind_emp.clear()
         try:
-            conn = sqlite3.connect(get_db_path())
-            cur = conn.execute("SELECT finger_id, name FROM employees WHERE active=1 ORDER BY name ASC").fetchall()
+            cur = get_connection().execute("SELECT finger_id, name FROM employees WHERE active=1 ORDER BY name ASC").fetchall()
             for row in cur: self.ind_emp.addItem(row[1], row[0])
-            conn.close(); self.stack.setCurrentIndex(1)
+            self.stack.setCurrentIndex(1)
         except: pass
 
 if __name__ == "__main__":
@@ -1,14 +1,21 @@
 import json
 import os
+import time
 from PyQt5.QtWidgets import *
-from PyQt5.QtCore import Qt, QTime
+from PyQt5.QtCore import Qt, QTime, QDate
 from styles import STYLE_SHEET
+from database import get_connection
+from sync_engine import get_devices, reclassify, DEFAULT_PORT, DEFAULT_TIMEOUT
+from daily_summary import apply_settings
+from archive import archive_year, archivable_years, archived_years
+from work_calendar import DAY_NAMES, weekend_from_settings
+from shift_classifier import in_window
 
 class SettingsWindow(QWidget):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("إعدادات نظام وطن - إدارة الفترات")
-        self.resize(500, 700) 
+        self.resize(600, 800) 
         self.setStyleSheet(STYLE_SHEET)
         self.setLayoutDirection(Qt.RightToLeft)
         
@@ -22,12 +29,26 @@ class SettingsWindow(QWidget):
         connection_group = QGroupBox("📡 إعدادات الاتصال بالجهاز")
         conn_layout = QFormLayout()
         
-        self.ip = QLineEdit()
+        # جدول أجهزة البصمة (يمكن ربط أكثر من جهاز في الفروع)
+        self.devices_table = QTableWidget(0, 4)
+        self.devices_table.setHorizontalHeaderLabels(["اسم الجهاز", "عنوان الـ IP", "المنفذ", "المهلة (ث)"])
+        self.devices_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.devices_table.setFixedHeight(150)
+        
+        dev_buttons = QHBoxLayout()
+        btn_add_dev = QPushButton("➕ إضافة جهاز")
+        btn_add_dev.clicked.connect(lambda: self.add_device_row())
+        btn_del_dev = QPushButton("🗑️ حذف الجهاز المحدد")
+        btn_del_dev.clicked.connect(self.remove_device_row)
+        dev_buttons.addWidget(btn_add_dev)
+        dev_buttons.addWidget(btn_del_dev)
+        
         self.username = QLineEdit()
         self.password = QLineEdit()
         self.password.setEchoMode(QLineEdit.Password)
         
-        conn_layout.addRow("عنوان الـ IP:", self.ip)
+        conn_layout.addRow(self.devices_table)
+        conn_layout.addRow(dev_buttons)
         conn_layout.addRow("اسم المستخدم:", self.username)
         conn_layout.addRow("كلمة المرور:", self.password)
         connection_group.setLayout(conn_layout)
@@ -63,6 +84,61 @@ class SettingsWindow(QWidget):
         time_group2.setLayout(time_layout2)
         layout.addWidget(time_group2)
 
+        # --- العطلة الأسبوعية (تستخدم في التقارير وتقويم أيام العمل) ---
+        weekend_group = QGroupBox("📅 أيام العطلة الأسبوعية")
+        weekend_layout = QHBoxLayout()
+        self.weekend_checks = []
+        for name in DAY_NAMES:
+            check = QCheckBox(name)
+            self.weekend_checks.append(check)
+            weekend_layout.addWidget(check)
+        weekend_group.setLayout(weekend_layout)
+        layout.addWidget(weekend_group)
+
+        # --- النسخ الاحتياطي التلقائي (مجلد backups بجانب القاعدة) ---
+        backup_group = QGroupBox("💾 النسخ الاحتياطي التلقائي")
+        backup_layout = QFormLayout()
+        self.backup_hours = QSpinBox()
+        self.backup_hours.setRange(0, 24 * 30)
+        self.backup_hours.setSuffix(" ساعة")
+        self.backup_hours.setSpecialValueText("متوقف")
+        backup_layout.addRow("نسخة كل:", self.backup_hours)
+        backup_group.setLayout(backup_layout)
+        layout.addWidget(backup_group)
+
+        # --- إعادة احتساب السجلات السابقة من البصمات الخام ---
+        recalc_group = QGroupBox("🔁 إعادة احتساب الحضور بالفترات الحالية")
+        recalc_layout = QGridLayout()
+        self.recalc_from = QDateEdit(QDate.currentDate().addMonths(-1))
+        self.recalc_to = QDateEdit(QDate.currentDate())
+        for w in (self.recalc_from, self.recalc_to):
+            w.setCalendarPopup(True)
+            w.setDisplayFormat("yyyy-MM-dd")
+        btn_recalc = QPushButton("🔁 إعادة الاحتساب")
+        btn_recalc.clicked.connect(self.recalculate_history)
+        recalc_layout.addWidget(QLabel("من:"), 0, 0)
+        recalc_layout.addWidget(self.recalc_from, 0, 1)
+        recalc_layout.addWidget(QLabel("إلى:"), 0, 2)
+        recalc_layout.addWidget(self.recalc_to, 0, 3)
+        recalc_layout.addWidget(btn_recalc, 1, 0, 1, 4)
+        recalc_group.setLayout(recalc_layout)
+        layout.addWidget(recalc_group)
+
+        # --- أرشفة السنوات المنتهية (مجلد archive بجانب القاعدة) ---
+        archive_group = QGroupBox("🗄️ أرشفة السنوات السابقة")
+        archive_layout = QGridLayout()
+        self.archive_year = QComboBox()
+        self.lbl_archived = QLabel()
+        btn_archive = QPushButton("🗄️ نقل السنة إلى الأرشيف")
+        btn_archive.clicked.connect(self.archive_selected_year)
+        archive_layout.addWidget(QLabel("السنة:"), 0, 0)
+        archive_layout.addWidget(self.archive_year, 0, 1)
+        archive_layout.addWidget(btn_archive, 0, 2)
+        archive_layout.addWidget(self.lbl_archived, 1, 0, 1, 3)
+        archive_group.setLayout(archive_layout)
+        layout.addWidget(archive_group)
+        self.load_archive_years()
+
         # --- أزرار التحكم ---
         self.load_settings()
 
@@ -83,7 +159,9 @@ class SettingsWindow(QWidget):
             if os.path.exists(self.settings_file):
                 with open(self.settings_file, "r", encoding='utf-8') as f:
                     data = json.load(f)
-                    self.ip.setText(str(data.get("ip", "192.168.1.205")))
+                    self.devices_table.setRowCount(0)
+                    for device in get_devices(data):
+                        self.add_device_row(device)
                     self.username.setText(str(data.get("username", "123"))) # الافتراضي 123
                     self.password.setText(str(data.get("password", "123"))) # الافتراضي 123
                     
@@ -91,6 +169,8 @@ class SettingsWindow(QWidget):
                     self.out_limit_1.setTime(QTime.fromString(data.get("out_limit_1", "14:00"), "HH:mm"))
                     self.in_limit_2.setTime(QTime.fromString(data.get("in_limit_2", "20:00"), "HH:mm"))
                     self.out_limit_2.setTime(QTime.fromString(data.get("out_limit_2", "01:00"), "HH:mm"))
+                    self.set_weekend(weekend_from_settings(data))
+                    self.backup_hours.setValue(int(data.get("backup_interval_hours", 24)))
             else:
                 self.set_defaults()
         except Exception:
@@ -98,24 +178,72 @@ class SettingsWindow(QWidget):
 
     def set_defaults(self):
         """القيم المطلوبة 123 كافتراضي"""
-        self.ip.setText("192.168.1.205")
+        self.devices_table.setRowCount(0)
+        self.add_device_row({"ip": "192.168.1.205", "label": "الجهاز الرئيسي"})
         self.username.setText("123")
         self.password.setText("123")
         self.in_limit_1.setTime(QTime(9, 0))
         self.out_limit_1.setTime(QTime(14, 0))
         self.in_limit_2.setTime(QTime(20, 0))
         self.out_limit_2.setTime(QTime(1, 0))
+        self.set_weekend(weekend_from_settings({}))
+        self.backup_hours.setValue(24)
+
+    def set_weekend(self, weekend):
+        for i, check in enumerate(self.weekend_checks):
+            check.setChecked(i in weekend)
+
+    def add_device_row(self, device=None):
+        device = device or {}
+        row = self.devices_table.rowCount()
+        self.devices_table.insertRow(row)
+        values = [device.get("label", f"جهاز {row + 1}"), device.get("ip", ""),
+                  device.get("port", DEFAULT_PORT), device.get("timeout", DEFAULT_TIMEOUT)]
+        for col, val in enumerate(values):
+            self.devices_table.setItem(row, col, QTableWidgetItem(str(val)))
+        # الخيارات غير الظاهرة في الجدول (udp, ping) تحفظ مع الصف حتى لا تضيع عند الحفظ
+        self.devices_table.item(row, 0).setData(Qt.UserRole, device)
+
+    def remove_device_row(self):
+        row = self.devices_table.currentRow()
+        if row >= 0:
+            self.devices_table.removeRow(row)
+
+    def read_devices(self):
+        """قراءة الأجهزة من الجدول مع تجاهل الصفوف بدون عنوان IP"""
+        devices = []
+        for row in range(self.devices_table.rowCount()):
+            cells = [self.devices_table.item(row, col) for col in range(4)]
+            label, ip, port, timeout = [c.text().strip() if c else "" for c in cells]
+            if not ip:
+                continue
+            device = dict(cells[0].data(Qt.UserRole) or {}) if cells[0] else {}
+            device.update({
+                "label": label or f"جهاز {row + 1}",
+                "ip": ip,
+                "port": int(port) if port.isdigit() else DEFAULT_PORT,
+                "timeout": int(timeout) if timeout.isdigit() else DEFAULT_TIMEOUT,
+            })
+            devices.append(device)
+        return devices
 
     def save_settings(self):
         """حفظ البيانات بشكل نهائي وآمن"""
+        devices = self.read_devices()
+        if not devices:
+            QMessageBox.warning(self, "تنبيه", "يجب إضافة جهاز بصمة واحد على الأقل")
+            return
         save_data = {
-            "ip": self.ip.text().strip(),
+            "ip": devices[0]["ip"],  # للتوافق مع الإصدارات السابقة
+            "devices": devices,
             "username": self.username.text().strip(),
             "password": self.password.text().strip(),
             "in_limit_1": self.in_limit_1.time().toString("HH:mm"),
             "out_limit_1": self.out_limit_1.time().toString("HH:mm"),
             "in_limit_2": self.in_limit_2.time().toString("HH:mm"),
-            "out_limit_2": self.out_limit_2.time().toString("HH:mm")
+            "out_limit_2": self.out_limit_2.time().toString("HH:mm"),
+            "weekend_days": [i for i, check in enumerate(self.weekend_checks) if check.isChecked()],
+            "backup_interval_hours": self.backup_hours.value()
         }
         
         try:
@@ -123,15 +251,77 @@ class SettingsWindow(QWidget):
                 json.dump(save_data, f, indent=4, ensure_ascii=False)
                 f.flush()
                 os.fsync(f.fileno())
+            self.apply_to_summary(save_data["in_limit_1"], save_data["in_limit_2"], save_data["weekend_days"])
                 
             QMessageBox.information(self, "نجاح", "تم الحفظ بنجاح! سيتم استخدام البيانات الجديدة عند الاتصال.")
         except Exception as e:
             QMessageBox.critical(self, "خطأ", f"فشل الحفظ، تأكد من صلاحيات المجلد: {str(e)}")
 
+    def apply_to_summary(self, work_start_1, work_start_2, weekend):
+        """تطبيق بداية الدوام والعطلة الأسبوعية على الملخص اليومي (الصفوف التي تتغير فقط)"""
+        try:
+            conn = get_connection()
+            apply_settings(conn.cursor(), work_start_1, work_start_2, weekend)
+            conn.commit()
+        except Exception: pass
+
+    def recalculate_history(self):
+        """إعادة بناء أوقات الدخول والخروج من البصمات المحفوظة محلياً حسب حدود الفترات المعروضة"""
+        d1, d2 = self.recalc_from.date().toPyDate(), self.recalc_to.date().toPyDate()
+        if d1 > d2:
+            QMessageBox.warning(self, "تنبيه", "تاريخ البداية بعد تاريخ النهاية")
+            return
+        config = {
+            "in_limit_1": self.in_limit_1.time().toString("HH:mm"),
+            "out_limit_1": self.out_limit_1.time().toString("HH:mm"),
+            "in_limit_2": self.in_limit_2.time().toString("HH:mm"),
+            "out_limit_2": self.out_limit_2.time().toString("HH:mm")
+        }
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            start = time.perf_counter()
+            conn = get_connection()
+            days = reclassify(conn, d1, d2, config)
+            conn.commit()
+            QApplication.restoreOverrideCursor()
+            QMessageBox.information(self, "نجاح", f"تمت إعادة احتساب {days} يوم حضور خلال {time.perf_counter() - start:.1f} ثانية.")
+        except Exception as e:
+            QApplication.restoreOverrideCursor()
+            QMessageBox.critical(self, "خطأ", f"فشلت إعادة الاحتساب: {str(e)}")
+
+    def load_archive_years(self):
+        """السنوات التي يمكن أرشفتها والسنوات المؤرشفة"""
+        try:
+            conn = get_connection()
+            self.archive_year.clear()
+            self.archive_year.addItems([str(y) for y in archivable_years(conn)])
+            years = [str(y[0]) for y in archived_years(conn)]
+            self.lbl_archived.setText("المؤرشفة: " + ("، ".join(years) if years else "لا يوجد"))
+        except Exception: pass
+
+    def archive_selected_year(self):
+        """نقل سجلات السنة المختارة إلى ملف أرشيفها (التقارير تقرأ منه عند الحاجة)"""
+        if not self.archive_year.currentText():
+            QMessageBox.warning(self, "تنبيه", "لا توجد سنة منتهية لأرشفتها")
+            return
+        year = int(self.archive_year.currentText())
+        answer = QMessageBox.question(self, "تأكيد", f"نقل سجلات سنة {year} إلى ملف الأرشيف؟\n"
+                                      "ستبقى في التقارير، ولن تظهر في سجل الحضور ولن تتغير بالمزامنة.")
+        if answer != QMessageBox.Yes:
+            return
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            start = time.perf_counter()
+            days, punches = archive_year(get_connection(), year)
+            QApplication.restoreOverrideCursor()
+            QMessageBox.information(self, "نجاح", f"تم نقل {days} سجل حضور و {punches} بصمة لسنة {year} "
+                                    f"خلال {time.perf_counter() - start:.1f} ثانية.")
+        except Exception as e:
+            QApplication.restoreOverrideCursor()
+            QMessageBox.critical(self, "خطأ", f"فشلت الأرشفة: {str(e)}")
+        self.load_archive_years()
+
     @staticmethod
     def is_time_between(target, start, end):
         """الدالة المساعدة لمطابقة الوقت"""
-        if start <= end:
-            return start <= target <= end
-        else:
-            return target >= start or target <= end
\ No newline at end of file
+        return in_window(target, start, end)
\ No newline at end of file
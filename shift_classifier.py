@@ -0,0 +1,78 @@
+"""
+تصنيف البصمات إلى فترات الدوام.
+
+يتم بناء جدول من 1440 خانة (خانة لكل دقيقة في اليوم) مرة واحدة من الإعدادات،
+فيصبح تصنيف البصمة قراءة خانة واحدة بدلاً من تحويل النصوص إلى أوقات لكل بصمة.
+الفترات العابرة لمنتصف الليل (مثلاً 20:00 إلى 01:00) مدعومة.
+"""
+from functools import lru_cache
+
+OUTSIDE, PERIOD_1, PERIOD_2 = 0, 1, 2
+MINUTES_PER_DAY = 24 * 60
+
+
+def parse_hhmm(text):
+    """تحويل "HH:MM" إلى دقيقة اليوم"""
+    h, m = str(text).strip().split(':')[:2]
+    h, m = int(h), int(m)
+    if not (0 <= h < 24 and 0 <= m < 60):
+        raise ValueError(f"وقت غير صالح: {text}")
+    return h * 60 + m
+
+
+def in_window(target, start, end):
+    """هل الوقت بين البداية والنهاية حتى لو عبرت الفترة منتصف الليل"""
+    if start <= end:
+        return start <= target <= end
+    else: # دوام ليلي عابر لمنتصف الليل
+        return target >= start or target <= end
+
+
+class ShiftClassifier:
+    def __init__(self, windows):
+        """windows: قائمة (الفترة، دقيقة البداية، دقيقة النهاية)، الأسبق في القائمة له الأولوية"""
+        self.windows = list(windows)
+        self.table = bytearray(MINUTES_PER_DAY)
+        for period, start, end in reversed(self.windows):
+            for m in range(MINUTES_PER_DAY):
+                if in_window(m, start, end):
+                    self.table[m] = period
+
+    @classmethod
+    def from_settings(cls, config):
+        """بناء المصنف من إعدادات الفترتين (مع الاحتفاظ بنسخة لكل مجموعة حدود)"""
+        return _from_limits(config.get('in_limit_1'), config.get('out_limit_1'),
+                            config.get('in_limit_2'), config.get('out_limit_2'))
+
+    def classify_minute(self, minute):
+        return self.table[minute]
+
+    def classify_time(self, value):
+        """تصنيف نص "HH:MM" أو كائن وقت/تاريخ، والنص غير الصالح يعتبر خارج الفترات"""
+        if hasattr(value, 'hour'):
+            return self.table[value.hour * 60 + value.minute]
+        try:
+            return self.table[parse_hhmm(value)]
+        except (ValueError, TypeError):
+            return OUTSIDE
+
+    def classify_batch(self, minutes):
+        """
+        تصنيف مجموعة من دقائق اليوم دفعة واحدة.
+        مصفوفة numpy تعيد مصفوفة numpy، وأي تسلسل آخر يعيد bytes بنفس الطول.
+        """
+        if hasattr(minutes, 'dtype'):
+            import numpy as np
+            return np.frombuffer(bytes(self.table), dtype=np.uint8)[minutes]
+        return bytes(map(self.table.__getitem__, minutes))
+
+
+@lru_cache(maxsize=8)
+def _from_limits(in1, out1, in2, out2):
+    windows = []
+    for period, start, end in ((PERIOD_1, in1, out1), (PERIOD_2, in2, out2)):
+        try:
+            windows.append((period, parse_hhmm(start), parse_hhmm(end)))
+        except (ValueError, TypeError, AttributeError):
+            continue  # حدود غير صالحة: الفترة لا تطابق أي بصمة
+    return ShiftClassifier(windows)
@@ -36,7 +36,7 @@ QLineEdit {
     border-radius: 8px;
     background-color: white;
 }
-QTableWidget {
+QTableView {
     background-color: white;
     border-radius: 15px;
     gridline-color: #f1f2f6;
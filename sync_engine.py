@@ -0,0 +1,229 @@
+"""
+محرك دمج البصمات المسحوبة من الجهاز في جدول الحضور.
+
+بدلاً من استعلام SELECT ثم INSERT/UPDATE لكل بصمة، يتم تحميل البصمات المصنفة
+في جدول مؤقت دفعة واحدة (executemany) ثم حساب أوقات كل يوم لكل موظف
+ودمجها في أوقات الحضور (attendance_times) بعدد ثابت من الاستعلامات داخل معاملة واحدة.
+التواريخ والأوقات تحول إلى رقم اليوم ودقيقة اليوم عند التحميل في الجدول المؤقت.
+الأيام التي تتغير يعاد حساب ملخصها اليومي (daily_summary) في نفس المعاملة.
+أيام السنوات المؤرشفة (archive.py) لا تكتب في القاعدة الأساسية.
+"""
+import calendar
+import heapq
+from datetime import datetime, timedelta
+from shift_classifier import ShiftClassifier
+from daily_summary import refresh_days, day_sql
+
+DEFAULT_PORT = 4370
+DEFAULT_TIMEOUT = 10
+# شرط اليوم (عمود day) في سنة مؤرشفة: سجلاتها في ملف الأرشيف وليس في القاعدة الأساسية
+ARCHIVED_DAY = "EXISTS (SELECT 1 FROM archived_years a WHERE day BETWEEN a.first_day AND a.last_day)"
+
+
+def get_devices(config):
+    """قائمة أجهزة البصمة من الإعدادات (مع دعم الإعدادات القديمة ذات عنوان IP واحد)"""
+    devices = config.get("devices") or [{"ip": config.get("ip", "192.168.1.205")}]
+    result = []
+    for i, d in enumerate(devices):
+        ip = str(d.get("ip", "")).strip()
+        if not ip:
+            continue
+        result.append({
+            "ip": ip,
+            "port": int(d.get("port") or DEFAULT_PORT),
+            "timeout": int(d.get("timeout") or DEFAULT_TIMEOUT),
+            "label": str(d.get("label") or f"جهاز {i + 1}"),
+            "udp": bool(d.get("udp", False)),    # الإتصال عبر UDP للأجهزة القديمة
+            "ping": bool(d.get("ping", True)),   # فحص ping قبل الإتصال
+        })
+    return result
+
+
+def zk_options(device):
+    """معاملات ZK(...) من إعدادات الجهاز"""
+    return {"port": device["port"], "timeout": device["timeout"],
+            "force_udp": device["udp"], "ommit_ping": not device["ping"]}
+
+
+def device_key(device):
+    """المفتاح المستخدم لحفظ آخر بصمة مسحوبة من الجهاز"""
+    return f"{device['ip']}:{device['port']}"
+
+
+def merge_streams(streams):
+    """
+    دمج بصمات عدة أجهزة في تسلسل واحد مرتب زمنياً
+    streams: قاموس {مفتاح الجهاز: قائمة بصمات مرتبة حسب (الوقت، رقم الموظف)}
+    الناتج: (مفتاح الجهاز، البصمة) بالترتيب الزمني
+    """
+    def tag(key, records):
+        for r in records:
+            yield r.timestamp, str(r.user_id), key, r
+
+    tagged = [tag(key, records) for key, records in streams.items()]
+    for ts, user_id, key, record in heapq.merge(*tagged, key=lambda x: (x[0], x[1])):
+        yield key, record
+
+
+def merge_punches(db, punches):
+    """
+    دمج البصمات المصنفة في أوقات الحضور
+    punches: قائمة (رقم الموظف، التاريخ YYYY-MM-DD، الوقت HH:MM، الفترة 1 أو 2)
+    النتيجة مطابقة لمعالجة البصمات واحدة تلو الأخرى بالترتيب الزمني:
+    أول بصمة في الفترة = دخول، وآخر بصمة مختلفة عن الدخول = خروج.
+    لا يتم الحفظ (commit) هنا حتى يكتب المستدعي باقي بياناته في نفس المعاملة.
+    """
+    cur = db.cursor()
+    cur.execute("DROP TABLE IF EXISTS temp.staging_punches")
+    cur.execute("DROP TABLE IF EXISTS temp.staging_days")
+    cur.execute("DROP TABLE IF EXISTS temp.merged_days")
+
+    # 1. تحميل البصمات في الجدول المؤقت: رقم اليوم، ودقيقة اليوم من الوقت HH:MM
+    cur.execute("CREATE TEMP TABLE staging_punches (employee_id INTEGER, day INTEGER, m INTEGER, period INTEGER)")
+    cur.executemany(f"""
+        INSERT INTO staging_punches VALUES
+        (?1, {day_sql('?2')}, CAST(substr(?3, 1, 2) AS INTEGER) * 60 + CAST(substr(?3, 4, 2) AS INTEGER), ?4)
+    """, punches)
+    cur.execute(f"DELETE FROM staging_punches WHERE {ARCHIVED_DAY}")
+    cur.execute("CREATE INDEX temp.idx_staging_punches ON staging_punches (employee_id, day, period, m)")
+
+    # 2. أول بصمة لكل فترة في كل يوم لكل موظف
+    cur.execute("""
+        CREATE TEMP TABLE staging_days AS
+        SELECT employee_id, day,
+               MIN(CASE WHEN period = 1 THEN m END) AS first1,
+               MIN(CASE WHEN period = 2 THEN m END) AS first2
+        FROM staging_punches GROUP BY employee_id, day
+    """)
+    cur.execute("CREATE UNIQUE INDEX temp.idx_staging_days ON staging_days (employee_id, day)")
+
+    # 3. ربط كل يوم بسجله الحالي (إن وجد) وحساب الدخول النهائي لكل فترة
+    cur.execute("""
+        CREATE TEMP TABLE merged_days AS
+        SELECT d.employee_id, d.day,
+               COALESCE(a.in1, d.first1) AS in1, a.out1 AS out1,
+               COALESCE(a.in2, d.first2) AS in2, a.out2 AS out2
+        FROM staging_days d
+        LEFT JOIN attendance_times a ON a.day = d.day AND a.employee_id = d.employee_id
+    """)
+
+    # 4. الخروج = آخر بصمة في الفترة تختلف عن وقت الدخول، وإلا تبقى القيمة السابقة
+    cur.execute("""
+        UPDATE merged_days SET
+            out1 = COALESCE((SELECT MAX(p.m) FROM staging_punches p
+                             WHERE p.employee_id = merged_days.employee_id AND p.day = merged_days.day
+                             AND p.period = 1 AND p.m <> merged_days.in1), out1),
+            out2 = COALESCE((SELECT MAX(p.m) FROM staging_punches p
+                             WHERE p.employee_id = merged_days.employee_id AND p.day = merged_days.day
+                             AND p.period = 2 AND p.m <> merged_days.in2), out2)
+    """)
+
+    # 5. إضافة الأيام الجديدة وتحديث الموجودة (المفتاح day, employee_id)
+    cur.execute("""
+        INSERT INTO attendance_times (day, employee_id, in1, out1, in2, out2)
+        SELECT day, employee_id, in1, out1, in2, out2
+        FROM merged_days WHERE 1 ORDER BY day, employee_id
+        ON CONFLICT(day, employee_id) DO UPDATE SET
+            in1 = excluded.in1, out1 = excluded.out1, in2 = excluded.in2, out2 = excluded.out2
+    """)
+    days = cur.execute("SELECT COUNT(*) FROM merged_days").fetchone()[0]
+    refresh_days(cur, "SELECT employee_id, day FROM merged_days")
+
+    cur.execute("DROP TABLE temp.staging_punches")
+    cur.execute("DROP TABLE temp.staging_days")
+    cur.execute("DROP TABLE temp.merged_days")
+    return days
+
+
+def to_epoch(ts):
+    """تحويل وقت الجهاز (بدون منطقة زمنية) إلى ثوانٍ، مع اعتبار ساعة الجهاز هي المرجع"""
+    return calendar.timegm(ts.timetuple())
+
+
+def _device_id(cur, key):
+    cur.execute("INSERT OR IGNORE INTO punch_devices (device) VALUES (?)", (key,))
+    return cur.execute("SELECT id FROM punch_devices WHERE device=?", (key,)).fetchone()[0]
+
+
+def store_raw_punches(db, tagged_records):
+    """
+    حفظ البصمات الخام كما وردت من الأجهزة (بما فيها البصمات خارج الفترات)
+    tagged_records: قائمة (مفتاح الجهاز، البصمة). البصمات المكررة وبصمات الأيام المؤرشفة يتم تجاهلها.
+    """
+    cur = db.cursor()
+    ids = {}
+    rows = []
+    for key, r in tagged_records:
+        if key not in ids:
+            ids[key] = _device_id(cur, key)
+        ts = to_epoch(r.timestamp)
+        rows.append((str(r.user_id), ts, ids[key], getattr(r, 'status', None), ts // 86400))
+    cur.executemany(f"""
+        INSERT OR IGNORE INTO punches (employee_id, ts, device_id, verify)
+        SELECT employee_id, ts, device_id, verify
+        FROM (SELECT ? AS employee_id, ? AS ts, ? AS device_id, ? AS verify, ? AS day)
+        WHERE NOT {ARCHIVED_DAY}
+    """, rows)
+
+
+def _period_case(config):
+    """تعبير SQL يحدد فترة البصمة من دقيقة اليوم m (نفس حدود ShiftClassifier)"""
+    parts, params = [], []
+    for period, start, end in ShiftClassifier.from_settings(config).windows:
+        if start <= end:
+            parts.append(f"WHEN m BETWEEN ? AND ? THEN {period}")
+        else:  # دوام ليلي عابر لمنتصف الليل
+            parts.append(f"WHEN m >= ? OR m <= ? THEN {period}")
+        params += [start, end]
+    if not parts:
+        return "NULL", []
+    return "CASE " + " ".join(parts) + " END", params
+
+
+def reclassify(db, date_from, date_to, config):
+    """
+    إعادة بناء أوقات الدخول والخروج للفترة المحددة من البصمات الخام المحفوظة محلياً
+    (بعد تعديل حدود الفترات مثلاً) دون الحاجة للاتصال بالجهاز.
+    الأيام التي لا توجد لها بصمات خام (قبل تفعيل حفظها) تبقى كما هي.
+    لا يتم الحفظ (commit) هنا.
+    """
+    lo = to_epoch(datetime.combine(date_from, datetime.min.time()))
+    hi = to_epoch(datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+    cur = db.cursor()
+
+    # 1. تجميع البصمات الخام لكل موظف في كل يوم بعد تصنيفها (بالدقائق)
+    # بما أن اليوم يعاد بناؤه من الصفر: الدخول = أول بصمة في الفترة،
+    # والخروج = آخر بصمة إذا اختلفت عن الدخول (نفس نتيجة merge_punches)
+    case, params = _period_case(config)
+    cur.execute("DROP TABLE IF EXISTS temp.rebuilt_days")
+    cur.execute(f"""
+        CREATE TEMP TABLE rebuilt_days AS
+        SELECT employee_id, day,
+               MIN(CASE WHEN period = 1 THEN m END) AS in1, MAX(CASE WHEN period = 1 THEN m END) AS out1,
+               MIN(CASE WHEN period = 2 THEN m END) AS in2, MAX(CASE WHEN period = 2 THEN m END) AS out2
+        FROM (SELECT employee_id, day, m, {case} AS period FROM (
+                SELECT employee_id, ts / 86400 AS day, (ts % 86400) / 60 AS m
+                FROM punches WHERE ts >= ? AND ts < ?))
+        GROUP BY employee_id, day
+    """, params + [lo, hi])
+    cur.execute(f"DELETE FROM rebuilt_days WHERE {ARCHIVED_DAY}")
+
+    # 2. كتابة الأيام التي فيها بصمات داخل الفترات
+    cur.execute("""
+        INSERT INTO attendance_times (day, employee_id, in1, out1, in2, out2)
+        SELECT day, employee_id, in1, CASE WHEN out1 <> in1 THEN out1 END, in2, CASE WHEN out2 <> in2 THEN out2 END
+        FROM (SELECT * FROM rebuilt_days WHERE in1 IS NOT NULL OR in2 IS NOT NULL)
+        WHERE 1 ORDER BY day, employee_id
+        ON CONFLICT(day, employee_id) DO UPDATE SET
+            in1 = excluded.in1, out1 = excluded.out1, in2 = excluded.in2, out2 = excluded.out2
+    """)
+    days = cur.rowcount
+
+    # 3. حذف الأيام التي لم يعد فيها أي بصمة داخل الفترات
+    cur.execute("""
+        DELETE FROM attendance_times WHERE (day, employee_id) IN (
+            SELECT day, employee_id FROM rebuilt_days WHERE in1 IS NULL AND in2 IS NULL)
+    """)
+    refresh_days(cur, "SELECT employee_id, day FROM rebuilt_days")
+    cur.execute("DROP TABLE temp.rebuilt_days")
+    return days
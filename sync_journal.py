@@ -0,0 +1,99 @@
+"""
+سجل السحب المضغوط (journal) لكل جهاز.
+
+يتم حفظ بصمات الجهاز كما وصلت (40 بايت لكل بصمة) في ملف gzip أثناء النقل، ثم يعاد
+تفعيل الجهاز فوراً، ويتم التصنيف والدمج في القاعدة من الملف بعد ذلك. إذا فشل الدمج
+أو تم إيقافه يبقى الملف في مجلد sync_journal بجانب القاعدة، ويكمل السحب التالي دمجه
+دون الحاجة للجهاز (علامة آخر بصمة لكل جهاز تمنع تكرار ما تم حفظه).
+"""
+import gzip
+import json
+import os
+from datetime import datetime
+import numpy as np
+from device_stream import ATT_RECORD, encode_time, parse_records
+from sync_engine import device_key
+
+JOURNAL_DIR = "sync_journal"
+SUFFIX = ".zkj.gz"
+PARTIAL = ".part"         # ملف لم يكتمل نقله بعد
+READ_RECORDS = 5000       # عدد البصمات المحللة من الملف في كل مرة
+# حقول ATT_RECORD لقراءة السجل بدون تحليل كل بصمة (الترتيب حسب time ثم user_id)
+RECORD_DTYPE = np.dtype([("uid", "<u2"), ("user_id", "S24"), ("status", "u1"), ("time", "<u4"),
+                         ("punch", "u1"), ("reserved", "V8")])
+
+
+def journal_dir(db_path):
+    """مجلد السجلات بجانب قاعدة البيانات"""
+    path = os.path.join(os.path.dirname(os.path.abspath(db_path)), JOURNAL_DIR)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class JournalWriter:
+    def __init__(self, directory, device):
+        stamp = datetime.now()
+        name = f"{stamp:%Y%m%d-%H%M%S-%f}_{device['ip'].replace(':', '_')}_{device['port']}{SUFFIX}"
+        self.path = os.path.join(directory, name)
+        self.records = 0
+        # ضغط سريع: الهدف تقليل حجم الملف دون إبطاء النقل
+        self.file = gzip.open(self.path + PARTIAL, "wb", compresslevel=1)
+        header = {"device": device_key(device), "label": device.get("label", ""), "ip": device["ip"],
+                  "pulled_at": stamp.strftime('%Y-%m-%d %H:%M:%S'), "record_size": ATT_RECORD.size}
+        self.file.write(json.dumps(header, ensure_ascii=False).encode('utf-8') + b"\n")
+
+    def write(self, data):
+        self.file.write(data)
+        self.records += len(data) // ATT_RECORD.size
+
+    def commit(self):
+        """إغلاق الملف واعتماده بعد اكتمال النقل"""
+        self.file.close()
+        os.replace(self.path + PARTIAL, self.path)
+        return self.path
+
+    def discard(self):
+        self.file.close()
+        try: os.remove(self.path + PARTIAL)
+        except OSError: pass
+
+
+def pending_journals(directory):
+    """السجلات المكتملة التي لم يتم دمجها بعد، الأقدم أولاً (مع حذف ملفات النقل غير المكتمل)"""
+    names = sorted(os.listdir(directory))
+    for name in names:
+        if name.endswith(SUFFIX + PARTIAL):
+            try: os.remove(os.path.join(directory, name))
+            except OSError: pass
+    return [os.path.join(directory, name) for name in names if name.endswith(SUFFIX)]
+
+
+def read_header(path):
+    with gzip.open(path, "rb") as f:
+        return json.loads(f.readline())
+
+
+def read_journal(path, after=None, chunk_records=READ_RECORDS):
+    """
+    مولد يعيد بصمات السجل بعد after (الوقت، رقم الموظف) على دفعات، مرتبة كلها حسب
+    (الوقت، رقم الموظف) وليس داخل كل دفعة فقط: ترتيب سجل الجهاز غير مضمون (تعديل الساعة).
+    السجل يحمل كاملاً بتنسيقه المضغوط (40 بايت لكل بصمة) لترتيبه، ويحلل دفعة دفعة.
+    """
+    with gzip.open(path, "rb") as f:
+        f.readline()
+        data = f.read()
+    records = np.frombuffer(data, dtype=RECORD_DTYPE, count=len(data) // ATT_RECORD.size)
+    times, users = records["time"], records["user_id"]
+    if after is not None:
+        t, user = encode_time(after[0]), str(after[1]).encode()
+        keep = np.flatnonzero((times > t) | ((times == t) & (users > user)))
+    else:
+        keep = np.arange(len(records))
+    order = keep[np.lexsort((users[keep], times[keep]))]
+    for i in range(0, len(order), chunk_records):
+        yield parse_records(records[order[i:i + chunk_records]].tobytes())
+
+
+def remove_journal(path):
+    try: os.remove(path)
+    except OSError: pass
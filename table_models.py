@@ -0,0 +1,95 @@
+"""
+نموذج جداول العرض (QTableView) من بيانات مخزنة بالأعمدة.
+
+بدلاً من عنصر QTableWidgetItem لكل خلية، يحفظ كل عمود كأرقام (int32) تشير إلى قائمة
+القيم المختلفة في العمود بعد تنسيقها للعرض (الأوقات والتواريخ والأسماء تتكرر كثيراً)،
+والعرض يطلب نص الخلايا الظاهرة فقط. لون الصف (إجازة، عطلة، غياب...) يؤخذ من نوع الصف
+عبر BackgroundRole بدلاً من setBackground لكل خلية.
+"""
+import numpy as np
+import pandas as pd
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt5.QtGui import QBrush, QColor
+
+EMPTY_FOREGROUND = QColor("#bdc3c7")  # لون القيم الفارغة ("--")
+
+
+class ColumnTableModel(QAbstractTableModel):
+    def __init__(self, headers, formats=None, empty_text=None, palette=None, parent=None):
+        """
+        formats: دالة تنسيق لكل عمود (الافتراضي str).
+        empty_text: نص القيم الفارغة (None أو "") ويظهر بلون باهت، أو None لعرضها كما هي.
+        palette: {نوع الصف: لون الخلفية} للصفوف التي يمرر نوعها في set_columns.
+        """
+        super().__init__(parent)
+        self.headers = list(headers)
+        self.formats = formats or [str] * len(self.headers)
+        self.empty_text = empty_text
+        self.palette = {k: QBrush(QColor(c)) for k, c in (palette or {}).items()}
+        self.codes = [np.zeros(0, dtype=np.int32) for _ in self.headers]
+        self.labels = [[""] for _ in self.headers]
+        self.kinds = None
+        self.rows = 0
+
+    def set_headers(self, headers):
+        self.headers = list(headers)
+        self.headerDataChanged.emit(Qt.Horizontal, 0, len(self.headers) - 1)
+
+    def set_columns(self, columns, kinds=None):
+        """تحميل البيانات: قائمة أعمدة (بنفس الطول)، و kinds نوع كل صف لتلوينه (اختياري)"""
+        self.beginResetModel()
+        self.rows = len(columns[0]) if columns else 0
+        self.codes, self.labels = [], []
+        for values, fmt in zip(columns, self.formats):
+            codes, uniques = pd.factorize(np.array(values, dtype=object))
+            labels = [self.format_value(v, fmt) for v in uniques]
+            labels.append(self.format_value(None, fmt))  # الرمز -1 (None) يشير لآخر القائمة
+            self.codes.append(codes.astype(np.int32))
+            self.labels.append(labels)
+        self.kinds = None if kinds is None else np.asarray(kinds, dtype=np.int8)
+        self.endResetModel()
+
+    def format_value(self, value, fmt):
+        if value is None or value == "":
+            return self.empty_text if self.empty_text is not None else ""
+        return fmt(value)
+
+    def text(self, row, column):
+        return self.labels[column][self.codes[column][row]]
+
+    def snapshot_rows(self, columns):
+        """
+        مولد (قيم الأعمدة المحددة، لون الصف) من بيانات النموذج الحالية. يمكن قراءته من خيط آخر
+        لأن set_columns يستبدل المصفوفات ولا يعدلها.
+        """
+        codes = [self.codes[c] for c in columns]
+        labels = [self.labels[c] for c in columns]
+        kinds, palette, white = self.kinds, self.palette, QColor(255, 255, 255)
+        for row in range(self.rows):
+            brush = palette.get(int(kinds[row])) if kinds is not None else None
+            yield [l[c[row]] for c, l in zip(codes, labels)], brush.color() if brush is not None else white
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.rows
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return self.text(index.row(), index.column())
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        if role == Qt.BackgroundRole and self.kinds is not None:
+            return self.palette.get(int(self.kinds[index.row()]))
+        if role == Qt.ForegroundRole and self.empty_text is not None:
+            if self.text(index.row(), index.column()) == self.empty_text:
+                return EMPTY_FOREGROUND
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal and section < len(self.headers):
+            return self.headers[section]
+        return super().headerData(section, orientation, role)
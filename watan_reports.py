@@ -0,0 +1,196 @@
+"""
+توليد التقارير بدون واجهة (للجدولة على الخادم، أو لقياس سرعة التقارير وحدها).
+
+أمثلة:
+    python -m watan_reports general --from 2025-01-01 --to 2025-01-31 --period both --format xlsx -o عام.xlsx
+    python -m watan_reports individual --employee 12 --from 2025-01-01 --to 2025-01-31 --format pdf -o كشف.pdf
+    python -m watan_reports individual --all --from 2025-01-01 --to 2025-01-31 --format csv -o كشوف --workers 8
+
+الحساب من report_engine نفسه المستخدم في شاشة التقارير، بإعدادات settings_data.json
+(بداية الدوام والعطلة الأسبوعية). كشوف كل الموظفين (--all) توزع على عدة عمليات
+(ProcessPoolExecutor)، وكل عملية تقرأ القاعدة باتصالها الخاص للقراءة فقط: الملخص اليومي
+وملخص ملفات الأرشيف في فترة التقرير يحدثان في العملية الرئيسية قبل البدء.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+
+from archive import refresh_archives
+from daily_summary import prepare_summary
+from database import connect, get_db_path
+from excel_export import as_date, write_xlsx
+from migrations import migrate
+from report_engine import (general_report, individual_report, general_columns, individual_columns, general_table,
+                           individual_table, individual_summary, GENERAL_HEADERS, INDIVIDUAL_HEADERS, DAY_COLORS,
+                           PERIOD_BOTH, PERIOD_FIRST, PERIOD_SECOND)
+from work_calendar import load_calendar, weekend_from_settings
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PERIODS = {"both": PERIOD_BOTH, "first": PERIOD_FIRST, "second": PERIOD_SECOND}
+UNSAFE_CHARS = re.compile(r'[<>:"/\\|?*]')  # أحرف غير مسموحة في أسماء الملفات
+
+_qt_app = None  # QGuiApplication لرسم PDF (واحد لكل عملية)
+
+
+def load_settings(path):
+    """(بداية دوام ف1، بداية دوام ف2، العطلة الأسبوعية) كما تقرأها شاشة التقارير"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = {}
+    return data.get("in_limit_1", "08:00"), data.get("in_limit_2", "16:00"), weekend_from_settings(data)
+
+
+def write_report(path, fmt, title, target_name, headers, rows, columns, summary="", kinds=None):
+    """كتابة صفوف التقرير (بترتيب headers) بالأعمدة columns فقط بصيغة csv أو xlsx أو pdf"""
+    headers = [headers[c] for c in columns]
+    rows = [[row[c] for c in columns] for row in rows]
+    if fmt == "csv":
+        # utf-8-sig حتى يفتح Excel النصوص العربية بشكل صحيح
+        with open(path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            writer.writerows(rows)
+    elif fmt == "xlsx":
+        write_xlsx(path, headers, rows, "التقرير")
+    else:
+        write_pdf(path, title, target_name, headers, rows, summary, kinds)
+
+
+def write_pdf(path, title, target_name, headers, rows, summary, kinds):
+    global _qt_app
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")  # الخادم بدون شاشة
+    from PyQt5.QtCore import QMarginsF
+    from PyQt5.QtGui import QColor, QGuiApplication, QPageLayout, QPageSize, QPdfWriter
+    from report_printer import ReportPainter
+    if QGuiApplication.instance() is None:
+        _qt_app = QGuiApplication([])
+    white = QColor(255, 255, 255)
+    colors = {k: QColor(c) for k, c in DAY_COLORS.items()}
+    painted = (([str(v) for v in row], colors.get(kinds[i], white) if kinds else white) for i, row in enumerate(rows))
+    writer = QPdfWriter(path)
+    writer.setPageSize(QPageSize(QPageSize.A4))
+    writer.setPageMargins(QMarginsF(10, 10, 10, 10), QPageLayout.Millimeter)
+    writer.setResolution(300)
+    ReportPainter(title, target_name, headers, summary, os.path.join(BASE_DIR, "logo.jpg")).render(writer, painted, len(rows))
+
+
+def individual_job(db_path, employee_id, name, d1, d2, period_choice, settings, fmt, path):
+    """كشف موظف واحد إلى ملف (ينفذ في عملية من مجموعة العمليات)؛ يعيد عدد الأيام"""
+    work_start_1, work_start_2, weekend = settings
+    conn = connect(db_path)
+    try:
+        conn.execute("PRAGMA query_only = ON")
+        days = individual_report(conn, employee_id, d1, d2, period_choice, work_start_1, work_start_2,
+                                 load_calendar(conn, weekend))
+    finally:
+        conn.close()
+    rows = [[as_date(row[0])] + row[1:] for row in individual_table(days)]
+    write_report(path, fmt, "كشف حضور وانصراف تفصيلي", name, INDIVIDUAL_HEADERS, rows,
+                 individual_columns(period_choice), individual_summary(days), [day[1] for day in days])
+    return len(days)
+
+
+def file_name(employee_id, name, fmt):
+    return f"{employee_id}_{UNSAFE_CHARS.sub('_', name)}.{fmt}"
+
+
+def run_general(args, conn, settings):
+    work_start_1, work_start_2, weekend = settings
+    period_choice = PERIODS[args.period]
+    rows = general_report(conn, args.date_from, args.date_to, period_choice, work_start_1, work_start_2,
+                          load_calendar(conn, weekend))
+    # الدقائق تكتب أرقاماً في csv و xlsx، وبحرف "د" في PDF كما في الشاشة
+    table = [[f"{v} د" for v in row[:3]] + row[3:] if args.format == "pdf" else row for row in general_table(rows)]
+    write_report(args.output, args.format, "تقرير الرقابة العام", "كافة الموظفين", GENERAL_HEADERS, table,
+                 general_columns(period_choice), "تقرير الرقابة العام لجميع الموظفين")
+    print(f"✅ التقرير العام: {len(rows)} موظف -> {args.output}")
+    return 0
+
+
+def run_individual(args, conn, settings):
+    period_choice = PERIODS[args.period]
+    if not args.all:
+        row = conn.execute("SELECT name FROM employees WHERE finger_id = ?", (args.employee,)).fetchone()
+        if row is None:
+            print(f"❌ لا يوجد موظف برقم البصمة {args.employee}")
+            return 1
+        days = individual_job(args.db, args.employee, row[0], args.date_from, args.date_to, period_choice, settings,
+                              args.format, args.output)
+        print(f"✅ كشف {row[0]}: {days} يوم -> {args.output}")
+        return 0
+
+    employees = conn.execute("SELECT finger_id, name FROM employees WHERE active = 1 ORDER BY finger_id").fetchall()
+    os.makedirs(args.output, exist_ok=True)
+    workers = args.workers or os.cpu_count() or 1
+    jobs = [(args.db, eid, name, args.date_from, args.date_to, period_choice, settings, args.format,
+             os.path.join(args.output, file_name(eid, name, args.format))) for eid, name in employees]
+    start = time.perf_counter()
+    done, errors = 0, []
+    if workers == 1:
+        for job in jobs:
+            try:
+                individual_job(*job)
+                done += 1
+            except Exception as e:
+                errors.append(f"{job[1]}: {e}")
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(individual_job, *job): job[1] for job in jobs}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    done += 1
+                except Exception as e:
+                    errors.append(f"{futures[future]}: {e}")
+    elapsed = time.perf_counter() - start
+    for error in errors:
+        print(f"❌ {error}")
+    rate = done / elapsed if elapsed > 0 else 0
+    print(f"✅ {done} كشف خلال {elapsed:.1f} ث ({rate:.1f} كشف/ث، {workers} عملية) -> {args.output}")
+    return 1 if errors else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="watan_reports", description="توليد تقارير الحضور بدون واجهة")
+    parser.add_argument("--db", default=get_db_path())
+    parser.add_argument("--settings", default=os.path.join(BASE_DIR, "settings_data.json"))
+    commands = parser.add_subparsers(dest="command", required=True)
+    for command in ("general", "individual"):
+        sub = commands.add_parser(command)
+        sub.add_argument("--from", dest="date_from", type=date.fromisoformat, required=True)
+        sub.add_argument("--to", dest="date_to", type=date.fromisoformat, required=True)
+        sub.add_argument("--period", choices=PERIODS, default="both")
+        sub.add_argument("--format", choices=("xlsx", "pdf", "csv"), default="xlsx")
+        sub.add_argument("-o", "--output", required=True, help="ملف التقرير، أو مجلد الكشوف مع --all")
+        if command == "individual":
+            who = sub.add_mutually_exclusive_group(required=True)
+            who.add_argument("--employee", type=int, help="رقم البصمة")
+            who.add_argument("--all", action="store_true", help="كشف لكل موظف فعال")
+            sub.add_argument("--workers", type=int, default=0, help="عدد العمليات (الافتراضي عدد الأنوية)")
+    args = parser.parse_args(argv)
+
+    settings = load_settings(args.settings)
+    conn = connect(args.db)
+    try:
+        migrate(conn)
+        # تحديث الملخص وملخص ملفات أرشيف الفترة مرة واحدة هنا، فالعمليات الفرعية لا تكتب شيئاً
+        # (اتصالاتها query_only)، ولا تكتب عدة عمليات في نفس ملف الأرشيف في وقت واحد
+        prepare_summary(conn, *settings)
+        refresh_archives(conn, args.date_from, args.date_to)
+        if args.command == "general":
+            return run_general(args, conn, settings)
+        return run_individual(args, conn, settings)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
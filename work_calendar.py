@@ -0,0 +1,89 @@
+"""
+تقويم أيام العمل.
+
+لكل سنة مصفوفة بتات مضغوطة (بت لكل يوم) لأيام العمل وأخرى للإجازات الرسمية، مع مجاميع
+تراكمية لأيام العمل، فيصبح عدّ أيام العمل في أي فترة بزمن ثابت لكل سنة، وأنواع أيام
+الفترة (flags) عمليات على المصفوفات بدلاً من المرور على الأيام والبحث في قائمة الإجازات.
+التقويم يبنى من جدول holidays والعطلة الأسبوعية في الإعدادات (weekend_days)، ويبقى
+محفوظاً حتى تضيف أو تحذف شاشة الإجازات تاريخاً (invalidate_calendar).
+"""
+from datetime import date
+import numpy as np
+from daily_summary import WEEKEND_DAYS, day_number
+
+# أسماء الأيام بترتيب datetime.weekday
+DAY_NAMES = ["الإثنين", "الثلاثاء", "الأربعاء", "الخميس", "الجمعة", "السبت", "الأحد"]
+
+_calendars = {}  # (مسار القاعدة، العطلة الأسبوعية) -> WorkCalendar
+
+
+def weekend_from_settings(data):
+    """أيام العطلة الأسبوعية من ملف الإعدادات (أرقام datetime.weekday)، والافتراضي الجمعة والسبت"""
+    try:
+        return tuple(sorted({int(d) for d in data.get("weekend_days", WEEKEND_DAYS)} & set(range(7))))
+    except Exception:
+        return WEEKEND_DAYS
+
+
+class WorkCalendar:
+    def __init__(self, holidays, weekend=WEEKEND_DAYS):
+        """holidays: تواريخ الإجازات الرسمية (نص YYYY-MM-DD)، والتواريخ بصيغة أخرى تهمل"""
+        self.weekend = tuple(sorted(weekend))
+        days = set()
+        for h in holidays:
+            try: days.add(day_number(date.fromisoformat(str(h))))
+            except ValueError: pass
+        self.holidays = frozenset(days)
+        self.key = (self.weekend, self.holidays)  # للاستخدام في مفاتيح الحفظ المؤقت
+        self._years = {}
+
+    def _year(self, year):
+        """(بتات أيام العمل، بتات الإجازات، مجاميع أيام العمل التراكمية) للسنة، تبنى عند أول طلب"""
+        if year not in self._years:
+            start = day_number(date(year, 1, 1))
+            days = np.arange(start, day_number(date(year + 1, 1, 1)))
+            holiday = np.isin(days, np.fromiter(self.holidays, dtype=np.int64, count=len(self.holidays)))
+            # اليوم 0 (1970-01-01) خميس، فيوم الأسبوع = (day + 3) % 7 بنفس ترقيم datetime.weekday
+            working = ~holiday & ~np.isin((days + 3) % 7, self.weekend)
+            prefix = np.zeros(len(days) + 1, dtype=np.int16)
+            np.cumsum(working, out=prefix[1:])
+            self._years[year] = (np.packbits(working), np.packbits(holiday), prefix)
+        return self._years[year]
+
+    def count(self, d1, d2):
+        """عدد أيام العمل من d1 إلى d2 (شاملة)"""
+        total = 0
+        for year in range(d1.year, d2.year + 1):
+            prefix = self._year(year)[2]
+            a = d1.timetuple().tm_yday - 1 if year == d1.year else 0
+            b = d2.timetuple().tm_yday if year == d2.year else len(prefix) - 1
+            total += int(prefix[b]) - int(prefix[a])
+        return max(total, 0)
+
+    def flags(self, d1, d2):
+        """مصفوفتا (يوم عمل، إجازة رسمية) لكل يوم من d1 إلى d2"""
+        working, holiday = [], []
+        for year in range(d1.year, d2.year + 1):
+            work_bits, holiday_bits, prefix = self._year(year)
+            a = d1.timetuple().tm_yday - 1 if year == d1.year else 0
+            b = d2.timetuple().tm_yday if year == d2.year else len(prefix) - 1
+            working.append(np.unpackbits(work_bits, count=len(prefix) - 1)[a:b].astype(bool))
+            holiday.append(np.unpackbits(holiday_bits, count=len(prefix) - 1)[a:b].astype(bool))
+        if not working:
+            return np.zeros(0, dtype=bool), np.zeros(0, dtype=bool)
+        return np.concatenate(working), np.concatenate(holiday)
+
+
+def load_calendar(conn, weekend=WEEKEND_DAYS):
+    """تقويم القاعدة المحفوظ، أو بناؤه من جدول الإجازات عند أول طلب بعد تعديلها"""
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    key = (path, tuple(sorted(weekend)))
+    if key not in _calendars:
+        rows = conn.execute("SELECT holiday_date FROM holidays").fetchall()
+        _calendars[key] = WorkCalendar([r[0] for r in rows], weekend)
+    return _calendars[key]
+
+
+def invalidate_calendar():
+    """يستدعى بعد إضافة أو حذف إجازة"""
+    _calendars.clear()
@@ -0,0 +1,335 @@
+"""
+محاكي محلي لجهاز البصمة ZK لاختبار السحب وتنظيف الذاكرة بدون جهاز حقيقي.
+
+يتحدث بالقدر الذي تستخدمه مكتبة zk (pyzk) من بروتوكول الجهاز عبر TCP و UDP
+على نفس المنفذ: الإتصال، تعطيل/تفعيل الجهاز، قراءة المستخدمين وسجل البصمات
+(القراءة المقسمة على أجزاء)، حذف البصمات، والالتقاط المباشر للبصمات.
+سجل البصمات تجريبي بالحجم المطلوب، مع تأخير وفقد حزم قابلين للضبط.
+
+التشغيل:
+    python zk_simulator.py --records 100000 --users 500 --port 4370 --latency 0.005 --loss 0.01
+ثم إضافة جهاز بعنوان 127.0.0.1 في الإعدادات (مع "ping": false في settings_data.json
+إذا لم يكن أمر ping متاحاً، و "udp": true لتجربة الإتصال عبر UDP).
+"""
+import argparse
+import random
+import socket
+import socketserver
+import struct
+import threading
+import time
+from datetime import datetime, timedelta
+
+# أوامر البروتوكول (نفس القيم في zk.const)
+CMD_USERTEMP_RRQ = 9
+CMD_ATTLOG_RRQ = 13
+CMD_CLEAR_ATTLOG = 15
+CMD_GET_FREE_SIZES = 50
+CMD_STARTVERIFY = 60
+CMD_CANCELCAPTURE = 62
+CMD_REG_EVENT = 500
+CMD_CONNECT = 1000
+CMD_EXIT = 1001
+CMD_ENABLEDEVICE = 1002
+CMD_DISABLEDEVICE = 1003
+CMD_PREPARE_DATA = 1500
+CMD_DATA = 1501
+CMD_FREE_DATA = 1502
+CMD_PREPARE_BUFFER = 1503
+CMD_READ_BUFFER = 1504
+CMD_ACK_OK = 2000
+CMD_ACK_UNKNOWN = 0xFFFF
+
+TCP_MAGIC = (0x5050, 0x7D82)
+UDP_PACKET_SIZE = 1024     # حجم حزمة البيانات في القراءة المقسمة عبر UDP
+TCP_RETRANSMIT_DELAY = 0.2  # فقد حزمة في TCP يظهر كتأخير إعادة إرسال وليس كحزمة مفقودة
+
+USER_RECORD = struct.Struct('<HB8s24sIx7sx24s')  # 72 بايت لكل مستخدم
+ATT_RECORD = struct.Struct('<H24sBIB8s')         # 40 بايت لكل بصمة
+LIVE_EVENT = struct.Struct('<24sBB6s4s')         # 36 بايت لكل بصمة مباشرة
+
+# أوقات البصمات اليومية لكل موظف (دخول وخروج للفترتين) يضاف لها تأخير عشوائي
+SHIFT_PUNCHES = ((7, 40), (13, 40), (20, 5), (24, 30))
+
+
+def encode_time(t):
+    """ترميز الوقت بنفس طريقة ساعة الجهاز"""
+    return ((((t.year % 100) * 12 * 31 + ((t.month - 1) * 31) + t.day - 1) * (24 * 60 * 60))
+            + (t.hour * 60 + t.minute) * 60 + t.second)
+
+
+class SimulatedDevice:
+    """ذاكرة الجهاز: المستخدمون وسجل البصمات بنفس تنسيق الجهاز الحقيقي"""
+
+    def __init__(self, records=1000, users=50, start=datetime(2024, 1, 1), seed=1):
+        self.lock = threading.Lock()
+        self.users = users
+        self.enabled = True
+        self.rnd = random.Random(seed)
+        self.user_data = b''.join(
+            USER_RECORD.pack(uid, 0, b'', f"موظف {uid}".encode('utf-8'), 0, b'', str(uid).encode())
+            for uid in range(1, users + 1))
+        self.log = self.generate_log(records, start)
+
+    def generate_log(self, records, start):
+        """سجل بصمات تجريبي مرتب زمنياً (كما يسجله الجهاز) بالعدد المطلوب"""
+        log = bytearray(records * ATT_RECORD.size)
+        day, i = start, 0
+        while i < records:
+            punches = sorted((day + timedelta(hours=h, minutes=m + self.rnd.randint(0, 25)), uid)
+                             for h, m in SHIFT_PUNCHES for uid in range(1, self.users + 1))
+            for ts, uid in punches[:records - i]:
+                ATT_RECORD.pack_into(log, i * ATT_RECORD.size, uid, str(uid).encode(), 1, encode_time(ts), 0, b'')
+                i += 1
+            day += timedelta(days=1)
+        return log
+
+    @property
+    def record_count(self):
+        return len(self.log) // ATT_RECORD.size
+
+    def free_sizes(self):
+        fields = [0] * 20
+        fields[4], fields[8] = self.users, self.record_count
+        fields[15], fields[16] = 10000, 1000000
+        return struct.pack('20i', *fields) + struct.pack('3i', 0, 0, 0)
+
+    def buffer_for(self, command):
+        """محتوى القراءة المقسمة: الحجم الكلي ثم السجلات"""
+        with self.lock:
+            if command == CMD_ATTLOG_RRQ:
+                data = bytes(self.log)
+            elif command == CMD_USERTEMP_RRQ:
+                data = self.user_data
+            else:
+                return None
+        return struct.pack('<I', len(data)) + data
+
+    def clear_attendance(self):
+        with self.lock:
+            self.log = bytearray()
+
+    def punch(self, when=None):
+        """تسجيل بصمة جديدة لموظف عشوائي وإرجاع بيانات حدث الالتقاط المباشر"""
+        when = when or datetime.now()
+        uid = self.rnd.randint(1, self.users)
+        with self.lock:
+            self.log += ATT_RECORD.pack(uid, str(uid).encode(), 1, encode_time(when), 0, b'')
+        timehex = bytes([when.year - 2000, when.month, when.day, when.hour, when.minute, when.second])
+        return LIVE_EVENT.pack(str(uid).encode(), 1, 0, timehex, b'')
+
+
+class _Session:
+    def __init__(self, session_id, tcp):
+        self.id = session_id
+        self.tcp = tcp
+        self.buffer = None    # محتوى آخر CMD_PREPARE_BUFFER
+        self.capture = False  # الالتقاط المباشر مفعل
+
+
+class ZKSimulator:
+    def __init__(self, device, host='127.0.0.1', port=4370, latency=0.0, loss=0.0, live_interval=1.0, seed=1):
+        """
+        latency: تأخير كل رد بالثواني
+        loss: نسبة فقد الحزم (UDP: لا ترسل الحزمة، TCP: تأخير إعادة إرسال)
+        live_interval: الفترة بين البصمات الوهمية أثناء الالتقاط المباشر
+        """
+        self.device = device
+        self.host, self.port = host, port
+        self.latency, self.loss = latency, loss
+        self.live_interval = live_interval
+        self.rnd = random.Random(seed)
+        self.next_session = 1
+        self.udp_sessions = {}
+        self.running = False
+        self.stats = {"packets": 0, "dropped": 0}
+        self._tcp_server = None
+        self._udp_sock = None
+        self._threads = []
+
+    # ---------- التشغيل والإيقاف ----------
+    def start(self):
+        simulator = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                simulator.serve_tcp(self.request)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._tcp_server = socketserver.ThreadingTCPServer((self.host, self.port), Handler)
+        self._tcp_server.daemon_threads = True
+        self.port = self._tcp_server.server_address[1]  # المنفذ 0 يعني اختيار منفذ متاح
+        self._udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._udp_sock.bind((self.host, self.port))
+        self._udp_sock.settimeout(self.live_interval)
+        self.running = True
+        self._threads = [threading.Thread(target=self._tcp_server.serve_forever, daemon=True),
+                         threading.Thread(target=self.serve_udp, daemon=True)]
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self._tcp_server:
+            self._tcp_server.shutdown()
+            self._tcp_server.server_close()
+        for t in self._threads:
+            t.join(timeout=2)
+        if self._udp_sock:
+            self._udp_sock.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---------- معالجة الأوامر ----------
+    def packet(self, command, session, reply_id, data=b''):
+        # العميل لا يتحقق من خانة checksum في الردود
+        return struct.pack('<4H', command, 0, session.id if session else 0, reply_id) + data
+
+    def handle_command(self, session, command, reply_id, data):
+        """تنفيذ أمر وإرجاع (قائمة الحزم، هل يغلق الإتصال)"""
+        device = self.device
+        ok = lambda payload=b'': [self.packet(CMD_ACK_OK, session, reply_id, payload)]
+        if command == CMD_ACK_OK:
+            return [], False  # تأكيد استلام حدث مباشر من العميل، لا يحتاج رد
+        if command == CMD_CONNECT:
+            return ok(), False  # رقم الجلسة في رأس الرد
+        if command == CMD_EXIT:
+            return ok(), True
+        if command in (CMD_ENABLEDEVICE, CMD_DISABLEDEVICE):
+            device.enabled = command == CMD_ENABLEDEVICE
+            return ok(), False
+        if command == CMD_GET_FREE_SIZES:
+            return ok(device.free_sizes()), False
+        if command == CMD_PREPARE_BUFFER:
+            session.buffer = device.buffer_for(struct.unpack('<h', data[1:3])[0])
+            if session.buffer is None:
+                return [self.packet(CMD_ACK_UNKNOWN, session, reply_id)], False
+            return ok(b'\x00' + struct.pack('<I', len(session.buffer))), False
+        if command == CMD_READ_BUFFER:
+            start, size = struct.unpack('<ii', data[:8])
+            chunk = (session.buffer or b'')[start:start + size]
+            if session.tcp:
+                return [self.packet(CMD_DATA, session, reply_id, chunk)], False
+            packets = [self.packet(CMD_PREPARE_DATA, session, reply_id, struct.pack('<I', len(chunk)))]
+            packets += [self.packet(CMD_DATA, session, reply_id, chunk[i:i + UDP_PACKET_SIZE])
+                        for i in range(0, len(chunk), UDP_PACKET_SIZE)]
+            return packets + ok(), False
+        if command == CMD_FREE_DATA:
+            session.buffer = None
+            return ok(), False
+        if command == CMD_CLEAR_ATTLOG:
+            device.clear_attendance()
+            return ok(), False
+        if command == CMD_REG_EVENT:
+            session.capture = struct.unpack('<I', data[:4])[0] != 0
+            return ok(), False
+        if command in (CMD_CANCELCAPTURE, CMD_STARTVERIFY):
+            return ok(), False
+        return [self.packet(CMD_ACK_UNKNOWN, session, reply_id)], False
+
+    def new_session(self, tcp):
+        session = _Session(self.next_session, tcp)
+        self.next_session = self.next_session % 0xFFFF + 1
+        return session
+
+    def live_event(self, session):
+        return self.packet(CMD_REG_EVENT, session, 0, self.device.punch())
+
+    # ---------- الشبكة ----------
+    def send(self, session, send_one, packets):
+        """إرسال الردود بعد التأخير المطلوب مع محاكاة الفقد"""
+        if self.latency:
+            time.sleep(self.latency)
+        for p in packets:
+            self.stats["packets"] += 1
+            if self.loss and self.rnd.random() < self.loss:
+                self.stats["dropped"] += 1
+                if not session.tcp:
+                    continue
+                time.sleep(TCP_RETRANSMIT_DELAY)
+            send_one(p)
+
+    def serve_tcp(self, sock):
+        session = self.new_session(tcp=True)
+        sock.settimeout(self.live_interval)
+        send_one = lambda p: sock.sendall(struct.pack('<HHI', *TCP_MAGIC, len(p)) + p)
+        pending = b''
+        while self.running:
+            try:
+                received = sock.recv(65536)
+            except socket.timeout:
+                if session.capture:
+                    self.send(session, send_one, [self.live_event(session)])
+                continue
+            except OSError:
+                return
+            if not received:
+                return  # فحص الإتصال من العميل (test_tcp) أو إغلاق الإتصال
+            pending += received
+            while len(pending) >= 8:
+                magic1, magic2, length = struct.unpack('<HHI', pending[:8])
+                if (magic1, magic2) != TCP_MAGIC:
+                    return
+                if len(pending) < 8 + length:
+                    break
+                packet, pending = pending[8:8 + length], pending[8 + length:]
+                command, _, _, reply_id = struct.unpack('<4H', packet[:8])
+                packets, close = self.handle_command(session, command, reply_id, packet[8:])
+                self.send(session, send_one, packets)
+                if close:
+                    return
+
+    def serve_udp(self):
+        while self.running:
+            try:
+                packet, address = self._udp_sock.recvfrom(65536)
+            except socket.timeout:
+                for address, session in list(self.udp_sessions.items()):
+                    if session.capture:
+                        self.send(session, lambda p: self._udp_sock.sendto(p, address), [self.live_event(session)])
+                continue
+            except OSError:
+                return
+            if len(packet) < 8:
+                continue
+            command, _, _, reply_id = struct.unpack('<4H', packet[:8])
+            if command == CMD_CONNECT:
+                self.udp_sessions[address] = self.new_session(tcp=False)
+            session = self.udp_sessions.get(address)
+            if session is None:
+                continue
+            packets, close = self.handle_command(session, command, reply_id, packet[8:])
+            self.send(session, lambda p: self._udp_sock.sendto(p, address), packets)
+            if close:
+                self.udp_sessions.pop(address, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="محاكي جهاز بصمة ZK للاختبار")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4370)
+    parser.add_argument("--records", type=int, default=100000, help="عدد البصمات في سجل الجهاز")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.0, help="تأخير كل رد بالثواني")
+    parser.add_argument("--loss", type=float, default=0.0, help="نسبة فقد الحزم من 0 إلى 1")
+    parser.add_argument("--live-interval", type=float, default=1.0, help="الفترة بين البصمات أثناء الالتقاط المباشر")
+    args = parser.parse_args()
+
+    device = SimulatedDevice(records=args.records, users=args.users)
+    simulator = ZKSimulator(device, args.host, args.port, args.latency, args.loss, args.live_interval)
+    with simulator:
+        print(f"🟢 محاكي جهاز البصمة يعمل على {args.host}:{simulator.port} (TCP/UDP) - {device.record_count} بصمة")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print(f"⏹ تم الإيقاف ({simulator.stats['packets']} حزمة، {simulator.stats['dropped']} مفقودة)")
+
+
+if __name__ == "__main__":
+    main()